@@ -0,0 +1,137 @@
+"""Admission control that bounds concurrent LLM operations and sheds the excess."""
+import asyncio
+import math
+import time
+from collections import deque
+
+INTERACTIVE = "interactive"
+BATCH = "batch"
+
+
+class AdmissionRejected(Exception):
+    """Raised instead of queueing; ``retry_after`` is a hint in whole seconds."""
+
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """Lets at most ``max_in_flight`` operations run, with a short priority queue in front.
+
+    Beyond that limit, requests wait up to ``queue_timeout`` seconds in a
+    queue of at most ``max_queue``. Interactive requests are always granted
+    a slot before batch ones, and batch requests may take at most
+    ``batch_max_queue`` of the queue places. When the queue is full, an
+    interactive request takes the place of the newest queued batch request.
+    Everything else is rejected straight away rather than left to pile up.
+    """
+
+    def __init__(self, max_in_flight: int = 32, max_queue: int = 64, batch_max_queue: int = 16,
+                 queue_timeout: float = 5.0):
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.batch_max_queue = batch_max_queue
+        self.queue_timeout = queue_timeout
+        self._in_flight = 0
+        self._waiters = {INTERACTIVE: deque(), BATCH: deque()}  # futures, oldest first
+        self._hold_ms = None  # moving average of how long a slot is held
+        self._wait_ms = None  # moving average of queue wait for admitted requests
+        self.metrics = {
+            "admitted_total": 0,
+            "queued_total": 0,
+            "rejected_queue_full": 0,
+            "rejected_timeout": 0,
+            "rejected_evicted": 0,
+        }
+
+    def queued(self) -> int:
+        return len(self._waiters[INTERACTIVE]) + len(self._waiters[BATCH])
+
+    def retry_after(self) -> int:
+        """Seconds until the queue ahead of a new request has likely drained."""
+        hold_s = (self._hold_ms if self._hold_ms is not None else 1000) / 1000
+        return max(1, math.ceil(hold_s * (self.queued() + 1) / self.max_in_flight))
+
+    async def acquire(self, priority: str = INTERACTIVE) -> float:
+        """Wait for a slot and return when it was granted, for ``release``."""
+        if self._in_flight < self.max_in_flight and not self.queued():
+            self._in_flight += 1
+            self.metrics["admitted_total"] += 1
+            return time.perf_counter()
+
+        self._make_room(priority)
+        future = asyncio.get_running_loop().create_future()
+        self._waiters[priority].append(future)
+        self.metrics["queued_total"] += 1
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(future, self.queue_timeout)
+        except asyncio.TimeoutError:
+            self._forget(priority, future)
+            self.metrics["rejected_timeout"] += 1
+            raise AdmissionRejected("queue_timeout", self.retry_after())
+        except AdmissionRejected:
+            raise
+        except asyncio.CancelledError:
+            self._forget(priority, future)
+            # The slot may have been handed over just as the client went away
+            if future.done() and not future.cancelled() and future.exception() is None:
+                self.release(time.perf_counter())
+            raise
+        admitted_at = time.perf_counter()
+        self._average("_wait_ms", (admitted_at - start) * 1000)
+        self.metrics["admitted_total"] += 1
+        return admitted_at
+
+    def release(self, admitted_at: float):
+        """Give the slot to the next waiter, interactive first, or free it."""
+        self._average("_hold_ms", (time.perf_counter() - admitted_at) * 1000)
+        for priority in (INTERACTIVE, BATCH):
+            waiters = self._waiters[priority]
+            while waiters:
+                future = waiters.popleft()
+                if not future.done():
+                    future.set_result(None)  # the slot passes on, so _in_flight is unchanged
+                    return
+        self._in_flight -= 1
+
+    def _make_room(self, priority: str):
+        queued = self.queued()
+        if priority == BATCH:
+            if queued >= self.max_queue or len(self._waiters[BATCH]) >= self.batch_max_queue:
+                self.metrics["rejected_queue_full"] += 1
+                raise AdmissionRejected("queue_full", self.retry_after())
+        elif queued >= self.max_queue:
+            if not self._waiters[BATCH]:
+                self.metrics["rejected_queue_full"] += 1
+                raise AdmissionRejected("queue_full", self.retry_after())
+            evicted = self._waiters[BATCH].pop()
+            self.metrics["rejected_evicted"] += 1
+            evicted.set_exception(AdmissionRejected("evicted", self.retry_after()))
+
+    def _forget(self, priority: str, future):
+        try:
+            self._waiters[priority].remove(future)
+        except ValueError:
+            pass
+
+    def _average(self, attribute: str, value: float, weight: float = 0.2):
+        previous = getattr(self, attribute)
+        setattr(self, attribute, value if previous is None else previous + weight * (value - previous))
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": self._in_flight,
+            "queued_interactive": len(self._waiters[INTERACTIVE]),
+            "queued_batch": len(self._waiters[BATCH]),
+            "max_in_flight": self.max_in_flight,
+            "max_queue": self.max_queue,
+            "batch_max_queue": self.batch_max_queue,
+            "queue_timeout": self.queue_timeout,
+            "average_hold_ms": round(self._hold_ms, 1) if self._hold_ms is not None else None,
+            "average_wait_ms": round(self._wait_ms, 1) if self._wait_ms is not None else None,
+            "retry_after": self.retry_after(),
+            **self.metrics,
+        }
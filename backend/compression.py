@@ -0,0 +1,152 @@
+"""ASGI middleware that compresses text responses with brotli or gzip."""
+import zlib
+from typing import Iterable, Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip is always available
+    brotli = None
+
+COMPRESSIBLE_TYPES = (
+    "application/json",
+    "application/x-ndjson",
+    "application/problem+json",
+    "application/javascript",
+    "application/xml",
+    "image/svg+xml",
+    "text/",
+)
+
+
+def available_encodings() -> list:
+    """Encodings this server can produce, most preferred first."""
+    return (["br"] if brotli is not None else []) + ["gzip"]
+
+
+def negotiate_encoding(accept_encoding: str, available: Iterable[str]) -> Optional[str]:
+    """Pick the encoding with the highest q-value in Accept-Encoding, ties going to server order."""
+    qualities = {}
+    for part in accept_encoding.split(","):
+        token, _, params = part.partition(";")
+        token = token.strip().lower()
+        if not token:
+            continue
+        quality = 1.0
+        for param in params.split(";"):
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[token] = quality
+    best, best_quality = None, 0.0
+    for encoding in available:
+        quality = qualities.get(encoding, qualities.get("*", 0.0))
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def is_compressible(content_type: str) -> bool:
+    return content_type.split(";")[0].strip().lower().startswith(COMPRESSIBLE_TYPES)
+
+
+class _GzipEncoder:
+    def __init__(self, level: int):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)  # wbits 31: gzip container
+
+    def encode(self, data: bytes, final: bool) -> bytes:
+        out = self._compressor.compress(data)
+        return out + self._compressor.flush() if final else out
+
+
+class _BrotliEncoder:
+    def __init__(self, quality: int):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def encode(self, data: bytes, final: bool) -> bytes:
+        out = self._compressor.process(data)
+        return out + self._compressor.finish() if final else out
+
+
+class CompressionMiddleware:
+    """Compresses JSON and other text responses according to Accept-Encoding.
+
+    Single-body responses are compressed only when they are at least
+    ``minimum_size`` bytes, since small bodies gain little and cost a
+    round of CPU. Streaming responses of a compressible type are always
+    compressed, without intermediate flushes. Responses that already have a
+    Content-Encoding, or that are binary such as PDFs and ZIPs, pass through
+    untouched.
+    """
+
+    def __init__(self, app, minimum_size: int = 1024, gzip_level: int = 6, brotli_quality: int = 4):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.encodings = available_encodings()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding", ""), self.encodings)
+        responder = _CompressingResponder(self, encoding, send)
+        await self.app(scope, receive, responder.send)
+
+    def encoder(self, encoding: str):
+        if encoding == "br":
+            return _BrotliEncoder(self.brotli_quality)
+        return _GzipEncoder(self.gzip_level)
+
+
+class _CompressingResponder:
+    """Holds back the response start until the first body chunk shows whether to compress."""
+
+    def __init__(self, middleware: CompressionMiddleware, encoding: Optional[str], send):
+        self.middleware = middleware
+        self.encoding = encoding
+        self._send = send
+        self._start = None
+        self._encoder = None
+        self._started = False
+
+    async def send(self, message):
+        message_type = message["type"]
+        if message_type == "http.response.start":
+            self._start = message
+            return
+        if message_type != "http.response.body" or self._started:
+            if self._encoder is not None and message_type == "http.response.body":
+                more_body = message.get("more_body", False)
+                message = {**message, "body": self._encoder.encode(message.get("body", b""), final=not more_body)}
+            await self._send(message)
+            return
+
+        self._started = True
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        headers = MutableHeaders(raw=self._start["headers"])
+        eligible = (
+            self._start["status"] not in (204, 304)
+            and "content-encoding" not in headers
+            and is_compressible(headers.get("content-type", ""))
+            and (more_body or len(body) >= self.middleware.minimum_size)
+        )
+        if eligible:
+            # The body now depends on Accept-Encoding, whether or not this client gets it compressed
+            headers.add_vary_header("Accept-Encoding")
+            if self.encoding is not None:
+                self._encoder = self.middleware.encoder(self.encoding)
+                body = self._encoder.encode(body, final=not more_body)
+                headers["Content-Encoding"] = self.encoding
+                if more_body:
+                    del headers["Content-Length"]
+                else:
+                    headers["Content-Length"] = str(len(body))
+        await self._send(self._start)
+        await self._send({**message, "body": body})
@@ -0,0 +1,70 @@
+"""Validators and 304 responses for conditional GETs."""
+import hashlib
+import hmac
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Optional
+
+from starlette.responses import Response
+
+
+def opaque_tag(etag: str) -> str:
+    return etag.strip().removeprefix("W/")
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Check an If-None-Match header (which may list several tags) against an ETag."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # If-None-Match uses weak comparison, so W/ prefixes are ignored
+    return any(opaque_tag(tag) == opaque_tag(etag) for tag in if_none_match.split(","))
+
+
+def content_etag(body: bytes) -> str:
+    """Weak ETag for a serialized body; weak because compressed variants share it."""
+    return f'W/"{hashlib.sha256(body).hexdigest()[:32]}"'
+
+
+def keyed_etag(secret: bytes, *parts: str) -> str:
+    """Weak ETag derived from identifiers alone, so it can be checked before loading anything.
+
+    Keyed with a server secret so clients cannot forge tags for resources
+    they have never been served.
+    """
+    digest = hmac.new(secret, "\x1f".join(parts).encode(), hashlib.sha256).hexdigest()[:32]
+    return f'W/"{digest}"'
+
+
+def http_date(value: datetime) -> str:
+    """Format a datetime (naive values are UTC, as stored) as an HTTP-date."""
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return format_datetime(value.astimezone(timezone.utc), usegmt=True)
+
+
+def not_modified_since(if_modified_since: Optional[str], last_modified: datetime) -> bool:
+    """True if If-Modified-Since is at or after last_modified, compared at HTTP-date precision."""
+    if not if_modified_since:
+        return False
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    if last_modified.tzinfo is None:
+        last_modified = last_modified.replace(tzinfo=timezone.utc)
+    return last_modified.replace(microsecond=0) <= since
+
+
+def cache_headers(etag: str, cache_control: str, last_modified: Optional[datetime] = None) -> dict:
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if last_modified is not None:
+        headers["Last-Modified"] = http_date(last_modified)
+    return headers
+
+
+def not_modified(headers: dict) -> Response:
+    return Response(status_code=304, headers=headers)
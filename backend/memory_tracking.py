@@ -0,0 +1,186 @@
+"""tracemalloc-based peak allocation tracking per route."""
+import linecache
+import logging
+import random
+import threading
+import tracemalloc
+from contextlib import contextmanager
+from typing import Callable, List, Optional, Tuple
+
+from tracing import route_template
+
+logger = logging.getLogger(__name__)
+
+# Allocations made by tracemalloc and this module are not the request's
+_IGNORED_FILES = (tracemalloc.__file__, linecache.__file__, __file__)
+
+
+def measure_peak(func: Callable, *args, **kwargs) -> Tuple[object, int]:
+    """Call ``func`` and return (its result, peak bytes allocated above what was live before).
+
+    Starts tracemalloc for the call if it is not already tracing.
+    """
+    started = not tracemalloc.is_tracing()
+    if started:
+        tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        baseline = tracemalloc.get_traced_memory()[0]
+        result = func(*args, **kwargs)
+        return result, tracemalloc.get_traced_memory()[1] - baseline
+    finally:
+        if started:
+            tracemalloc.stop()
+
+
+def top_sites(before: tracemalloc.Snapshot, after: tracemalloc.Snapshot, limit: int) -> List[dict]:
+    """Source lines whose live allocations grew the most between two snapshots."""
+    filters = [tracemalloc.Filter(False, filename) for filename in _IGNORED_FILES]
+    diff = after.filter_traces(filters).compare_to(before.filter_traces(filters), "lineno")
+    return [
+        {
+            "site": f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+            "size_bytes": stat.size_diff,
+            "count": stat.count_diff,
+        }
+        for stat in diff[:limit]
+        if stat.size_diff > 0
+    ]
+
+
+class MemoryTracker:
+    """Records the peak traced allocation of sampled requests, per route.
+
+    A sampled request gets tracemalloc's peak reset as it starts, and its
+    peak is the high-water mark above what was live at that point.
+    Snapshots taken before and after it give the source lines whose
+    allocations were still live at the end, which is where leaks and
+    caches show up. Only one request is measured at a time, since the peak
+    is process wide. Requests running concurrently on the event loop still
+    add to it, so a route's peak is an upper bound. For each route the
+    sites of its largest sample are kept.
+
+    Tracing every allocation slows the process down noticeably, so nothing
+    is recorded until ``start`` is called. Each snapshot also holds up the
+    event loop for time proportional to the number of live allocations;
+    with ``top_sites=0`` no snapshots are taken and only peaks are recorded.
+    """
+
+    def __init__(self, sample_rate: float = 0.05, top_sites: int = 10, traceback_frames: int = 1, max_routes: int = 200):
+        self.sample_rate = sample_rate
+        self.top_sites = top_sites
+        self.traceback_frames = traceback_frames
+        self.max_routes = max_routes
+        self._lock = threading.Lock()
+        self._measuring = False
+        self._routes = {}  # route -> stats dict
+
+    @property
+    def enabled(self) -> bool:
+        return tracemalloc.is_tracing()
+
+    def start(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.traceback_frames)
+
+    def stop(self):
+        tracemalloc.stop()
+
+    def sampled(self) -> bool:
+        return random.random() < self.sample_rate
+
+    @contextmanager
+    def measure(self):
+        """Measure the block if tracing is on, it is sampled and no other block is being measured.
+
+        Yields a dict to be given the route name under ``"route"``, or None
+        when the block is not measured.
+        """
+        if not self.enabled or not self.sampled():
+            yield None
+            return
+        with self._lock:
+            busy, self._measuring = self._measuring, True
+        if busy:
+            yield None
+            return
+        measurement = {}
+        try:
+            before = tracemalloc.take_snapshot() if self.top_sites else None
+            tracemalloc.reset_peak()
+            baseline = tracemalloc.get_traced_memory()[0]
+            yield measurement
+            current, peak = tracemalloc.get_traced_memory()
+            route = measurement.get("route")
+            if route and tracemalloc.is_tracing():
+                sites = (lambda: top_sites(before, tracemalloc.take_snapshot(), self.top_sites)) if before is not None else None
+                self.record(route, peak - baseline, current - baseline, sites)
+        finally:
+            with self._lock:
+                self._measuring = False
+
+    def record(self, route: str, peak_bytes: int, retained_bytes: int = 0, sites: Optional[Callable[[], List[dict]]] = None):
+        """Add a sample; ``sites`` is only called when the sample is the route's largest so far."""
+        stats = self._routes.get(route)
+        if stats is None:
+            if len(self._routes) >= self.max_routes:
+                return
+            stats = self._routes[route] = {
+                "samples": 0,
+                "peak_bytes_max": 0,
+                "peak_bytes_total": 0,
+                "retained_bytes_total": 0,
+                "top_sites": [],
+            }
+        stats["samples"] += 1
+        stats["peak_bytes_total"] += peak_bytes
+        stats["retained_bytes_total"] += retained_bytes
+        if peak_bytes >= stats["peak_bytes_max"]:
+            stats["peak_bytes_max"] = peak_bytes
+            if sites is not None:
+                stats["top_sites"] = sites()
+
+    def reset(self):
+        self._routes.clear()
+
+    def stats(self) -> dict:
+        current, peak = tracemalloc.get_traced_memory() if self.enabled else (0, 0)
+        routes = {
+            route: {
+                "samples": stats["samples"],
+                "peak_bytes_max": stats["peak_bytes_max"],
+                "peak_bytes_avg": round(stats["peak_bytes_total"] / stats["samples"]),
+                "retained_bytes_avg": round(stats["retained_bytes_total"] / stats["samples"]),
+                "top_sites": stats["top_sites"],
+            }
+            for route, stats in sorted(self._routes.items(), key=lambda item: item[1]["peak_bytes_max"], reverse=True)
+        }
+        return {
+            "enabled": self.enabled,
+            "sample_rate": self.sample_rate,
+            "traced_current_bytes": current,
+            "traced_peak_bytes": peak,
+            "routes": routes,
+        }
+
+
+class MemoryTrackingMiddleware:
+    """Measures sampled requests with a MemoryTracker under "METHOD /route/{template}"."""
+
+    def __init__(self, app, tracker: MemoryTracker):
+        self.app = app
+        self.tracker = tracker
+        self._route_paths = {}  # endpoint -> route path template
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.tracker.enabled:
+            await self.app(scope, receive, send)
+            return
+        with self.tracker.measure() as measurement:
+            try:
+                await self.app(scope, receive, send)
+            finally:
+                if measurement is not None:
+                    route_path = route_template(scope, self._route_paths)
+                    if route_path:
+                        measurement["route"] = f"{scope['method']} {route_path}"
@@ -0,0 +1,160 @@
+"""Near-duplicate lookup for lesson plan requests using MinHash signatures and LSH."""
+import hashlib
+import random
+from collections import OrderedDict, defaultdict
+from typing import List, Optional, Tuple
+
+from search_index import STOPWORDS, TOKEN_RE, stem
+
+# Common shorthand in subject and topic names, expanded before comparing
+ABBREVIATIONS = {
+    "intro": "introduction",
+    "db": "database",
+    "dbs": "databases",
+    "dbms": "database management systems",
+    "prog": "programming",
+    "eng": "engineering",
+    "mgmt": "management",
+    "adv": "advanced",
+    "fund": "fundamentals",
+    "oop": "object oriented programming",
+    "ml": "machine learning",
+    "ai": "artificial intelligence",
+    "os": "operating systems",
+    "se": "software engineering",
+    "hci": "human computer interaction",
+}
+ROMAN_NUMERALS = {"i", "ii", "iii", "iv", "v", "vi", "vii", "viii", "ix", "x"}
+
+# Fuzzy fields and their share of the similarity score
+FIELD_WEIGHTS = {"subject_name": 0.3, "lecture_topic": 0.5, "focus_topic": 0.2}
+# A plan for another level or duration is never a substitute, however close the topic
+EXACT_FIELDS = ("blooms_taxonomy", "aqf_level", "lesson_duration")
+
+_PRIME = (1 << 61) - 1
+
+
+def normalize(text: Optional[str]) -> str:
+    words = []
+    for token in TOKEN_RE.findall((text or "").lower()):
+        words.extend(ABBREVIATIONS.get(token, token).split())
+    return " ".join(stem(word) for word in words if word not in STOPWORDS)
+
+
+def numbers(normalized: str) -> frozenset:
+    """Numbers and roman numerals, which must agree: "Calculus II" is not "Calculus I"."""
+    return frozenset(word for word in normalized.split() if word.isdigit() or word in ROMAN_NUMERALS)
+
+
+def shingles(normalized: str, size: int = 3) -> set:
+    padded = f" {normalized} "
+    return {padded[i:i + size] for i in range(max(1, len(padded) - size + 1))}
+
+
+def field_similarity(a: str, b: str) -> float:
+    if a == b:
+        return 1.0
+    if not a or not b or numbers(a) != numbers(b):
+        return 0.0
+    a_shingles, b_shingles = shingles(a), shingles(b)
+    return len(a_shingles & b_shingles) / len(a_shingles | b_shingles)
+
+
+def similarity(a: dict, b: dict) -> float:
+    """Weighted character-trigram Jaccard similarity of two normalized requests."""
+    return sum(weight * field_similarity(a[field], b[field]) for field, weight in FIELD_WEIGHTS.items())
+
+
+class NearDuplicateIndex:
+    """Finds earlier lesson plan requests that are near-duplicates of a new one.
+
+    Requests are compared on their normalized subject, lecture topic and
+    focus topic, and only against requests in the same scope (usually the
+    owner) with the same Bloom's level, AQF level and duration. Candidates
+    come from locality-sensitive hashing of MinHash signatures over
+    character trigrams, then are scored exactly with ``similarity``, so a
+    lookup touches a handful of entries rather than every stored plan.
+
+    ``bands`` x ``rows`` hash functions are used; with the defaults a pair
+    whose trigram sets overlap by half is found about 65% of the time, and
+    by 0.8 almost always. The oldest entries are dropped beyond
+    ``max_entries``.
+    """
+
+    def __init__(self, threshold: float = 0.85, bands: int = 16, rows: int = 4, max_entries: int = 50000, seed: int = 1):
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = rows
+        self.max_entries = max_entries
+        rng = random.Random(seed)
+        self._hash_params = [(rng.randrange(1, _PRIME), rng.randrange(_PRIME)) for _ in range(bands * rows)]
+        self._entries = OrderedDict()  # plan id -> (partition, normalized fields, request data, band keys)
+        self._buckets = defaultdict(set)  # (partition, band, band hash) -> plan ids
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def _partition(scope: Optional[str], request: dict) -> tuple:
+        return (scope,) + tuple((request.get(field) or "").strip().lower() for field in EXACT_FIELDS)
+
+    @staticmethod
+    def _normalized(request: dict) -> dict:
+        return {field: normalize(request.get(field)) for field in FIELD_WEIGHTS}
+
+    def _band_keys(self, partition: tuple, normalized: dict) -> List[tuple]:
+        hashes = [
+            int.from_bytes(hashlib.blake2b(f"{field}:{gram}".encode(), digest_size=8).digest(), "little")
+            for field in FIELD_WEIGHTS
+            for gram in shingles(normalized[field])
+        ]
+        signature = [min((a * h + b) % _PRIME for h in hashes) for a, b in self._hash_params]
+        return [
+            (partition, band, hash(tuple(signature[band * self.rows:(band + 1) * self.rows])))
+            for band in range(self.bands)
+        ]
+
+    def add(self, plan_id: str, scope: Optional[str], request: dict):
+        self.remove(plan_id)
+        partition = self._partition(scope, request)
+        normalized = self._normalized(request)
+        band_keys = self._band_keys(partition, normalized)
+        for key in band_keys:
+            self._buckets[key].add(plan_id)
+        self._entries[plan_id] = (partition, normalized, request, band_keys)
+        while len(self._entries) > self.max_entries:
+            self.remove(next(iter(self._entries)))
+
+    def remove(self, plan_id: str):
+        entry = self._entries.pop(plan_id, None)
+        if entry is None:
+            return
+        for key in entry[3]:
+            bucket = self._buckets[key]
+            bucket.discard(plan_id)
+            if not bucket:
+                del self._buckets[key]
+
+    def query(self, scope: Optional[str], request: dict, limit: int = 5) -> List[Tuple[float, str, dict]]:
+        """Return [(score, plan id, request data)] at or above the threshold, best first."""
+        partition = self._partition(scope, request)
+        normalized = self._normalized(request)
+        candidates = set()
+        for key in self._band_keys(partition, normalized):
+            candidates |= self._buckets.get(key, set())
+        matches = []
+        for plan_id in candidates:
+            _, other, request_data, _ = self._entries[plan_id]
+            score = similarity(normalized, other)
+            if score >= self.threshold:
+                matches.append((round(score, 4), plan_id, request_data))
+        matches.sort(key=lambda match: match[0], reverse=True)
+        return matches[:limit]
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "buckets": len(self._buckets),
+            "threshold": self.threshold,
+            "max_entries": self.max_entries,
+        }
@@ -0,0 +1,132 @@
+"""Page fingerprints and merging for incremental re-extraction of revised outlines."""
+import hashlib
+import re
+from typing import Dict, List, Optional, Tuple
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+
+def _words(text: str) -> str:
+    return " ".join(_WORD_RE.findall((text or "").lower()))
+
+
+def page_fingerprint(page_text: str) -> str:
+    """Hash of a page's words, so changes to spacing or punctuation alone do not count."""
+    return hashlib.sha256(_words(page_text).encode()).hexdigest()[:16]
+
+
+def topics_on_page(page_text: str, topics: List[str]) -> List[str]:
+    """The topics whose words appear, in order, on a page."""
+    page_words = f" {_words(page_text)} "
+    return [topic for topic in topics if _words(topic) and f" {_words(topic)} " in page_words]
+
+
+def shared_page_count(previous_pages: List[dict], fingerprints: List[str]) -> int:
+    previous = {page["fingerprint"] for page in previous_pages}
+    return sum(1 for fingerprint in set(fingerprints) if fingerprint in previous)
+
+
+def changed_pages(previous_pages: List[dict], fingerprints: List[str]) -> List[int]:
+    """Indexes of pages that are new or edited relative to the previous upload.
+
+    Pages are matched by fingerprint rather than position, so inserting or
+    removing a page does not make every page after it count as changed.
+    """
+    previous = {page["fingerprint"] for page in previous_pages}
+    return [index for index, fingerprint in enumerate(fingerprints) if fingerprint not in previous]
+
+
+def merge_revision(previous: dict, page_texts: List[str], fingerprints: List[str], changed: List[int],
+                   partial: dict) -> Tuple[dict, dict]:
+    """Merge a partial extraction of the changed pages into the previous extraction.
+
+    ``previous`` has subject_names, lecture_topics, lecture_focus_mapping and
+    pages (fingerprint and topics per page); ``partial`` has the first three
+    for the changed pages only. Previous topics whose pages are all gone and
+    that the partial extraction did not find again are dropped. Returns
+    (merged extraction including its pages, changes) where changes lists
+    the added, removed and modified topics.
+    """
+    previous_topics = previous.get("lecture_topics", [])
+    previous_mapping = previous.get("lecture_focus_mapping", {})
+    partial_topics = [topic for topic in partial.get("lecture_topics", []) if isinstance(topic, str)]
+    partial_mapping = partial.get("lecture_focus_mapping") or {}
+    if not isinstance(partial_mapping, dict):
+        partial_mapping = {}
+
+    # Topics per page: carried over for unchanged pages, found in the text of changed ones
+    topics_by_fingerprint: Dict[str, List[str]] = {}
+    for page in previous.get("pages", []):
+        topics_by_fingerprint.setdefault(page["fingerprint"], page.get("topics", []))
+    changed_set = set(changed)
+    pages = []
+    placed = set()
+    for index, (text, fingerprint) in enumerate(zip(page_texts, fingerprints)):
+        if index in changed_set:
+            topics = topics_on_page(text, partial_topics)
+        else:
+            topics = topics_by_fingerprint.get(fingerprint, [])
+        placed.update(topics)
+        pages.append({"fingerprint": fingerprint, "topics": topics})
+    # A partial topic not found verbatim on any page still belongs to the changed pages
+    if changed:
+        unplaced = [topic for topic in partial_topics if topic not in placed]
+        pages[changed[0]]["topics"] = pages[changed[0]]["topics"] + unplaced
+        placed.update(unplaced)
+
+    # Topics the previous extraction could not tie to a page are kept where they were
+    attributed = {topic for page in previous.get("pages", []) for topic in page.get("topics", [])}
+    first_page = {}
+    for index, page in enumerate(pages):
+        for topic in page["topics"]:
+            first_page.setdefault(topic, index)
+    order = []
+    page_index = 0
+    for position, topic in enumerate(previous_topics):
+        if topic in first_page:
+            page_index = first_page[topic]
+        elif topic in attributed:
+            continue  # its pages were removed or edited and it was not found again
+        order.append((page_index, position, topic))
+    for position, topic in enumerate(partial_topics):
+        if topic not in previous_topics:
+            order.append((first_page.get(topic, changed[0] if changed else 0), len(previous_topics) + position, topic))
+    order.sort(key=lambda item: item[:2])
+    lecture_topics = list(dict.fromkeys(topic for _, _, topic in order))
+
+    lecture_focus_mapping = {}
+    for topic in lecture_topics:
+        if topic in partial_mapping:
+            lecture_focus_mapping[topic] = partial_mapping[topic]
+        elif topic in previous_mapping:
+            lecture_focus_mapping[topic] = previous_mapping[topic]
+        else:
+            lecture_focus_mapping[topic] = []
+    subject_names = list(dict.fromkeys(previous.get("subject_names", []) + partial.get("subject_names", [])))
+
+    kept = set(lecture_topics)
+    changes = {
+        "added_topics": [topic for topic in lecture_topics if topic not in previous_topics],
+        "removed_topics": [topic for topic in previous_topics if topic not in kept],
+        "modified_topics": [
+            topic for topic in lecture_topics
+            if topic in previous_mapping and lecture_focus_mapping[topic] != previous_mapping[topic]
+        ],
+    }
+    merged = {
+        "subject_names": subject_names,
+        "lecture_topics": lecture_topics,
+        "lecture_focus_mapping": lecture_focus_mapping,
+        "pages": pages,
+    }
+    return merged, changes
+
+
+def best_previous_extraction(candidates: List[dict], fingerprints: List[str]) -> Optional[dict]:
+    """The candidate sharing the most pages with this upload (newest wins ties), if any."""
+    best, best_shared = None, 0
+    for candidate in candidates:
+        shared = shared_page_count(candidate.get("pages") or [], fingerprints)
+        if shared > best_shared:
+            best, best_shared = candidate, shared
+    return best
@@ -0,0 +1,101 @@
+"""Disk-backed LRU cache of rendered lesson plan PDFs."""
+import logging
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class PDFCache:
+    """Stores rendered PDFs on local disk, keyed by lesson plan id and content hash.
+
+    Entries are written to a temporary file in the cache directory and moved
+    into place with ``os.replace``, so readers never see a partial PDF. Reads
+    touch the file's mtime, which makes mtimes the recency order.
+
+    Several worker processes may share the directory, so nothing about its
+    contents is kept in memory: every read goes to the file, and after each
+    write the directory is scanned and the least recently used entries are
+    removed until all workers' entries together fit in ``max_bytes``.
+    Temporary files are only removed once they are ``temp_grace_seconds``
+    old, since a younger one may be a sibling's write in progress.
+    """
+
+    def __init__(self, directory: str, max_bytes: int, temp_grace_seconds: float = 300):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.temp_grace_seconds = temp_grace_seconds
+        self._lock = threading.Lock()
+        self.directory.mkdir(parents=True, exist_ok=True)
+        entries = self._evict()
+        logger.info(f"PDF cache ready at {self.directory}: {len(entries)} entries, {sum(size for _, _, size in entries)} bytes")
+
+    @staticmethod
+    def _filename(lesson_plan_id: str, content_hash: str) -> str:
+        return f"{lesson_plan_id}-{content_hash}.pdf"
+
+    def get(self, lesson_plan_id: str, content_hash: str) -> Optional[bytes]:
+        """Return the cached PDF bytes, or None on a miss."""
+        path = self.directory / self._filename(lesson_plan_id, content_hash)
+        try:
+            data = path.read_bytes()
+            os.utime(path)
+        except FileNotFoundError:
+            # Never written, or evicted by any worker sharing the directory
+            return None
+        return data
+
+    def put(self, lesson_plan_id: str, content_hash: str, data: bytes) -> Path:
+        """Atomically write a rendered PDF into the cache."""
+        path = self.directory / self._filename(lesson_plan_id, content_hash)
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as temp_file:
+                temp_file.write(data)
+            os.replace(temp_path, path)
+        except BaseException:
+            Path(temp_path).unlink(missing_ok=True)
+            raise
+        self._evict(keep=path.name)
+        return path
+
+    def _scan(self) -> List[Tuple[float, str, int]]:
+        """(mtime, filename, size) of every cached PDF, oldest first; removes stale temporary files."""
+        entries = []
+        stale_before = time.time() - self.temp_grace_seconds
+        with os.scandir(self.directory) as scan:
+            for entry in scan:
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue  # removed by another worker since the listing
+                if entry.name.endswith('.pdf'):
+                    entries.append((stat.st_mtime, entry.name, stat.st_size))
+                elif entry.name.endswith('.tmp') and stat.st_mtime < stale_before:
+                    # Left behind by a render that died mid-write
+                    Path(entry.path).unlink(missing_ok=True)
+        entries.sort()
+        return entries
+
+    def _evict(self, keep: Optional[str] = None) -> List[Tuple[float, str, int]]:
+        """Drop least recently used entries until the directory fits in max_bytes; returns what is left."""
+        with self._lock:
+            entries = self._scan()
+            total = sum(size for _, _, size in entries)
+            kept = []
+            for entry in entries:
+                _, name, size = entry
+                if total > self.max_bytes and name != keep:
+                    (self.directory / name).unlink(missing_ok=True)
+                    total -= size
+                else:
+                    kept.append(entry)
+            return kept
+
+    def stats(self) -> dict:
+        entries = self._scan()
+        return {"entries": len(entries), "bytes": sum(size for _, _, size in entries), "max_bytes": self.max_bytes}
@@ -0,0 +1,182 @@
+"""On-demand cProfile capture of single requests, kept in a bounded directory."""
+import contextvars
+import cProfile
+import io
+import logging
+import pstats
+import re
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, List, Optional
+
+import orjson
+from starlette.datastructures import Headers, MutableHeaders, QueryParams
+
+logger = logging.getLogger(__name__)
+
+_profile_name = contextvars.ContextVar("profile_name", default=None)
+_NAME_RE = re.compile(r"^[0-9]{8}T[0-9]{6}-[0-9a-f]{8}-[a-z0-9_-]+$")
+SORT_KEYS = ("cumulative", "tottime", "ncalls", "pcalls", "filename", "name")
+
+
+def _slug(text: str) -> str:
+    return re.sub(r"[^a-z0-9]+", "-", text.lower()).strip("-")[:60] or "request"
+
+
+class RequestProfiler:
+    """Runs one request at a time under cProfile and saves the stats as ``<name>.prof``.
+
+    Each profile has a ``<name>.json`` sidecar with the request line, status,
+    duration and trace id. Only the newest ``max_profiles`` are kept, and
+    older ones are also dropped once the directory exceeds ``max_bytes``.
+
+    cProfile hooks the thread, not the request, so a profile of an async
+    route also contains whatever else the event loop ran meanwhile; work
+    handed to thread or process pools is not in it at all.
+    """
+
+    def __init__(self, directory: str, max_profiles: int = 50, max_bytes: int = 100 * 1024 * 1024):
+        self.directory = Path(directory)
+        self.max_profiles = max_profiles
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._active = None  # name of the running profile
+
+    def is_profiling(self) -> bool:
+        """Whether the current request is being profiled.
+
+        Tasks started by a profiled request inherit its context, so this also
+        checks the profile is still running.
+        """
+        name = _profile_name.get()
+        return name is not None and name == self._active
+
+    @contextmanager
+    def profile(self, label: str):
+        """Profile the block and yield its metadata dict, or None when a profile is already running.
+
+        Fill in the yielded dict to have it saved alongside the stats.
+        """
+        name = f"{datetime.now(timezone.utc):%Y%m%dT%H%M%S}-{secrets.token_hex(4)}-{_slug(label)}"
+        with self._lock:
+            busy = self._active is not None
+            if not busy:
+                self._active = name
+        if busy:
+            yield None
+            return
+        metadata = {"name": name, "label": label}
+        profiler = cProfile.Profile()
+        token = _profile_name.set(name)
+        start = time.perf_counter()
+        profiler.enable()
+        try:
+            yield metadata
+        finally:
+            profiler.disable()
+            metadata["duration_ms"] = round((time.perf_counter() - start) * 1000, 3)
+            metadata["created_at"] = datetime.now(timezone.utc).isoformat()
+            _profile_name.reset(token)
+            try:
+                self._save(name, profiler, metadata)
+            except OSError as e:
+                logger.warning(f"Could not save profile {name}: {str(e)}")
+            finally:
+                with self._lock:
+                    self._active = None
+
+    def _save(self, name: str, profiler: cProfile.Profile, metadata: dict):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        profiler.dump_stats(str(self.directory / f"{name}.prof"))
+        (self.directory / f"{name}.json").write_bytes(orjson.dumps(metadata))
+        self._prune()
+        logger.info(f"Saved profile {name} ({metadata['duration_ms']} ms)")
+
+    def _prune(self):
+        profiles = sorted(self.directory.glob("*.prof"), key=lambda path: path.name, reverse=True)
+        total = 0
+        for index, path in enumerate(profiles):
+            total += path.stat().st_size
+            if index >= self.max_profiles or (index > 0 and total > self.max_bytes):
+                path.unlink(missing_ok=True)
+                path.with_suffix(".json").unlink(missing_ok=True)
+
+    def list(self) -> List[dict]:
+        """Saved profiles, newest first."""
+        if not self.directory.is_dir():
+            return []
+        profiles = []
+        for path in sorted(self.directory.glob("*.prof"), key=lambda path: path.name, reverse=True):
+            try:
+                metadata = orjson.loads(path.with_suffix(".json").read_bytes())
+            except (OSError, orjson.JSONDecodeError):
+                metadata = {"name": path.stem}
+            profiles.append({**metadata, "size_bytes": path.stat().st_size})
+        return profiles
+
+    def path(self, name: str) -> Optional[Path]:
+        """The stats file for a listed profile name, or None; other names never reach the filesystem."""
+        if not _NAME_RE.match(name):
+            return None
+        path = self.directory / f"{name}.prof"
+        return path if path.is_file() else None
+
+    def report(self, name: str, sort: str = "cumulative", limit: int = 50) -> Optional[str]:
+        """The pstats table of the top ``limit`` functions by ``sort``."""
+        path = self.path(name)
+        if path is None:
+            return None
+        out = io.StringIO()
+        pstats.Stats(str(path), stream=out).strip_dirs().sort_stats(sort).print_stats(limit)
+        return out.getvalue()
+
+
+class ProfilingMiddleware:
+    """Profiles a request sent with ``X-Profile: 1`` or ``?profile=1`` and an admin token.
+
+    ``authorize`` receives the X-Admin-Token header value. Without a valid
+    token the flag is ignored and the request runs normally. The response
+    carries the profile name in X-Profile-Id, or ``X-Profile: busy`` when
+    another profile was already running.
+    """
+
+    def __init__(self, app, profiler: RequestProfiler, authorize: Callable[[Optional[str]], bool],
+                 trace_id: Callable[[], Optional[str]] = lambda: None):
+        self.app = app
+        self.profiler = profiler
+        self.authorize = authorize
+        self.trace_id = trace_id
+
+    @staticmethod
+    def _requested(scope, headers: Headers) -> bool:
+        flag = headers.get("x-profile") or QueryParams(scope.get("query_string", b"")).get("profile")
+        return (flag or "").strip().lower() in ("1", "true", "yes")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        headers = Headers(scope=scope)
+        if not self._requested(scope, headers) or not self.authorize(headers.get("x-admin-token")):
+            await self.app(scope, receive, send)
+            return
+
+        method, path = scope["method"], scope["path"]
+        with self.profiler.profile(f"{method} {path}") as metadata:
+            async def send_with_profile_id(message):
+                if message["type"] == "http.response.start":
+                    response_headers = MutableHeaders(scope=message)
+                    if metadata is None:
+                        response_headers["X-Profile"] = "busy"
+                    else:
+                        metadata["status"] = message["status"]
+                        response_headers["X-Profile-Id"] = metadata["name"]
+                await send(message)
+
+            if metadata is not None:
+                metadata.update(method=method, path=path, trace_id=self.trace_id())
+            await self.app(scope, receive, send_with_profile_id)
@@ -0,0 +1,109 @@
+"""In-process inverted index used when MongoDB text search is unavailable."""
+import math
+import re
+import threading
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "in", "into", "is", "it",
+    "of", "on", "or", "that", "the", "their", "this", "to", "with",
+}
+
+
+def stem(token: str) -> str:
+    """Very light suffix stripping so plurals and -ing forms match their stem."""
+    for suffix in ("ing", "es", "s"):
+        if token.endswith(suffix) and len(token) - len(suffix) >= 3:
+            return token[:-len(suffix)]
+    return token
+
+
+def tokenize(text: str) -> List[str]:
+    return [stem(token) for token in TOKEN_RE.findall(text.lower()) if token not in STOPWORDS]
+
+
+def key_terms(text: str, limit: int, min_length: int = 4) -> str:
+    """Space-separated ``limit`` most frequent words of ``text``, for a compact searchable field.
+
+    Stopwords, numbers and words shorter than ``min_length`` are left out;
+    ties go to the word that appears first.
+    """
+    counts = Counter(
+        word for word in TOKEN_RE.findall(text.lower())
+        if len(word) >= min_length and word not in STOPWORDS and not word.isdigit()
+    )
+    return " ".join(sorted(word for word, _ in counts.most_common(limit)))
+
+
+class InvertedIndex:
+    """Per-owner inverted index with TF-IDF ranking.
+
+    Postings are partitioned by owner because every search is scoped to one
+    user, so a query only touches that user's documents. Each document is
+    added as a list of (text, weight) fields; a term's score is the sum of the
+    weights of the fields it appears in, times its IDF within the owner's
+    documents.
+    """
+
+    def __init__(self):
+        self._postings = defaultdict(lambda: defaultdict(dict))  # owner -> term -> {key: weight}
+        self._documents = {}  # key -> (owner_id, summary, terms)
+        self._owner_counts = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._documents)
+
+    def add(self, kind: str, doc_id: str, owner_id: Optional[str], fields: Iterable[Tuple[str, float]], summary: dict):
+        key = (kind, doc_id)
+        weights = defaultdict(float)
+        for text, weight in fields:
+            for term in tokenize(text or ""):
+                weights[term] += weight
+        with self._lock:
+            self._remove(key)
+            postings = self._postings[owner_id]
+            for term, weight in weights.items():
+                postings[term][key] = weight
+            self._documents[key] = (owner_id, summary, list(weights))
+            self._owner_counts[owner_id] += 1
+
+    def remove(self, kind: str, doc_id: str):
+        with self._lock:
+            self._remove((kind, doc_id))
+
+    def _remove(self, key):
+        entry = self._documents.pop(key, None)
+        if entry is None:
+            return
+        owner_id, _, terms = entry
+        self._owner_counts[owner_id] -= 1
+        postings = self._postings[owner_id]
+        for term in terms:
+            postings[term].pop(key, None)
+            if not postings[term]:
+                del postings[term]
+
+    def search(self, owner_id: Optional[str], query: str, kinds: Iterable[str], limit: int, offset: int = 0) -> Tuple[int, List[Tuple[float, str, dict]]]:
+        """Return (total matches, [(score, kind, summary)]) for one page, best first."""
+        kinds = set(kinds)
+        with self._lock:
+            postings = self._postings.get(owner_id)
+            if not postings:
+                return 0, []
+            document_count = self._owner_counts[owner_id] or 1
+            scores: Dict[tuple, float] = defaultdict(float)
+            for term in set(tokenize(query)):
+                matches = postings.get(term)
+                if not matches:
+                    continue
+                idf = math.log(1 + document_count / len(matches))
+                for key, weight in matches.items():
+                    if key[0] in kinds:
+                        scores[key] += weight * idf
+            ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+            page = [(score, key[0], self._documents[key][1]) for key, score in ranked[offset:offset + limit]]
+        return len(ranked), page
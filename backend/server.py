@@ -1,9 +1,8 @@
-from fastapi import FastAPI, APIRouter, UploadFile, File, HTTPException, Depends
-from fastapi.responses import FileResponse
+from fastapi import FastAPI, APIRouter, UploadFile, File, HTTPException, Depends, Header, Query
+from fastapi.responses import ORJSONResponse, Response, StreamingResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
-from motor.motor_asyncio import AsyncIOMotorClient
 import os
 import logging
 from pathlib import Path
@@ -12,30 +11,116 @@ from typing import List, Optional, Dict, Any
 import uuid
 from datetime import datetime, timedelta
 import asyncio
+import io
+import json
+import orjson
 import tempfile
 import shutil
-from pypdf import PdfReader
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import letter
-from reportlab.lib import colors
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
-from reportlab.lib.units import inch
+import zipfile
+import zlib
 import textwrap
-import jwt
 import hashlib
+import hmac
+import base64
+import secrets
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from contextlib import asynccontextmanager
+from functools import lru_cache
 
-# Import Google GenAI SDK
-from google import genai
-from google.genai import types
+# google.genai, ReportLab, pypdf and jwt are imported where they are used:
+# together they are most of the import time, and a cold start should not pay
+# for them before serving its first request (see warm_up below)
+
+from compression import CompressionMiddleware
+from http_cache import cache_headers, content_etag, etag_matches, keyed_etag, not_modified, not_modified_since
+from pdf_cache import PDFCache
+from profiling import SORT_KEYS, ProfilingMiddleware, RequestProfiler
+from memory_tracking import MemoryTracker, MemoryTrackingMiddleware, measure_peak
+from write_behind import WriteBehindBuffer
+from admission import BATCH, INTERACTIVE, AdmissionController, AdmissionRejected
+from near_duplicates import NearDuplicateIndex
+from outline_revisions import best_previous_extraction, changed_pages, merge_revision, page_fingerprint, topics_on_page
+from search_index import InvertedIndex, key_terms
+from tracing import TraceIdLogFilter, TracedStorage, Tracer, TracingMiddleware, traced
+from storage import EXTRACTION_SEARCH_WEIGHTS, LESSON_PLAN_SEARCH_WEIGHTS, create_storage
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-# MongoDB connection
-mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
+# Raw status checks expire after STATUS_CHECK_TTL_SECONDS; their per-minute and
+# per-hour counts in status_rollups are kept for the retention of each granularity
+STATUS_CHECK_TTL_SECONDS = int(os.environ.get('STATUS_CHECK_TTL_SECONDS', 7 * 24 * 3600))
+STATUS_ROLLUP_RETENTION = {
+    "minute": timedelta(days=int(os.environ.get('STATUS_ROLLUP_MINUTE_RETENTION_DAYS', 7))),
+    "hour": timedelta(days=int(os.environ.get('STATUS_ROLLUP_HOUR_RETENTION_DAYS', 365))),
+}
+
+# Tracing: every request, LLM attempt, PDF parse or render and storage call is a
+# span. The last TRACE_BUFFER_TRACES traces are kept for /api/admin/traces and,
+# if TRACE_EXPORT_PATH is set, appended to that file as JSON lines
+tracer = Tracer(
+    max_traces=int(os.environ.get('TRACE_BUFFER_TRACES', 500)),
+    export_path=os.environ.get('TRACE_EXPORT_PATH') or None,
+    enabled=os.environ.get('TRACING_ENABLED', 'true').lower() == 'true'
+)
+
+# Persistence: "mongo" (MONGO_URL and DB_NAME required) or "memory", which keeps
+# everything in process for tests, benchmarks and running without MongoDB
+STORAGE_BACKEND = os.environ.get('STORAGE_BACKEND', 'mongo').lower()
+storage = create_storage(
+    STORAGE_BACKEND, os.environ.get('MONGO_URL'), os.environ.get('DB_NAME'), STATUS_CHECK_TTL_SECONDS
+)
+if tracer.enabled:
+    storage = TracedStorage(storage, tracer)
+
+# Batched writes for status checks and usage records
+write_behind = WriteBehindBuffer(
+    storage,
+    max_batch=int(os.environ.get('WRITE_BEHIND_MAX_BATCH', 500)),
+    flush_interval=float(os.environ.get('WRITE_BEHIND_FLUSH_INTERVAL', 1.0)),
+    max_backlog=int(os.environ.get('WRITE_BEHIND_MAX_BACKLOG', 50000)),
+    max_counters=int(os.environ.get('WRITE_BEHIND_MAX_COUNTERS', 10000))
+)
+
+# Admission control for LLM-bound routes: at most ADMISSION_MAX_IN_FLIGHT uploads
+# and generations run at once (including retry backoff), up to ADMISSION_MAX_QUEUE
+# wait ADMISSION_QUEUE_TIMEOUT seconds for a slot, and the rest get 503 with
+# Retry-After. Batch and prefetch requests queue behind interactive ones.
+llm_admission = AdmissionController(
+    max_in_flight=int(os.environ.get('ADMISSION_MAX_IN_FLIGHT', 32)),
+    max_queue=int(os.environ.get('ADMISSION_MAX_QUEUE', 64)),
+    batch_max_queue=int(os.environ.get('ADMISSION_BATCH_MAX_QUEUE', 16)),
+    queue_timeout=float(os.environ.get('ADMISSION_QUEUE_TIMEOUT', 5.0))
+)
+
+# Near-duplicate reuse: generate-lesson-plan?reuse_similar=true answers with a copy of
+# an earlier plan whose request scores at least SIMILAR_PLAN_THRESHOLD (0-1) against
+# the new one, without calling Gemini. Only the user's own plans are candidates unless
+# SIMILAR_PLAN_SHARED is set.
+SIMILAR_PLAN_CACHE = os.environ.get('SIMILAR_PLAN_CACHE', 'true').lower() == 'true'
+SIMILAR_PLAN_SHARED = os.environ.get('SIMILAR_PLAN_SHARED', 'false').lower() == 'true'
+similar_plans = NearDuplicateIndex(
+    threshold=float(os.environ.get('SIMILAR_PLAN_THRESHOLD', 0.85)),
+    max_entries=int(os.environ.get('SIMILAR_PLAN_MAX_ENTRIES', 50000))
+)
+
+# Incremental re-extraction: an upload sharing pages with one of the user's last
+# REEXTRACT_CANDIDATES extractions only sends the new or edited pages to Gemini and
+# merges the result into the earlier extraction. Above REEXTRACT_MAX_CHANGED_FRACTION
+# of pages changed, the whole outline is extracted again.
+INCREMENTAL_REEXTRACTION = os.environ.get('INCREMENTAL_REEXTRACTION', 'true').lower() == 'true'
+REEXTRACT_CANDIDATES = int(os.environ.get('REEXTRACT_CANDIDATES', 20))
+REEXTRACT_MAX_CHANGED_FRACTION = float(os.environ.get('REEXTRACT_MAX_CHANGED_FRACTION', 0.5))
+
+# Full-text search: "mongo" uses the text indexes, "local" the in-process index.
+# "auto" probes Mongo at startup and falls back to local if $text is unavailable.
+SEARCH_BACKEND = os.environ.get('SEARCH_BACKEND', 'auto').lower()
+SEARCH_PAGE_MAX = 100
+SEARCH_MAX_OFFSET = 1000
+search_mode = "local" if SEARCH_BACKEND == "local" else "mongo"
+local_search_index = InvertedIndex()
 
 # Authentication setup
 security = HTTPBearer()
@@ -43,18 +128,84 @@ JWT_SECRET = os.environ.get('JWT_SECRET', 'your-secret-key-change-in-production'
 JWT_ALGORITHM = "HS256"
 JWT_EXPIRATION_HOURS = 24
 
+# Operator endpoints under /api/admin require this value in X-Admin-Token; unset disables them
+ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN', '')
+
+# On-demand profiling: a request sent with X-Profile: 1 (or ?profile=1) and the admin
+# token runs under cProfile. The newest PROFILE_MAX_FILES profiles, up to PROFILE_MAX_MB
+# in total, are kept in PROFILE_DIR and listed under /api/admin/profiles.
+PROFILING_ENABLED = os.environ.get('PROFILING_ENABLED', 'true').lower() == 'true'
+request_profiler = RequestProfiler(
+    os.environ.get('PROFILE_DIR') or os.path.join(tempfile.gettempdir(), 'lesson_plan_profiles'),
+    max_profiles=int(os.environ.get('PROFILE_MAX_FILES', 50)),
+    max_bytes=int(float(os.environ.get('PROFILE_MAX_MB', 100)) * 1024 * 1024)
+)
+
+# Memory tracking: with MEMORY_TRACKING=true, tracemalloc records the peak allocation of
+# a MEMORY_SAMPLE_RATE share of requests per route, with the MEMORY_TOP_SITES source
+# lines still holding the most memory afterwards, for /api/admin/memory. PDF render
+# workers trace and report the same share of renders. Tracing allocations costs CPU and
+# memory, and each sampled request stalls the event loop for two snapshots that take
+# longer the more objects are live; MEMORY_TOP_SITES=0 records peaks without snapshots.
+MEMORY_TRACKING = os.environ.get('MEMORY_TRACKING', 'false').lower() == 'true'
+memory_tracker = MemoryTracker(
+    sample_rate=float(os.environ.get('MEMORY_SAMPLE_RATE', 0.05)),
+    top_sites=int(os.environ.get('MEMORY_TOP_SITES', 10)),
+    traceback_frames=int(os.environ.get('MEMORY_TRACEBACK_FRAMES', 1))
+)
+
+# HTTP caching of read-mostly endpoints. Stored plans and extractions never change,
+# so their ETags come from their ids alone; bump RESPONSE_CACHE_VERSION when their
+# JSON shape changes so tags issued by older releases stop matching
+RESPONSE_CACHE_VERSION = "1"
+# ETags are keyed with a subkey derived from JWT_SECRET, so the signing secret itself is only used for tokens
+RESPONSE_CACHE_KEY = hmac.new(JWT_SECRET.encode(), b"lessonplan-response-etag", hashlib.sha256).digest()
+OPTIONS_CACHE_CONTROL = f"public, max-age={int(os.environ.get('OPTIONS_CACHE_MAX_AGE', 3600))}"
+PROFILE_CACHE_CONTROL = "private, no-cache"
+STORED_RECORD_CACHE_CONTROL = f"private, max-age={int(os.environ.get('STORED_RECORD_CACHE_MAX_AGE', 3600))}"
+
+# Rendered PDF cache
+PDF_CACHE_DIR = os.environ.get('PDF_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'lessonplan-pdf-cache'))
+PDF_CACHE_MAX_BYTES = int(os.environ.get('PDF_CACHE_MAX_MB', 256)) * 1024 * 1024
+pdf_cache = PDFCache(PDF_CACHE_DIR, PDF_CACHE_MAX_BYTES)
+
+# Bulk export settings
+PDF_RENDER_WORKERS = int(os.environ.get('PDF_RENDER_WORKERS', os.cpu_count() or 2))
+EXPORT_MAX_PLANS = int(os.environ.get('EXPORT_MAX_PLANS', 1000))
+PDF_EAGER_RENDER = os.environ.get('PDF_EAGER_RENDER', 'true').lower() == 'true'
+pdf_render_pool = None  # ProcessPoolExecutor, created on first render
+
+# Renders in flight keyed like the PDF cache, so concurrent requests share one render
+pdf_renders_in_flight = {}  # (lesson_plan_id, content_hash) -> asyncio.Task
+# Index backfills, PDF prerenders and other fire-and-forget work, kept referenced until done and cancelled on shutdown
+background_tasks = set()
+
+# Response compression: JSON bodies of at least RESPONSE_COMPRESSION_MIN_BYTES are
+# sent brotli (if installed) or gzip encoded, as negotiated with Accept-Encoding
+RESPONSE_COMPRESSION = os.environ.get('RESPONSE_COMPRESSION', 'true').lower() == 'true'
+RESPONSE_COMPRESSION_MIN_BYTES = int(os.environ.get('RESPONSE_COMPRESSION_MIN_BYTES', 1024))
+RESPONSE_COMPRESSION_GZIP_LEVEL = int(os.environ.get('RESPONSE_COMPRESSION_GZIP_LEVEL', 6))
+RESPONSE_COMPRESSION_BROTLI_QUALITY = int(os.environ.get('RESPONSE_COMPRESSION_BROTLI_QUALITY', 4))
+
+# Startup warm-up, run by the lifespan hook before the app reports ready
+STARTUP_WARMUP = os.environ.get('STARTUP_WARMUP', 'true').lower() == 'true'
+STARTUP_WARMUP_TIMEOUT = float(os.environ.get('STARTUP_WARMUP_TIMEOUT', 10.0))
+# Index bootstrap and the text search probe wait at most STARTUP_STORAGE_TIMEOUT seconds,
+# so an unreachable database does not hold startup for the driver's server selection timeout
+STARTUP_STORAGE_TIMEOUT = float(os.environ.get('STARTUP_STORAGE_TIMEOUT', 10.0))
+startup_profile = {"ready": False, "startup_ms": None, "warmup_ms": {}}
+
 # In-memory user storage (for simple demo - in production use proper database)
 users_db = {}  # email -> user_data
 
-# Create the main app without a prefix
-app = FastAPI()
-
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
 
 # Initialize LLM Chat
 def get_llm_chat():
     """Initialize LLM client for educational content generation."""
+    from google import genai
+    
     api_key = os.environ.get('GOOGLE_API_KEY')
     if not api_key:
         raise HTTPException(status_code=500, detail="LLM API key not configured")
@@ -69,12 +220,16 @@ def get_user_llm_chat(api_key: str):
         # Fallback to system key
         return get_llm_chat()
     
+    from google import genai
     genai_client = genai.Client(api_key=api_key)
     
     return genai_client
 
+@traced(tracer)
 async def retry_llm_call(genai_client, message, system_instruction="", max_retries=3, base_delay=2):
     """Retry LLM calls with exponential backoff for rate limiting/overload issues."""
+    from google.genai import types
+    
     for attempt in range(max_retries):
         try:
             logger.info(f"LLM call attempt {attempt + 1}/{max_retries}")
@@ -83,11 +238,12 @@ async def retry_llm_call(genai_client, message, system_instruction="", max_retri
             if system_instruction:
                 config.system_instruction = system_instruction
             
-            response = await genai_client.aio.models.generate_content(
-                model='gemini-2.0-flash',
-                contents=message,
-                config=config
-            )
+            with tracer.span("llm.attempt", attempt=attempt + 1, prompt_chars=len(message)):
+                response = await genai_client.aio.models.generate_content(
+                    model='gemini-2.0-flash',
+                    contents=message,
+                    config=config
+                )
             
             logger.info("LLM call successful")
             return response.text
@@ -99,7 +255,8 @@ async def retry_llm_call(genai_client, message, system_instruction="", max_retri
                 if attempt < max_retries - 1:
                     delay = base_delay * (2 ** attempt)  # Exponential backoff
                     logger.warning(f"LLM API overloaded/rate limited. Retrying in {delay} seconds... (attempt {attempt + 1}/{max_retries})")
-                    await asyncio.sleep(delay)
+                    with tracer.span("llm.backoff", attempt=attempt + 1, delay_s=delay):
+                        await asyncio.sleep(delay)
                     continue
                 else:
                     logger.error("Max retries exceeded for LLM API overload/rate limiting")
@@ -115,17 +272,119 @@ async def retry_llm_call(genai_client, message, system_instruction="", max_retri
     # This shouldn't be reached, but just in case
     raise HTTPException(status_code=500, detail="Failed to process request after multiple attempts")
 
+# API key validation settings
+API_KEY_VALIDATION_MODEL = 'gemini-2.0-flash'
+API_KEY_VALIDATION_TIMEOUT = float(os.environ.get('API_KEY_VALIDATION_TIMEOUT', 2.0))
+API_KEY_VALIDATION_TTL = int(os.environ.get('API_KEY_VALIDATION_TTL_SECONDS', 3600))
+
+# Successfully validated keys: sha256(key) -> expiry (time.monotonic())
+validated_api_keys = {}
+
+def api_key_fingerprint(api_key: str) -> str:
+    """Hash an API key so the raw key never sits in the validation cache."""
+    return hashlib.sha256(api_key.encode()).hexdigest()
+
+async def probe_api_key(api_key: str):
+    """Check an API key with a model metadata lookup instead of a generation call.
+
+    The lookup is authenticated but does not consume generation quota, so it
+    bypasses retry_llm_call and its backoff entirely. Successful results are
+    cached for API_KEY_VALIDATION_TTL seconds.
+    """
+    fingerprint = api_key_fingerprint(api_key)
+    now = time.monotonic()
+    expires_at = validated_api_keys.get(fingerprint)
+    if expires_at and expires_at > now:
+        return
+    
+    from google import genai
+    genai_client = genai.Client(api_key=api_key)
+    await asyncio.wait_for(
+        genai_client.aio.models.get(model=API_KEY_VALIDATION_MODEL),
+        timeout=API_KEY_VALIDATION_TIMEOUT
+    )
+    
+    # Drop expired entries so the cache stays bounded by live keys
+    for key, expiry in list(validated_api_keys.items()):
+        if expiry <= now:
+            del validated_api_keys[key]
+    validated_api_keys[fingerprint] = now + API_KEY_VALIDATION_TTL
+
 # Authentication helper functions
+# scrypt parameters: N=2**14, r=8 uses ~16MB per hash and ~50ms of CPU
+SCRYPT_N = int(os.environ.get('PASSWORD_HASH_SCRYPT_N', 2 ** 14))
+SCRYPT_R = int(os.environ.get('PASSWORD_HASH_SCRYPT_R', 8))
+SCRYPT_P = int(os.environ.get('PASSWORD_HASH_SCRYPT_P', 1))
+PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', 4))
+
 def hash_password(password: str) -> str:
-    """Hash password using SHA-256."""
-    return hashlib.sha256(password.encode()).hexdigest()
+    """Hash password using salted scrypt."""
+    salt = secrets.token_bytes(16)
+    derived = hashlib.scrypt(
+        password.encode(), salt=salt, n=SCRYPT_N, r=SCRYPT_R, p=SCRYPT_P,
+        maxmem=256 * SCRYPT_N * SCRYPT_R * SCRYPT_P
+    )
+    return "scrypt${}${}${}${}${}".format(
+        SCRYPT_N, SCRYPT_R, SCRYPT_P,
+        base64.b64encode(salt).decode(), base64.b64encode(derived).decode()
+    )
+
+def is_legacy_password_hash(hashed: str) -> bool:
+    """Legacy hashes are a bare unsalted SHA-256 hex digest."""
+    return not hashed.startswith("scrypt$")
 
 def verify_password(password: str, hashed: str) -> bool:
-    """Verify password against hash."""
-    return hashlib.sha256(password.encode()).hexdigest() == hashed
+    """Verify password against a scrypt or legacy SHA-256 hash."""
+    if is_legacy_password_hash(hashed):
+        return hmac.compare_digest(hashlib.sha256(password.encode()).hexdigest(), hashed)
+    try:
+        _, n, r, p, salt, expected = hashed.split("$")
+        n, r, p = int(n), int(r), int(p)
+        expected = base64.b64decode(expected)
+        derived = hashlib.scrypt(
+            password.encode(), salt=base64.b64decode(salt), n=n, r=r, p=p,
+            maxmem=256 * n * r * p, dklen=len(expected)
+        )
+    except ValueError:
+        return False
+    return hmac.compare_digest(derived, expected)
+
+def password_needs_rehash(hashed: str) -> bool:
+    """Check whether a stored hash is legacy or uses outdated scrypt parameters."""
+    if is_legacy_password_hash(hashed):
+        return True
+    return hashed.split("$")[1:4] != [str(SCRYPT_N), str(SCRYPT_R), str(SCRYPT_P)]
+
+class CredentialHasher:
+    """Runs the password KDF on a dedicated, bounded thread pool.
+
+    scrypt takes tens of milliseconds, so running it inline would stall the
+    event loop for every other request. hashlib releases the GIL while it
+    works, so the pool gives real parallelism up to ``max_workers``; excess
+    callers wait on the pool queue without blocking the loop.
+    """
+
+    def __init__(self, max_workers: int = PASSWORD_HASH_WORKERS):
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="credential-hash")
+
+    async def hash(self, password: str) -> str:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, hash_password, password)
+
+    async def verify(self, password: str, hashed: str) -> bool:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, verify_password, password, hashed)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+credential_hasher = CredentialHasher()
 
 def create_jwt_token(user_data: dict) -> str:
     """Create JWT token for user."""
+    import jwt
+    
     payload = {
         "user_id": user_data["id"],
         "email": user_data["email"],
@@ -135,6 +394,8 @@ def create_jwt_token(user_data: dict) -> str:
 
 def verify_jwt_token(token: str) -> dict:
     """Verify JWT token and return payload."""
+    import jwt
+    
     try:
         payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
         return payload
@@ -151,6 +412,50 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
         raise HTTPException(status_code=401, detail="User not found")
     return users_db[user_email]
 
+def is_admin_token(token: Optional[str]) -> bool:
+    return bool(ADMIN_TOKEN and token and hmac.compare_digest(token.encode(), ADMIN_TOKEN.encode()))
+
+async def require_admin(x_admin_token: Optional[str] = Header(None)):
+    """Gate operator endpoints behind the ADMIN_TOKEN shared secret."""
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not is_admin_token(x_admin_token):
+        raise HTTPException(status_code=403, detail="Admin token required")
+
+def request_priority(x_request_priority: Optional[str]) -> str:
+    """Clients send ``X-Request-Priority: batch`` (or ``prefetch``) for work no one is waiting on."""
+    return BATCH if (x_request_priority or "").strip().lower() in ("batch", "prefetch") else INTERACTIVE
+
+@asynccontextmanager
+async def llm_slot(priority: str):
+    """Hold an LLM admission slot, or fail with 503 and Retry-After when shed."""
+    try:
+        with tracer.span("llm_admission", priority=priority):
+            admitted_at = await llm_admission.acquire(priority)
+    except AdmissionRejected as e:
+        logger.warning(f"Shedding {priority} request: {e.reason}, retry after {e.retry_after}s")
+        raise HTTPException(
+            status_code=503,
+            detail="The server is busy generating other lesson plans. Please try again shortly.",
+            headers={"Retry-After": str(e.retry_after)}
+        )
+    try:
+        yield
+    finally:
+        llm_admission.release(admitted_at)
+
+async def admit_llm_request(
+    current_user: dict = Depends(get_current_user),
+    x_request_priority: Optional[str] = Header(None)
+):
+    """Hold an LLM admission slot for the rest of the request.
+
+    Depends on get_current_user so unauthenticated requests are turned away
+    before they can take a slot.
+    """
+    async with llm_slot(request_priority(x_request_priority)):
+        yield
+
 # Define Models
 class User(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
@@ -202,13 +507,42 @@ class StatusCheck(BaseModel):
 class StatusCheckCreate(BaseModel):
     client_name: str
 
+class UsageEvent(BaseModel):
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    user_id: str
+    event: str
+    details: Dict[str, Any] = Field(default_factory=dict)
+    timestamp: datetime = Field(default_factory=datetime.utcnow)
+
+class StatusRollup(BaseModel):
+    client_name: str
+    granularity: str  # "minute" or "hour"
+    bucket_start: datetime
+    count: int
+
+class ExtractionPage(BaseModel):
+    fingerprint: str  # hash of the page's words, see outline_revisions.page_fingerprint
+    topics: List[str] = []  # lecture topics found on the page
+
+class ExtractionRevision(BaseModel):
+    previous_extraction_id: str
+    changed_pages: List[int]  # 1-based page numbers sent to the LLM
+    reused_pages: int
+    added_topics: List[str] = []
+    removed_topics: List[str] = []
+    modified_topics: List[str] = []  # topics whose focus topics changed
+
 class PDFExtractionResult(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     filename: str
     subject_names: List[str]
     lecture_topics: List[str]
     lecture_focus_mapping: Dict[str, List[str]]  # Maps lecture topics to their focus topics
+    owner_id: Optional[str] = None
+    content_hash: Optional[str] = None  # SHA-256 of the extracted PDF text
     extracted_at: datetime = Field(default_factory=datetime.utcnow)
+    pages: List[ExtractionPage] = []
+    revision: Optional[ExtractionRevision] = None  # set when only changed pages were re-extracted
 
 class LessonPlanRequest(BaseModel):
     subject_name: str
@@ -222,7 +556,277 @@ class LessonPlan(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     request_data: LessonPlanRequest
     content: str
+    owner_id: Optional[str] = None
+    content_hash: Optional[str] = None  # SHA-256 of content
     generated_at: datetime = Field(default_factory=datetime.utcnow)
+    reused_from: Optional[str] = None  # id of the near-duplicate plan whose content this copies
+
+class LessonPlanSummary(BaseModel):
+    id: str
+    request_data: LessonPlanRequest
+    generated_at: datetime
+
+class LessonPlanHistoryPage(BaseModel):
+    items: List[LessonPlanSummary]
+    next_cursor: Optional[str] = None
+
+class PDFExtractionSummary(BaseModel):
+    id: str
+    filename: str
+    subject_names: List[str]
+    extracted_at: datetime
+
+class PDFExtractionHistoryPage(BaseModel):
+    items: List[PDFExtractionSummary]
+    next_cursor: Optional[str] = None
+
+class SearchHit(BaseModel):
+    kind: str  # "lesson_plan" or "extraction"
+    id: str
+    score: float
+    lesson_plan: Optional[LessonPlanSummary] = None
+    extraction: Optional[PDFExtractionSummary] = None
+
+class SearchResults(BaseModel):
+    query: str
+    total: int
+    page: int
+    limit: int
+    backend: str
+    items: List[SearchHit]
+
+class LessonPlanExportRequest(BaseModel):
+    lesson_plan_ids: Optional[List[str]] = None
+    subject_name: Optional[str] = None
+
+def record_usage(user: dict, event: str, **details):
+    """Queue a usage record; written in the background by write_behind."""
+    write_behind.enqueue("usage_events", UsageEvent(user_id=user["id"], event=event, details=details).dict())
+
+def rollup_bucket_start(timestamp: datetime, granularity: str) -> datetime:
+    if granularity == "minute":
+        return timestamp.replace(second=0, microsecond=0)
+    return timestamp.replace(minute=0, second=0, microsecond=0)
+
+def record_status_rollups(status_check: StatusCheck):
+    """Count a status check into its per-minute and per-hour buckets."""
+    for granularity, retention in STATUS_ROLLUP_RETENTION.items():
+        bucket_start = rollup_bucket_start(status_check.timestamp, granularity)
+        write_behind.increment(
+            "status_rollups",
+            {"granularity": granularity, "client_name": status_check.client_name, "bucket_start": bucket_start},
+            {"count": 1},
+            set_on_insert={"expires_at": bucket_start + retention}
+        )
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode()).hexdigest()
+
+# Lesson plan content compression
+# content_format marks how "content" is stored: absent or 0 is plain text
+# (documents written before compression), 1 is zlib-compressed UTF-8
+CONTENT_FORMAT_PLAIN = 0
+CONTENT_FORMAT_ZLIB = 1
+LESSON_PLAN_COMPRESSION = os.environ.get('LESSON_PLAN_COMPRESSION', 'zlib').lower()
+LESSON_PLAN_COMPRESSION_LEVEL = int(os.environ.get('LESSON_PLAN_COMPRESSION_LEVEL', 6))
+# Compressed content is opaque to the text index, so its LESSON_PLAN_SEARCH_TERMS
+# most frequent words are stored uncompressed in "search_terms". Rarer words of
+# compressed plans are only found by the local index.
+LESSON_PLAN_SEARCH_TERMS = int(os.environ.get('LESSON_PLAN_SEARCH_TERMS', 48))
+
+def encode_lesson_plan_doc(lesson_plan: LessonPlan) -> dict:
+    """Build the stored document for a lesson plan, compressing its content."""
+    doc = lesson_plan.dict()
+    if LESSON_PLAN_COMPRESSION == 'zlib':
+        doc["content"] = zlib.compress(doc["content"].encode(), LESSON_PLAN_COMPRESSION_LEVEL)
+        doc["content_format"] = CONTENT_FORMAT_ZLIB
+        doc["search_terms"] = key_terms(lesson_plan.content, LESSON_PLAN_SEARCH_TERMS)
+    return doc
+
+def decode_lesson_plan_doc(doc: dict) -> dict:
+    """Inverse of encode_lesson_plan_doc; plain-text legacy documents pass through."""
+    content_format = doc.pop("content_format", CONTENT_FORMAT_PLAIN)
+    doc.pop("search_terms", None)
+    if content_format == CONTENT_FORMAT_ZLIB:
+        doc["content"] = zlib.decompress(doc["content"]).decode()
+    elif content_format != CONTENT_FORMAT_PLAIN:
+        raise ValueError(f"Unknown lesson plan content format: {content_format}")
+    return doc
+
+# Keyset pagination helpers
+STATUS_PAGE_DEFAULT = 100
+STATUS_PAGE_MAX = 1000
+STATUS_FIELDS = ["id", "client_name", "timestamp"]
+
+def encode_page_cursor(sort_value: datetime, record_id: str) -> str:
+    """Opaque cursor pointing just past the given (sort value, id) pair."""
+    raw = json.dumps([sort_value.isoformat(), record_id])
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def decode_page_cursor(cursor: str):
+    try:
+        sort_value, record_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.fromisoformat(sort_value), record_id
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid pagination cursor")
+
+def page_after(cursor: Optional[str]):
+    """The (sort value, id) keyset position of a cursor, or None for the first page."""
+    return decode_page_cursor(cursor) if cursor else None
+
+HISTORY_PAGE_DEFAULT = 20
+HISTORY_PAGE_MAX = 100
+LESSON_PLAN_SUMMARY_FIELDS = ["id", "request_data", "generated_at"]
+EXTRACTION_SUMMARY_FIELDS = ["id", "filename", "subject_names", "extracted_at"]
+
+async def fetch_owner_page(list_page, owner_id: str, sort_field: str, fields: List[str], limit: int, cursor: Optional[str]):
+    """Return (documents, next cursor) for one page of a user's records, newest first.
+
+    ``list_page`` is storage.list_lesson_plans or storage.list_extractions. On
+    Mongo these are served by the (owner_id, sort_field desc, id desc) index,
+    so every page costs the same regardless of how deep into the history it is.
+    """
+    docs = await list_page(owner_id, fields, limit + 1, after=page_after(cursor))
+    next_cursor = None
+    if len(docs) > limit:
+        docs = docs[:limit]
+        next_cursor = encode_page_cursor(docs[-1][sort_field], docs[-1]["id"])
+    return docs, next_cursor
+
+def lesson_plan_search_fields(lesson_plan: LessonPlan):
+    request_data = lesson_plan.request_data
+    return [
+        (request_data.subject_name, LESSON_PLAN_SEARCH_WEIGHTS["request_data.subject_name"]),
+        (request_data.lecture_topic, LESSON_PLAN_SEARCH_WEIGHTS["request_data.lecture_topic"]),
+        (request_data.focus_topic or "", LESSON_PLAN_SEARCH_WEIGHTS["request_data.focus_topic"]),
+        (lesson_plan.content, LESSON_PLAN_SEARCH_WEIGHTS["content"]),
+    ]
+
+def extraction_search_fields(extraction: PDFExtractionResult):
+    return [
+        (" ".join(extraction.subject_names), EXTRACTION_SEARCH_WEIGHTS["subject_names"]),
+        (" ".join(extraction.lecture_topics), EXTRACTION_SEARCH_WEIGHTS["lecture_topics"]),
+        (extraction.filename, EXTRACTION_SEARCH_WEIGHTS["filename"]),
+    ]
+
+def index_lesson_plan_locally(lesson_plan: LessonPlan):
+    summary = {"id": lesson_plan.id, "request_data": lesson_plan.request_data.dict(), "generated_at": lesson_plan.generated_at}
+    local_search_index.add("lesson_plan", lesson_plan.id, lesson_plan.owner_id, lesson_plan_search_fields(lesson_plan), summary)
+
+def index_extraction_locally(extraction: PDFExtractionResult):
+    summary = {"id": extraction.id, "filename": extraction.filename, "subject_names": extraction.subject_names, "extracted_at": extraction.extracted_at}
+    local_search_index.add("extraction", extraction.id, extraction.owner_id, extraction_search_fields(extraction), summary)
+
+def similar_plan_scope(owner_id: Optional[str]) -> Optional[str]:
+    return None if SIMILAR_PLAN_SHARED else owner_id
+
+def index_similar_plan(lesson_plan: LessonPlan):
+    # Copies are left out so every match points at a plan Gemini actually wrote
+    if SIMILAR_PLAN_CACHE and not lesson_plan.reused_from:
+        similar_plans.add(lesson_plan.id, similar_plan_scope(lesson_plan.owner_id), lesson_plan.request_data.dict())
+
+async def backfill_similar_plans():
+    """Load the requests of existing plans into the near-duplicate index."""
+    count = 0
+    async for lesson_plan_doc in storage.iter_lesson_plans():
+        if not lesson_plan_doc.get("reused_from"):
+            similar_plans.add(lesson_plan_doc["id"], similar_plan_scope(lesson_plan_doc.get("owner_id")), lesson_plan_doc["request_data"])
+            count += 1
+            if count % 100 == 0:
+                await asyncio.sleep(0)  # signatures are CPU work; let requests in between
+    logger.info(f"Near-duplicate index built with {count} lesson plans")
+
+async def reuse_similar_lesson_plan(request: LessonPlanRequest, current_user: dict) -> Optional[LessonPlan]:
+    """Copy the closest earlier plan for a near-identical request, if there is one."""
+    with tracer.span("similar_plan_lookup") as span:
+        for score, plan_id, _ in similar_plans.query(similar_plan_scope(current_user["id"]), request.dict(), limit=3):
+            owner_id = None if SIMILAR_PLAN_SHARED else current_user["id"]
+            lesson_plan_doc = await storage.get_lesson_plan(plan_id, owner_id)
+            if lesson_plan_doc is not None:
+                break
+            similar_plans.remove(plan_id)
+        else:
+            return None
+        source = LessonPlan(**decode_lesson_plan_doc(lesson_plan_doc))
+        span.set(reused_from=source.id, similarity=score)
+
+    lesson_plan = LessonPlan(
+        request_data=request,
+        content=source.content,
+        owner_id=current_user["id"],
+        content_hash=source.content_hash,
+        reused_from=source.id
+    )
+    await storage.insert_lesson_plan(encode_lesson_plan_doc(lesson_plan))
+    if search_mode == "local":
+        index_lesson_plan_locally(lesson_plan)
+    record_usage(current_user, "reuse_similar_lesson_plan", lesson_plan_id=lesson_plan.id, reused_from=source.id, similarity=score)
+    if PDF_EAGER_RENDER:
+        schedule_pdf_prerender(lesson_plan)
+    return lesson_plan
+
+def run_in_background(coro, name: str) -> asyncio.Task:
+    """Start a task that outlives the request or startup step that created it."""
+    task = asyncio.create_task(coro, name=name)
+    background_tasks.add(task)
+    task.add_done_callback(finish_background_task)
+    return task
+
+def finish_background_task(task: asyncio.Task):
+    background_tasks.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        logger.error(f"Background task {task.get_name()} failed", exc_info=task.exception())
+
+async def cancel_background_tasks():
+    for task in list(background_tasks):
+        task.cancel()
+    await asyncio.gather(*background_tasks, return_exceptions=True)
+
+async def backfill_local_search_index():
+    """Load existing plans and extractions into the local index."""
+    count = 0
+    async for lesson_plan_doc in storage.iter_lesson_plans():
+        index_lesson_plan_locally(LessonPlan(**decode_lesson_plan_doc(lesson_plan_doc)))
+        count += 1
+    async for extraction_doc in storage.iter_extractions():
+        index_extraction_locally(PDFExtractionResult(**extraction_doc))
+        count += 1
+    logger.info(f"Local search index built with {count} documents")
+
+def use_local_search(reason: str):
+    global search_mode
+    if search_mode == "local":
+        return
+    logger.warning(f"Falling back to local search index: {reason}")
+    search_mode = "local"
+    run_in_background(backfill_local_search_index(), "backfill_local_search_index")
+
+async def configure_search():
+    """Probe storage text search once at startup when SEARCH_BACKEND is auto."""
+    if SEARCH_BACKEND == "local":
+        await backfill_local_search_index()
+    elif SEARCH_BACKEND == "auto":
+        try:
+            await asyncio.wait_for(
+                storage.text_search("lesson_plan", None, "probe", ["id"], 1), timeout=STARTUP_STORAGE_TIMEOUT
+            )
+        except NotImplementedError as e:
+            use_local_search(str(e))
+        except Exception as e:
+            # A transient failure says nothing about $text support; searches will retry it
+            logger.warning(f"Text search probe failed, keeping storage search: {type(e).__name__}: {str(e)}")
+
+async def storage_text_search(owner_id: str, query: str, kinds: List[str], limit: int, offset: int):
+    """Ranked storage text search across the requested kinds, merged by text score."""
+    fields = {"lesson_plan": LESSON_PLAN_SUMMARY_FIELDS, "extraction": EXTRACTION_SUMMARY_FIELDS}
+    total = 0
+    hits = []
+    for kind in kinds:
+        count, docs = await storage.text_search(kind, owner_id, query, fields[kind], offset + limit)
+        total += count
+        hits.extend((score, kind, doc) for score, doc in docs)
+    hits.sort(key=lambda hit: hit[0], reverse=True)
+    return total, hits[offset:offset + limit]
 
 # Standard options
 BLOOMS_TAXONOMY_LEVELS = [
@@ -257,64 +861,255 @@ LESSON_DURATIONS = [
     "3 hours"
 ]
 
+# The options only change with a deploy, so serialize them once
+STANDARD_OPTIONS_BODY = orjson.dumps({
+    "blooms_taxonomy": BLOOMS_TAXONOMY_LEVELS,
+    "aqf_levels": AQF_LEVELS,
+    "lesson_durations": LESSON_DURATIONS
+})
+STANDARD_OPTIONS_ETAG = content_etag(STANDARD_OPTIONS_BODY)
+
 # Helper function to extract text from PDF
-def extract_text_from_pdf(file_path: str) -> str:
+@traced(tracer, "extract_text_from_pdf")
+def extract_pdf_pages(file_path: str) -> List[str]:
+    """Text of each page; a page that fails to extract is kept as an empty string."""
+    from pypdf import PdfReader
+    
     try:
         reader = PdfReader(file_path)
-        text = ""
+        pages = []
         for page_num, page in enumerate(reader.pages):
             try:
-                page_text = page.extract_text()
-                if page_text.strip():  # Only add non-empty text
-                    text += page_text + "\n"
+                pages.append(page.extract_text() or "")
             except Exception as page_error:
                 logger.warning(f"Failed to extract text from page {page_num}: {str(page_error)}")
-                continue
+                pages.append("")
         
-        if not text.strip():
+        if not any(page.strip() for page in pages):
             raise HTTPException(status_code=400, detail="No readable text found in the PDF. Please ensure the PDF contains text content and is not a scanned image.")
         
-        return text
+        return pages
     except HTTPException:
         raise  # Re-raise HTTP exceptions
     except Exception as e:
         logger.error(f"PDF extraction error: {str(e)}")
         raise HTTPException(status_code=400, detail=f"Unable to process this PDF format. Please try with a different PDF file or ensure the PDF contains readable text. Error: {str(e)}")
 
+def join_pdf_pages(pages: List[str]) -> str:
+    return "".join(page + "\n" for page in pages if page.strip())  # Only add non-empty text
+
+def extract_text_from_pdf(file_path: str) -> str:
+    return join_pdf_pages(extract_pdf_pages(file_path))
+
+def build_extraction_prompt(pdf_text: str) -> str:
+    """Prompt asking the LLM for subjects, lecture topics and focus topics in an outline."""
+    return f"""
+        Analyze the following academic subject outline PDF content and extract the required information in JSON format.
+        
+        PDF Content:
+        {pdf_text[:8000]}
+        
+        Please extract and return ONLY a JSON object with the following structure:
+        {{
+            "subject_names": ["list of subject names found"],
+            "lecture_topics": ["list of lecture topics from timetable of activities"],
+            "lecture_focus_mapping": {{
+                "Lecture Topic 1": ["focus topic 1.1", "focus topic 1.2"],
+                "Lecture Topic 2": ["focus topic 2.1", "focus topic 2.2"],
+                "etc": ["etc"]
+            }}
+        }}
+        
+        Instructions:
+        1. Look for subject names in headers, titles, or course information
+        2. Find lecture topics in the timetable of activities section
+        3. For each lecture topic, identify its corresponding focus topics (subtopics/subdivisions mentioned for that specific lecture/week)
+        4. Create a mapping where each lecture topic maps to its specific focus topics only
+        5. If a lecture topic has no specific focus topics, map it to an empty array []
+        6. Return clean, readable names without extra formatting
+        7. Return ONLY the JSON object, no other text
+        """
+
+def build_revision_extraction_prompt(changed_text: str, subject_names: List[str]) -> str:
+    """Prompt for the pages of a revised outline that changed since its last upload."""
+    return f"""
+        The following pages were added or edited in a revised version of an academic subject outline
+        for {", ".join(subject_names) or "an unknown subject"}. The rest of the outline is unchanged and was analyzed before.
+        Extract the required information from these pages only, in JSON format.
+        
+        Changed Pages:
+        {changed_text[:8000]}
+        
+        Please extract and return ONLY a JSON object with the following structure:
+        {{
+            "subject_names": ["list of subject names found on these pages"],
+            "lecture_topics": ["list of lecture topics from the timetable of activities on these pages"],
+            "lecture_focus_mapping": {{
+                "Lecture Topic 1": ["focus topic 1.1", "focus topic 1.2"],
+                "etc": ["etc"]
+            }}
+        }}
+        
+        Instructions:
+        1. Only include lecture topics that appear on these pages, named exactly as written
+        2. For each lecture topic, identify its corresponding focus topics only
+        3. If a lecture topic has no specific focus topics, map it to an empty array []
+        4. If these pages contain no subject names or lecture topics, return empty lists
+        5. Return ONLY the JSON object, no other text
+        """
+
+def parse_llm_json(response: str):
+    """Strip Markdown code fences from an LLM reply and parse the JSON inside."""
+    response_text = response.strip()
+    if response_text.startswith('```json'):
+        response_text = response_text.replace('```json', '').replace('```', '').strip()
+    elif response_text.startswith('```'):
+        response_text = response_text.replace('```', '').strip()
+    
+    with tracer.span("parse_llm_json", response_chars=len(response_text)):
+        return json.loads(response_text)
+
+def build_lesson_plan_prompt(request: LessonPlanRequest) -> str:
+    """Prompt for a lesson plan with the section layout the PDF renderer expects."""
+    return f"""
+        Create a detailed lesson plan based on the following parameters:
+        
+        Subject: {request.subject_name}
+        Lecture Topic: {request.lecture_topic}
+        Focus Topic: {request.focus_topic if request.focus_topic else "General coverage of the lecture topic"}
+        Bloom's Taxonomy Level: {request.blooms_taxonomy}
+        AQF Level: {request.aqf_level}
+        Duration: {request.lesson_duration}
+        
+        Please create a comprehensive lesson plan with professional formatting. Use proper headings, bullet points, and structure. DO NOT use markdown symbols like #, *, or other formatting characters. Format it as follows:
+        
+        LEARNING OBJECTIVES
+        - Clear, measurable objectives aligned with the {request.blooms_taxonomy} level of Bloom's taxonomy
+        
+        LEARNING OUTCOMES
+        - What students will achieve, appropriate for {request.aqf_level}
+        
+        PRE-REQUISITES
+        - Required knowledge or skills
+        
+        MATERIALS AND RESOURCES
+        - What's needed for the lesson
+        
+        LESSON STRUCTURE ({request.lesson_duration})
+        
+        Introduction/Hook (X minutes)
+        - Engage students activities
+        
+        Main Content Delivery (X minutes)
+        - Explanation and demonstration activities
+        
+        Active Learning Activities (X minutes)
+        - Hands-on, discussion, and practice activities
+        
+        Assessment/Evaluation (X minutes)
+        - Formative assessment aligned with Bloom's level
+        
+        Conclusion/Summary (X minutes)
+        - Wrap-up activities
+        
+        ASSESSMENT CRITERIA
+        - How student understanding will be measured
+        
+        EXTENSION ACTIVITIES
+        - For advanced students
+        
+        DIFFERENTIATION STRATEGIES
+        - For diverse learning needs
+        
+        Focus Area: {f"Emphasize {request.focus_topic} within the broader {request.lecture_topic} context" if request.focus_topic else f"Provide comprehensive coverage of {request.lecture_topic}"}
+        
+        Ensure the content is:
+        - Age and level appropriate for {request.aqf_level}
+        - {"Focused specifically on '" + request.focus_topic + "'" if request.focus_topic else "Comprehensively covering '" + request.lecture_topic + "'"}
+        - Designed to achieve {request.blooms_taxonomy} level cognitive skills
+        - Realistic for the {request.lesson_duration} timeframe
+        - Engaging and interactive
+        - Professionally formatted without markdown symbols
+        
+        Format the response as clean, professional text with clear section headings in ALL CAPS and proper bullet points using hyphens.
+        """
+
+def lesson_plan_render_hash(lesson_plan: LessonPlan) -> str:
+    """Hash everything that ends up in the rendered PDF."""
+    plan_data = lesson_plan.dict()
+    # MongoDB keeps millisecond precision, so hash the value it will hand back
+    generated_at = plan_data["generated_at"]
+    plan_data["generated_at"] = generated_at.replace(microsecond=generated_at.microsecond // 1000 * 1000)
+    payload = json.dumps(plan_data, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()[:32]
+
+def lesson_plan_etag(content_hash: str) -> str:
+    return f'"{content_hash}"'
+
+def profile_etag(user: dict) -> str:
+    fields = ["id", "firstName", "lastName", "email", "institution", "department"]
+    return keyed_etag(
+        RESPONSE_CACHE_KEY, RESPONSE_CACHE_VERSION, "profile",
+        *[str(user[field]) for field in fields], str(bool(user.get("api_key")))
+    )
+
+def stored_record_etag(kind: str, record_id: str, owner_id: str) -> str:
+    return keyed_etag(RESPONSE_CACHE_KEY, RESPONSE_CACHE_VERSION, kind, owner_id, record_id)
+
+def iter_bytes(data: bytes, chunk_size: int = 64 * 1024):
+    for start in range(0, len(data), chunk_size):
+        yield data[start:start + chunk_size]
+
+@lru_cache(maxsize=None)
+def pdf_styles():
+    """ReportLab paragraph styles for lesson plan PDFs, built once per process."""
+    from reportlab.lib import colors
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+    
+    styles = getSampleStyleSheet()
+    
+    # Custom styles
+    title_style = ParagraphStyle(
+        'CustomTitle',
+        parent=styles['Heading1'],
+        fontSize=18,
+        spaceAfter=20,
+        textColor=colors.darkblue,
+        alignment=1  # Center alignment
+    )
+    
+    heading_style = ParagraphStyle(
+        'CustomHeading',
+        parent=styles['Heading2'],
+        fontSize=14,
+        spaceAfter=12,
+        textColor=colors.darkblue,
+        keepWithNext=True
+    )
+    
+    body_style = ParagraphStyle(
+        'CustomBody',
+        parent=styles['BodyText'],
+        fontSize=11,
+        spaceAfter=6,
+        leading=14
+    )
+    return title_style, heading_style, body_style
+
 # Helper function to generate PDF
-def generate_lesson_plan_pdf(lesson_plan: LessonPlan, output_path: str):
+@traced(tracer)
+def generate_lesson_plan_pdf(lesson_plan: LessonPlan, output_path):
+    """Render a lesson plan as PDF into a file path or binary file-like object."""
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import letter
+    from reportlab.lib.units import inch
+    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
+    
     try:
         logger.info(f"Starting PDF generation for lesson plan: {lesson_plan.id}")
         
         doc = SimpleDocTemplate(output_path, pagesize=letter)
-        styles = getSampleStyleSheet()
-        
-        # Custom styles
-        title_style = ParagraphStyle(
-            'CustomTitle',
-            parent=styles['Heading1'],
-            fontSize=18,
-            spaceAfter=20,
-            textColor=colors.darkblue,
-            alignment=1  # Center alignment
-        )
-        
-        heading_style = ParagraphStyle(
-            'CustomHeading',
-            parent=styles['Heading2'],
-            fontSize=14,
-            spaceAfter=12,
-            textColor=colors.darkblue,
-            keepWithNext=True
-        )
-        
-        body_style = ParagraphStyle(
-            'CustomBody',
-            parent=styles['BodyText'],
-            fontSize=11,
-            spaceAfter=6,
-            leading=14
-        )
+        title_style, heading_style, body_style = pdf_styles()
         
         # Build content
         story = []
@@ -379,6 +1174,177 @@ def generate_lesson_plan_pdf(lesson_plan: LessonPlan, output_path: str):
         logger.error(f"PDF generation error: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to generate PDF: {str(e)}")
 
+def render_lesson_plan_pdf(lesson_plan: LessonPlan) -> bytes:
+    """Render a lesson plan as PDF into memory."""
+    buffer = io.BytesIO()
+    generate_lesson_plan_pdf(lesson_plan, buffer)
+    return buffer.getvalue()
+
+def render_lesson_plan_pdf_from_doc(lesson_plan_doc: dict):
+    """Process pool entry point: plain dicts pickle more cheaply than models.
+
+    Returns (pdf bytes, render time in ms, peak traced bytes or None) so the
+    caller's span can tell rendering apart from waiting for a free worker.
+    """
+    try:
+        start = time.perf_counter()
+        lesson_plan = LessonPlan(**lesson_plan_doc)
+        peak_bytes = None
+        if MEMORY_TRACKING and memory_tracker.sampled():
+            # Traces allocations for this render only
+            pdf_bytes, peak_bytes = measure_peak(render_lesson_plan_pdf, lesson_plan)
+        else:
+            pdf_bytes = render_lesson_plan_pdf(lesson_plan)
+        return pdf_bytes, round((time.perf_counter() - start) * 1000, 3), peak_bytes
+    except HTTPException as e:
+        # HTTPException cannot be unpickled in the parent process
+        raise RuntimeError(e.detail)
+
+def lesson_plan_filename(lesson_plan: LessonPlan) -> str:
+    return f"lesson_plan_{lesson_plan.request_data.subject_name.replace(' ', '_')}_{lesson_plan.id[:8]}.pdf"
+
+def init_pdf_render_worker():
+    # Forked workers inherit the span of whichever request started them; their
+    # renders are traced from the parent instead, with render_ms attached
+    tracer.enabled = False
+    # Likewise a worker forked while the parent traces allocations would trace every render
+    if tracemalloc.is_tracing():
+        tracemalloc.stop()
+    # Load ReportLab as the worker starts rather than on its first render
+    pdf_styles()
+
+def get_pdf_render_pool() -> ProcessPoolExecutor:
+    global pdf_render_pool
+    if pdf_render_pool is None:
+        pdf_render_pool = ProcessPoolExecutor(max_workers=PDF_RENDER_WORKERS, initializer=init_pdf_render_worker)
+    return pdf_render_pool
+
+class ZipChunkSink:
+    """Write-only, unseekable file object that hands written bytes back in chunks.
+
+    zipfile falls back to data descriptors when it cannot seek, so an archive
+    written here can be streamed to the client entry by entry.
+    """
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+async def render_into_cache(lesson_plan: LessonPlan, content_hash: str) -> bytes:
+    key = (lesson_plan.id, content_hash)
+    try:
+        loop = asyncio.get_running_loop()
+        if request_profiler.is_profiling():
+            # A profiled request renders in this process, where the profiler can see it
+            with tracer.span("generate_lesson_plan_pdf", executor="inline", lesson_plan_id=lesson_plan.id) as span:
+                pdf_bytes = render_lesson_plan_pdf(lesson_plan)
+                span.set(pdf_bytes=len(pdf_bytes))
+        else:
+            with tracer.span("generate_lesson_plan_pdf", executor="process_pool", lesson_plan_id=lesson_plan.id) as span:
+                pdf_bytes, render_ms, peak_bytes = await loop.run_in_executor(
+                    get_pdf_render_pool(), render_lesson_plan_pdf_from_doc, lesson_plan.dict()
+                )
+                span.set(render_ms=render_ms, pdf_bytes=len(pdf_bytes))
+                if peak_bytes is not None:
+                    span.set(peak_bytes=peak_bytes)
+                    memory_tracker.record("render_lesson_plan_pdf (worker)", peak_bytes)
+        await asyncio.to_thread(pdf_cache.put, lesson_plan.id, content_hash, pdf_bytes)
+        logger.info(f"Rendered PDF for lesson plan {lesson_plan.id}: {len(pdf_bytes)} bytes")
+        return pdf_bytes
+    finally:
+        pdf_renders_in_flight.pop(key, None)
+
+async def get_or_render_pdf(lesson_plan: LessonPlan, content_hash: Optional[str] = None) -> bytes:
+    """Return PDF bytes from the cache, joining an in-flight render or starting one."""
+    content_hash = content_hash or lesson_plan_render_hash(lesson_plan)
+    with tracer.span("get_or_render_pdf", lesson_plan_id=lesson_plan.id) as span:
+        key = (lesson_plan.id, content_hash)
+        render = pdf_renders_in_flight.get(key)
+        # A profiled request always renders, since that is what it is there to measure
+        if render is None and not request_profiler.is_profiling():
+            # Cache reads hit the disk, so they run off the event loop
+            pdf_bytes = await asyncio.to_thread(pdf_cache.get, lesson_plan.id, content_hash)
+            if pdf_bytes:
+                span.set(source="cache")
+                return pdf_bytes
+            # Another caller may have started the render while the cache was read
+            render = pdf_renders_in_flight.get(key)
+        if render is None:
+            span.set(source="render")
+            render = asyncio.ensure_future(render_into_cache(lesson_plan, content_hash))
+            pdf_renders_in_flight[key] = render
+        else:
+            span.set(source="in_flight")
+        # Shield so one caller going away does not cancel a render others are waiting on
+        return await asyncio.shield(render)
+
+async def prerender_lesson_plan_pdf(lesson_plan: LessonPlan):
+    """Background task: render a freshly generated plan before anyone asks for it."""
+    await get_or_render_pdf(lesson_plan)
+
+def schedule_pdf_prerender(lesson_plan: LessonPlan):
+    run_in_background(prerender_lesson_plan_pdf(lesson_plan), f"prerender_lesson_plan_pdf:{lesson_plan.id}")
+
+async def render_export_entry(lesson_plan_doc: dict):
+    """Return (filename, pdf bytes) for one plan, using the PDF cache where possible."""
+    lesson_plan = LessonPlan(**decode_lesson_plan_doc(lesson_plan_doc))
+    pdf_bytes = await get_or_render_pdf(lesson_plan)
+    return lesson_plan_filename(lesson_plan), pdf_bytes
+
+async def stream_lesson_plan_zip(cursor):
+    """Render plans in parallel and stream them into a ZIP as each one finishes.
+
+    At most two renders per worker are in flight, so memory stays flat no
+    matter how many plans the cursor yields.
+    """
+    sink = ZipChunkSink()
+    window = PDF_RENDER_WORKERS * 2
+    pending = set()
+    failed = []
+    
+    def write_finished(archive, done):
+        for task in done:
+            try:
+                filename, pdf_bytes = task.result()
+            except Exception as e:
+                logger.error(f"Bulk export render failed: {str(e)}")
+                failed.append(str(e))
+                continue
+            archive.writestr(filename, pdf_bytes)
+    
+    try:
+        # PDFs are already compressed, so store entries as-is
+        with zipfile.ZipFile(sink, mode="w", compression=zipfile.ZIP_STORED) as archive:
+            async for lesson_plan_doc in cursor:
+                if len(pending) >= window:
+                    done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                    write_finished(archive, done)
+                    yield sink.drain()
+                pending.add(asyncio.ensure_future(render_export_entry(lesson_plan_doc)))
+            
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                write_finished(archive, done)
+                yield sink.drain()
+            
+            if failed:
+                archive.writestr("export_errors.txt", "\n".join(failed))
+        yield sink.drain()
+    finally:
+        for task in pending:
+            task.cancel()
+
 # API Routes
 @api_router.post("/auth/signup", response_model=AuthResponse)
 async def signup(user_data: UserSignup):
@@ -386,6 +1352,11 @@ async def signup(user_data: UserSignup):
     if user_data.email in users_db:
         raise HTTPException(status_code=400, detail="Email already registered")
     
+    password_hash = await credential_hasher.hash(user_data.password)
+    # Another signup for the same email may have completed while the password was hashing
+    if user_data.email in users_db:
+        raise HTTPException(status_code=400, detail="Email already registered")
+    
     # Create user
     user = User(
         firstName=user_data.firstName,
@@ -393,7 +1364,7 @@ async def signup(user_data: UserSignup):
         email=user_data.email,
         institution=user_data.institution,
         department=user_data.department,
-        password_hash=hash_password(user_data.password),
+        password_hash=password_hash,
         newsletter=user_data.newsletter
     )
     
@@ -421,9 +1392,13 @@ async def signup(user_data: UserSignup):
 async def login(credentials: UserLogin):
     """Login existing user."""
     user = users_db.get(credentials.email)
-    if not user or not verify_password(credentials.password, user["password_hash"]):
+    if not user or not await credential_hasher.verify(credentials.password, user["password_hash"]):
         raise HTTPException(status_code=401, detail="Invalid email or password")
     
+    # Transparently upgrade legacy SHA-256 hashes now that we know the password
+    if password_needs_rehash(user["password_hash"]):
+        user["password_hash"] = await credential_hasher.hash(credentials.password)
+    
     # Create token
     token = create_jwt_token(user)
     
@@ -447,32 +1422,38 @@ async def validate_api_key(
     current_user: dict = Depends(get_current_user)
 ):
     """Validate and save user's Gemini API key."""
-    try:
-        # Test the API key by making a simple request
-        genai_client = genai.Client(api_key=api_data.apiKey)
-        
-        # Simple test message
-        test_message = "Hello"
-        response = await retry_llm_call(genai_client, test_message)
-        
-        if not response:
-            raise HTTPException(status_code=400, detail="API key validation failed - no response from API")
-        
-        # If successful, store the API key for the user
-        users_db[current_user["email"]]["api_key"] = api_data.apiKey
-        
-        return {"success": True, "message": "API key validated and saved successfully"}
+    from google.genai import errors as genai_errors
     
-    except HTTPException as he:
-        # Re-raise HTTP exceptions from retry mechanism
-        raise he
+    try:
+        await probe_api_key(api_data.apiKey)
+    except asyncio.TimeoutError:
+        logger.error("API key validation timed out")
+        raise HTTPException(status_code=504, detail="Timed out while contacting the Gemini API. Please try again.")
+    except genai_errors.APIError as e:
+        logger.error(f"API key validation failed: {str(e)}")
+        if e.code == 429:
+            raise HTTPException(status_code=429, detail="The Gemini API is rate limiting this key. Please try again in a few minutes.")
+        raise HTTPException(status_code=400, detail="Invalid API key or failed to connect to Gemini API")
     except Exception as e:
         logger.error(f"API key validation failed: {str(e)}")
         raise HTTPException(status_code=400, detail="Invalid API key or failed to connect to Gemini API")
+    
+    # If successful, store the API key for the user
+    users_db[current_user["email"]]["api_key"] = api_data.apiKey
+    
+    return {"success": True, "message": "API key validated and saved successfully"}
 
 @api_router.get("/auth/profile", response_model=UserResponse)
-async def get_profile(current_user: dict = Depends(get_current_user)):
+async def get_profile(
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
+    current_user: dict = Depends(get_current_user)
+):
     """Get current user profile."""
+    headers = cache_headers(profile_etag(current_user), PROFILE_CACHE_CONTROL)
+    if etag_matches(if_none_match, headers["ETag"]):
+        return not_modified(headers)
+    response.headers.update(headers)
     return UserResponse(
         id=current_user["id"],
         firstName=current_user["firstName"],
@@ -484,15 +1465,21 @@ async def get_profile(current_user: dict = Depends(get_current_user)):
     )
 
 @api_router.get("/options")
-async def get_options():
+async def get_options(if_none_match: Optional[str] = Header(None)):
     """Get standard dropdown options"""
-    return {
-        "blooms_taxonomy": BLOOMS_TAXONOMY_LEVELS,
-        "aqf_levels": AQF_LEVELS,
-        "lesson_durations": LESSON_DURATIONS
-    }
+    headers = cache_headers(STANDARD_OPTIONS_ETAG, OPTIONS_CACHE_CONTROL)
+    if etag_matches(if_none_match, STANDARD_OPTIONS_ETAG):
+        return not_modified(headers)
+    return Response(content=STANDARD_OPTIONS_BODY, media_type="application/json", headers=headers)
+
+async def find_previous_extraction(owner_id: str, fingerprints: List[str]) -> Optional[dict]:
+    """The user's recent extraction sharing the most pages with a new upload, if any."""
+    candidates = await storage.list_extractions(
+        owner_id, ["id", "subject_names", "lecture_topics", "lecture_focus_mapping", "pages"], REEXTRACT_CANDIDATES
+    )
+    return best_previous_extraction(candidates, fingerprints)
 
-@api_router.post("/upload-pdf", response_model=PDFExtractionResult)
+@api_router.post("/upload-pdf", response_model=PDFExtractionResult, dependencies=[Depends(admit_llm_request)])
 async def upload_pdf(
     file: UploadFile = File(...),
     current_user: dict = Depends(get_current_user)
@@ -505,85 +1492,98 @@ async def upload_pdf(
     temp_file = None
     try:
         # Create temporary file
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as temp_file:
+        with tracer.span("save_upload"), tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as temp_file:
             shutil.copyfileobj(file.file, temp_file)
             temp_file_path = temp_file.name
         
         # Extract text from PDF
-        pdf_text = extract_text_from_pdf(temp_file_path)
+        page_texts = extract_pdf_pages(temp_file_path)
+        pdf_text = join_pdf_pages(page_texts)
         
         if not pdf_text.strip():
             raise HTTPException(status_code=400, detail="No text found in PDF")
         
+        fingerprints = [page_fingerprint(page_text) for page_text in page_texts]
+        previous, changed = None, []
+        if INCREMENTAL_REEXTRACTION:
+            previous = await find_previous_extraction(current_user["id"], fingerprints)
+            if previous is not None:
+                changed = changed_pages(previous["pages"], fingerprints)
+                if len(changed) > REEXTRACT_MAX_CHANGED_FRACTION * len(page_texts):
+                    previous = None  # mostly a different document
+        
         # Use LLM to extract structured information (use user's API key if available)
         user_api_key = current_user.get("api_key")
         genai_client = get_user_llm_chat(user_api_key)
-        
-        extraction_prompt = f"""
-        Analyze the following academic subject outline PDF content and extract the required information in JSON format.
-        
-        PDF Content:
-        {pdf_text[:8000]}
-        
-        Please extract and return ONLY a JSON object with the following structure:
-        {{
-            "subject_names": ["list of subject names found"],
-            "lecture_topics": ["list of lecture topics from timetable of activities"],
-            "lecture_focus_mapping": {{
-                "Lecture Topic 1": ["focus topic 1.1", "focus topic 1.2"],
-                "Lecture Topic 2": ["focus topic 2.1", "focus topic 2.2"],
-                "etc": ["etc"]
-            }}
-        }}
-        
-        Instructions:
-        1. Look for subject names in headers, titles, or course information
-        2. Find lecture topics in the timetable of activities section
-        3. For each lecture topic, identify its corresponding focus topics (subtopics/subdivisions mentioned for that specific lecture/week)
-        4. Create a mapping where each lecture topic maps to its specific focus topics only
-        5. If a lecture topic has no specific focus topics, map it to an empty array []
-        6. Return clean, readable names without extra formatting
-        7. Return ONLY the JSON object, no other text
-        """
-        
         system_instruction = "You are an expert educational content analyzer and lesson plan generator."
-        response = await retry_llm_call(genai_client, extraction_prompt, system_instruction)
         
         # Parse LLM response
         try:
-            # Clean the response and extract JSON
-            response_text = response.strip()
-            if response_text.startswith('```json'):
-                response_text = response_text.replace('```json', '').replace('```', '').strip()
-            elif response_text.startswith('```'):
-                response_text = response_text.replace('```', '').strip()
-            
-            import json
-            extracted_data = json.loads(response_text)
-            
-            # Validate extracted data
-            subject_names = extracted_data.get('subject_names', [])
-            lecture_topics = extracted_data.get('lecture_topics', [])
-            lecture_focus_mapping = extracted_data.get('lecture_focus_mapping', {})
-            
-            # Ensure we have at least some data
-            if not any([subject_names, lecture_topics]):
-                raise HTTPException(status_code=400, detail="Could not extract meaningful data from PDF")
-            
-            # Validate mapping structure
-            if not isinstance(lecture_focus_mapping, dict):
-                lecture_focus_mapping = {}
-            
-            # Create extraction result
-            result = PDFExtractionResult(
-                filename=file.filename,
-                subject_names=subject_names,
-                lecture_topics=lecture_topics,
-                lecture_focus_mapping=lecture_focus_mapping
-            )
+            if previous is not None:
+                changed_text = join_pdf_pages([page_texts[index] for index in changed])
+                partial = {}
+                if changed_text.strip():  # nothing to ask about if only blank pages changed
+                    extraction_prompt = build_revision_extraction_prompt(changed_text, previous.get("subject_names", []))
+                    response = await retry_llm_call(genai_client, extraction_prompt, system_instruction)
+                    partial = parse_llm_json(response)
+                    if not isinstance(partial, dict):
+                        partial = {}
+                with tracer.span("merge_revision", changed_pages=len(changed), total_pages=len(page_texts)):
+                    merged, changes = merge_revision(previous, page_texts, fingerprints, changed, partial)
+                
+                result = PDFExtractionResult(
+                    filename=file.filename,
+                    owner_id=current_user["id"],
+                    content_hash=text_hash(pdf_text),
+                    revision=ExtractionRevision(
+                        previous_extraction_id=previous["id"],
+                        changed_pages=[index + 1 for index in changed],
+                        reused_pages=len(page_texts) - len(changed),
+                        **changes
+                    ),
+                    **merged
+                )
+                pages_sent = len(changed) if changed_text.strip() else 0
+            else:
+                extraction_prompt = build_extraction_prompt(pdf_text)
+                response = await retry_llm_call(genai_client, extraction_prompt, system_instruction)
+                extracted_data = parse_llm_json(response)
+                
+                # Validate extracted data
+                subject_names = extracted_data.get('subject_names', [])
+                lecture_topics = extracted_data.get('lecture_topics', [])
+                lecture_focus_mapping = extracted_data.get('lecture_focus_mapping', {})
+                
+                # Ensure we have at least some data
+                if not any([subject_names, lecture_topics]):
+                    raise HTTPException(status_code=400, detail="Could not extract meaningful data from PDF")
+                
+                # Validate mapping structure
+                if not isinstance(lecture_focus_mapping, dict):
+                    lecture_focus_mapping = {}
+                
+                # Create extraction result
+                result = PDFExtractionResult(
+                    filename=file.filename,
+                    subject_names=subject_names,
+                    lecture_topics=lecture_topics,
+                    lecture_focus_mapping=lecture_focus_mapping,
+                    owner_id=current_user["id"],
+                    content_hash=text_hash(pdf_text),
+                    # Which topics each page holds, so a revised upload can re-extract just its changed pages
+                    pages=[
+                        ExtractionPage(fingerprint=fingerprint, topics=topics_on_page(page_text, lecture_topics))
+                        for page_text, fingerprint in zip(page_texts, fingerprints)
+                    ]
+                )
+                pages_sent = len(page_texts)
             
             # Save to database
-            await db.pdf_extractions.insert_one(result.dict())
+            await storage.insert_extraction(result.dict())
+            if search_mode == "local":
+                index_extraction_locally(result)
+            record_usage(current_user, "upload_pdf", extraction_id=result.id, text_chars=len(pdf_text),
+                         pages_total=len(page_texts), pages_sent=pages_sent)
             
             return result
             
@@ -601,97 +1601,78 @@ async def upload_pdf(
 @api_router.post("/generate-lesson-plan", response_model=LessonPlan)
 async def generate_lesson_plan(
     request: LessonPlanRequest,
+    reuse_similar: bool = Query(False),
+    x_request_priority: Optional[str] = Header(None),
     current_user: dict = Depends(get_current_user)
 ):
-    """Generate lesson plan using LLM"""
-    try:
-        # Use user's API key if available
-        user_api_key = current_user.get("api_key")
-        genai_client = get_user_llm_chat(user_api_key)
-        
-        generation_prompt = f"""
-        Create a detailed lesson plan based on the following parameters:
-        
-        Subject: {request.subject_name}
-        Lecture Topic: {request.lecture_topic}
-        Focus Topic: {request.focus_topic if request.focus_topic else "General coverage of the lecture topic"}
-        Bloom's Taxonomy Level: {request.blooms_taxonomy}
-        AQF Level: {request.aqf_level}
-        Duration: {request.lesson_duration}
-        
-        Please create a comprehensive lesson plan with professional formatting. Use proper headings, bullet points, and structure. DO NOT use markdown symbols like #, *, or other formatting characters. Format it as follows:
-        
-        LEARNING OBJECTIVES
-        - Clear, measurable objectives aligned with the {request.blooms_taxonomy} level of Bloom's taxonomy
-        
-        LEARNING OUTCOMES
-        - What students will achieve, appropriate for {request.aqf_level}
-        
-        PRE-REQUISITES
-        - Required knowledge or skills
-        
-        MATERIALS AND RESOURCES
-        - What's needed for the lesson
-        
-        LESSON STRUCTURE ({request.lesson_duration})
-        
-        Introduction/Hook (X minutes)
-        - Engage students activities
-        
-        Main Content Delivery (X minutes)
-        - Explanation and demonstration activities
-        
-        Active Learning Activities (X minutes)
-        - Hands-on, discussion, and practice activities
-        
-        Assessment/Evaluation (X minutes)
-        - Formative assessment aligned with Bloom's level
-        
-        Conclusion/Summary (X minutes)
-        - Wrap-up activities
-        
-        ASSESSMENT CRITERIA
-        - How student understanding will be measured
-        
-        EXTENSION ACTIVITIES
-        - For advanced students
-        
-        DIFFERENTIATION STRATEGIES
-        - For diverse learning needs
-        
-        Focus Area: {f"Emphasize {request.focus_topic} within the broader {request.lecture_topic} context" if request.focus_topic else f"Provide comprehensive coverage of {request.lecture_topic}"}
-        
-        Ensure the content is:
-        - Age and level appropriate for {request.aqf_level}
-        - {"Focused specifically on '" + request.focus_topic + "'" if request.focus_topic else "Comprehensively covering '" + request.lecture_topic + "'"}
-        - Designed to achieve {request.blooms_taxonomy} level cognitive skills
-        - Realistic for the {request.lesson_duration} timeframe
-        - Engaging and interactive
-        - Professionally formatted without markdown symbols
-        
-        Format the response as clean, professional text with clear section headings in ALL CAPS and proper bullet points using hyphens.
-        """
-        
-        system_instruction = "You are an expert educational content analyzer and lesson plan generator."
-        response = await retry_llm_call(genai_client, generation_prompt, system_instruction)
-        
-        # Create lesson plan object
-        lesson_plan = LessonPlan(
-            request_data=request,
-            content=response
-        )
-        
-        # Save to database
-        await db.lesson_plans.insert_one(lesson_plan.dict())
-        
-        return lesson_plan
-        
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to generate lesson plan: {str(e)}")
+    """Generate lesson plan using LLM
+
+    With reuse_similar=true, a copy of an earlier plan for a near-identical
+    request is returned instead when there is one, without calling Gemini
+    or waiting for an admission slot.
+    """
+    if reuse_similar and SIMILAR_PLAN_CACHE:
+        lesson_plan = await reuse_similar_lesson_plan(request, current_user)
+        if lesson_plan is not None:
+            return lesson_plan
+    
+    async with llm_slot(request_priority(x_request_priority)):
+        try:
+            # Use user's API key if available
+            user_api_key = current_user.get("api_key")
+            genai_client = get_user_llm_chat(user_api_key)
+            
+            generation_prompt = build_lesson_plan_prompt(request)
+            
+            system_instruction = "You are an expert educational content analyzer and lesson plan generator."
+            response = await retry_llm_call(genai_client, generation_prompt, system_instruction)
+            
+            # Create lesson plan object
+            lesson_plan = LessonPlan(
+                request_data=request,
+                content=response,
+                owner_id=current_user["id"],
+                content_hash=text_hash(response)
+            )
+            
+            # Save to database
+            await storage.insert_lesson_plan(encode_lesson_plan_doc(lesson_plan))
+            if search_mode == "local":
+                index_lesson_plan_locally(lesson_plan)
+            index_similar_plan(lesson_plan)
+            record_usage(current_user, "generate_lesson_plan", lesson_plan_id=lesson_plan.id, content_chars=len(response))
+            
+            # Almost every plan is downloaded right away, so start rendering now
+            if PDF_EAGER_RENDER:
+                schedule_pdf_prerender(lesson_plan)
+            
+            return lesson_plan
+            
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Failed to generate lesson plan: {str(e)}")
+
+@api_router.post("/lesson-plans/similar")
+async def find_similar_lesson_plans(
+    request: LessonPlanRequest,
+    limit: int = Query(5, ge=1, le=20),
+    current_user: dict = Depends(get_current_user)
+):
+    """Earlier plans whose request is a near-duplicate of this one, best first"""
+    matches = []
+    if SIMILAR_PLAN_CACHE:
+        matches = similar_plans.query(similar_plan_scope(current_user["id"]), request.dict(), limit=limit)
+    return {
+        "threshold": similar_plans.threshold,
+        "matches": [
+            {"id": plan_id, "score": score, "request_data": request_data}
+            for score, plan_id, request_data in matches
+        ],
+    }
 
 @api_router.get("/download-lesson-plan/{lesson_plan_id}")
 async def download_lesson_plan(
     lesson_plan_id: str,
+    if_none_match: Optional[str] = Header(None),
     current_user: dict = Depends(get_current_user)
 ):
     """Download lesson plan as PDF"""
@@ -699,52 +1680,383 @@ async def download_lesson_plan(
         logger.info(f"Attempting to download lesson plan: {lesson_plan_id}")
         
         # Get lesson plan from database
-        lesson_plan_doc = await db.lesson_plans.find_one({"id": lesson_plan_id})
+        lesson_plan_doc = await storage.get_lesson_plan(lesson_plan_id, current_user["id"])
         if not lesson_plan_doc:
             logger.error(f"Lesson plan not found: {lesson_plan_id}")
             raise HTTPException(status_code=404, detail="Lesson plan not found")
         
         logger.info("Found lesson plan in database")
-        lesson_plan = LessonPlan(**lesson_plan_doc)
-        
-        # Generate PDF
-        logger.info("Creating temporary PDF file")
-        temp_pdf = tempfile.NamedTemporaryFile(delete=False, suffix='.pdf')
-        temp_pdf.close()  # Close the file handle before generating PDF
+        lesson_plan = LessonPlan(**decode_lesson_plan_doc(lesson_plan_doc))
+        content_hash = lesson_plan_render_hash(lesson_plan)
+        etag = lesson_plan_etag(content_hash)
+        headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
         
-        logger.info(f"Generating PDF at: {temp_pdf.name}")
-        generate_lesson_plan_pdf(lesson_plan, temp_pdf.name)
+        # The client already has this exact PDF
+        if etag_matches(if_none_match, etag):
+            logger.info("ETag matched, returning 304")
+            return Response(status_code=304, headers=headers)
         
-        # Check if file was created
-        if not os.path.exists(temp_pdf.name):
-            logger.error("PDF file was not created")
-            raise HTTPException(status_code=500, detail="Failed to create PDF file")
-        
-        logger.info(f"PDF generated successfully, file size: {os.path.getsize(temp_pdf.name)} bytes")
+        # Serve the cached copy, wait for the background render, or render now
+        pdf_bytes = await get_or_render_pdf(lesson_plan, content_hash)
         
         # Return file
-        filename = f"lesson_plan_{lesson_plan.request_data.subject_name.replace(' ', '_')}_{lesson_plan_id[:8]}.pdf"
-        return FileResponse(
-            temp_pdf.name,
+        filename = lesson_plan_filename(lesson_plan)
+        headers["Content-Disposition"] = f'attachment; filename="{filename}"'
+        headers["Content-Length"] = str(len(pdf_bytes))
+        return StreamingResponse(
+            iter_bytes(pdf_bytes),
             media_type="application/pdf",
-            filename=filename
+            headers=headers
         )
         
+    except HTTPException:
+        raise  # Re-raise HTTP exceptions
     except Exception as e:
         logger.error(f"PDF download error: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to generate PDF: {str(e)}")
 
+@api_router.get("/search", response_model=SearchResults)
+async def search(
+    q: str = Query(..., min_length=2, max_length=200),
+    scope: str = Query("all", pattern="^(all|lesson_plans|extractions)$"),
+    page: int = Query(1, ge=1),
+    limit: int = Query(20, ge=1, le=SEARCH_PAGE_MAX),
+    current_user: dict = Depends(get_current_user)
+):
+    """Search the current user's lesson plans and extracted topics, best match first"""
+    offset = (page - 1) * limit
+    if offset > SEARCH_MAX_OFFSET:
+        raise HTTPException(status_code=400, detail=f"Search results are limited to the first {SEARCH_MAX_OFFSET} matches")
+    kinds = {"all": ["lesson_plan", "extraction"], "lesson_plans": ["lesson_plan"], "extractions": ["extraction"]}[scope]
+    
+    if search_mode == "mongo":
+        try:
+            total, hits = await storage_text_search(current_user["id"], q, kinds, limit, offset)
+        except NotImplementedError as e:
+            use_local_search(str(e))
+    if search_mode == "local":
+        total, hits = local_search_index.search(current_user["id"], q, kinds, limit, offset)
+    
+    items = [SearchHit(kind=kind, id=summary["id"], score=round(score, 4), **{kind: summary}) for score, kind, summary in hits]
+    return SearchResults(query=q, total=total, page=page, limit=limit, backend=search_mode, items=items)
+
+@api_router.post("/export-lesson-plans")
+async def export_lesson_plans(
+    export_request: LessonPlanExportRequest,
+    current_user: dict = Depends(get_current_user)
+):
+    """Download many lesson plans as a ZIP of PDFs"""
+    if not export_request.lesson_plan_ids and not export_request.subject_name:
+        raise HTTPException(status_code=400, detail="Provide lesson_plan_ids or subject_name to export")
+    
+    count = await storage.count_lesson_plans(
+        export_request.lesson_plan_ids, export_request.subject_name, owner_id=current_user["id"]
+    )
+    if count == 0:
+        raise HTTPException(status_code=404, detail="No lesson plans matched the export request")
+    if count > EXPORT_MAX_PLANS:
+        raise HTTPException(status_code=400, detail=f"Export is limited to {EXPORT_MAX_PLANS} lesson plans, {count} matched")
+    
+    logger.info(f"Exporting {count} lesson plans")
+    cursor = storage.iter_lesson_plans(
+        export_request.lesson_plan_ids, export_request.subject_name, owner_id=current_user["id"],
+        batch_size=PDF_RENDER_WORKERS * 2
+    )
+    filename = f"lesson_plans_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.zip"
+    return StreamingResponse(
+        stream_lesson_plan_zip(cursor),
+        media_type="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+@api_router.get("/history/lesson-plans", response_model=LessonPlanHistoryPage)
+async def list_lesson_plan_history(
+    limit: int = Query(HISTORY_PAGE_DEFAULT, ge=1, le=HISTORY_PAGE_MAX),
+    cursor: Optional[str] = None,
+    current_user: dict = Depends(get_current_user)
+):
+    """List the current user's lesson plans newest first, without their content"""
+    docs, next_cursor = await fetch_owner_page(
+        storage.list_lesson_plans, current_user["id"], "generated_at", LESSON_PLAN_SUMMARY_FIELDS, limit, cursor
+    )
+    return LessonPlanHistoryPage(items=docs, next_cursor=next_cursor)
+
+@api_router.get("/history/extractions", response_model=PDFExtractionHistoryPage)
+async def list_extraction_history(
+    limit: int = Query(HISTORY_PAGE_DEFAULT, ge=1, le=HISTORY_PAGE_MAX),
+    cursor: Optional[str] = None,
+    current_user: dict = Depends(get_current_user)
+):
+    """List the current user's PDF extractions newest first, without topic mappings"""
+    docs, next_cursor = await fetch_owner_page(
+        storage.list_extractions, current_user["id"], "extracted_at", EXTRACTION_SUMMARY_FIELDS, limit, cursor
+    )
+    return PDFExtractionHistoryPage(items=docs, next_cursor=next_cursor)
+
+@api_router.get("/lesson-plans/{lesson_plan_id}", response_model=LessonPlan)
+async def get_lesson_plan(
+    lesson_plan_id: str,
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
+    if_modified_since: Optional[str] = Header(None),
+    current_user: dict = Depends(get_current_user)
+):
+    """Get one of the current user's lesson plans with its full content"""
+    etag = stored_record_etag("lesson_plan", lesson_plan_id, current_user["id"])
+    # Stored plans never change, so a matching tag is answered without a lookup
+    if etag_matches(if_none_match, etag):
+        return not_modified(cache_headers(etag, STORED_RECORD_CACHE_CONTROL))
+    
+    lesson_plan_doc = await storage.get_lesson_plan(lesson_plan_id, owner_id=current_user["id"])
+    if not lesson_plan_doc:
+        raise HTTPException(status_code=404, detail="Lesson plan not found")
+    headers = cache_headers(etag, STORED_RECORD_CACHE_CONTROL, lesson_plan_doc["generated_at"])
+    if not if_none_match and not_modified_since(if_modified_since, lesson_plan_doc["generated_at"]):
+        return not_modified(headers)
+    response.headers.update(headers)
+    return LessonPlan(**decode_lesson_plan_doc(lesson_plan_doc))
+
+@api_router.get("/extractions/{extraction_id}", response_model=PDFExtractionResult)
+async def get_extraction(
+    extraction_id: str,
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
+    if_modified_since: Optional[str] = Header(None),
+    current_user: dict = Depends(get_current_user)
+):
+    """Get one of the current user's PDF extractions with its full topic mapping"""
+    etag = stored_record_etag("extraction", extraction_id, current_user["id"])
+    # Extractions never change once stored, so a matching tag is answered without a lookup
+    if etag_matches(if_none_match, etag):
+        return not_modified(cache_headers(etag, STORED_RECORD_CACHE_CONTROL))
+    
+    extraction_doc = await storage.get_extraction(extraction_id, owner_id=current_user["id"])
+    if not extraction_doc:
+        raise HTTPException(status_code=404, detail="Extraction not found")
+    headers = cache_headers(etag, STORED_RECORD_CACHE_CONTROL, extraction_doc["extracted_at"])
+    if not if_none_match and not_modified_since(if_modified_since, extraction_doc["extracted_at"]):
+        return not_modified(headers)
+    response.headers.update(headers)
+    return PDFExtractionResult(**extraction_doc)
+
 @api_router.post("/status", response_model=StatusCheck)
 async def create_status_check(input: StatusCheckCreate):
     status_dict = input.dict()
     status_obj = StatusCheck(**status_dict)
-    _ = await db.status_checks.insert_one(status_obj.dict())
+    # Status checks are write-only probes, so batch them rather than wait on Mongo
+    write_behind.enqueue("status_checks", status_obj.dict())
+    record_status_rollups(status_obj)
     return status_obj
 
 @api_router.get("/status", response_model=List[StatusCheck])
-async def get_status_checks():
-    status_checks = await db.status_checks.find().to_list(1000)
-    return [StatusCheck(**status_check) for status_check in status_checks]
+async def get_status_checks(
+    limit: int = Query(STATUS_PAGE_DEFAULT, ge=1, le=STATUS_PAGE_MAX),
+    cursor: Optional[str] = None,
+    since: Optional[datetime] = None,
+    format: str = Query("json", pattern="^(json|ndjson)$")
+):
+    """List status checks newest first.
+
+    Pages are keyset-paginated on (timestamp, id); the cursor for the next page
+    is returned in the X-Next-Cursor header. format=ndjson streams every check
+    after the cursor (and newer than ``since``) as one JSON object per line.
+    """
+    after = page_after(cursor)
+    
+    if format == "ndjson":
+        async def stream_status_checks():
+            async for status_check in storage.iter_status_checks(STATUS_FIELDS, after=after, since=since, batch_size=STATUS_PAGE_MAX):
+                yield orjson.dumps(status_check) + b"\n"
+        return StreamingResponse(stream_status_checks(), media_type="application/x-ndjson")
+    
+    # Fetch one extra document to learn whether another page exists
+    status_checks = await storage.list_status_checks(STATUS_FIELDS, limit + 1, after=after, since=since)
+    headers = {}
+    if len(status_checks) > limit:
+        status_checks = status_checks[:limit]
+        last = status_checks[-1]
+        headers["X-Next-Cursor"] = encode_page_cursor(last["timestamp"], last["id"])
+    
+    # Documents already match StatusCheck, so skip re-validating each one
+    return ORJSONResponse(status_checks, headers=headers)
+
+@api_router.get("/status/rollups", response_model=List[StatusRollup])
+async def get_status_rollups(
+    granularity: str = Query("minute", pattern="^(minute|hour)$"),
+    client_name: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    limit: int = Query(60, ge=1, le=STATUS_PAGE_MAX)
+):
+    """Status check counts per client and minute or hour bucket, newest first"""
+    rollups = await storage.list_status_rollups(granularity, client_name, since, until, limit)
+    return ORJSONResponse(rollups)
+
+@api_router.get("/metrics/startup")
+async def get_startup_metrics():
+    """Duration of startup and of each warm-up step (null if the step failed)"""
+    return startup_profile
+
+@api_router.get("/metrics/write-behind")
+async def get_write_behind_metrics():
+    """Backlog and throughput of the batched write buffer"""
+    return write_behind.stats()
+
+@api_router.get("/metrics/admission")
+async def get_admission_metrics():
+    """In-flight and queued LLM operations, and how many requests were shed"""
+    return llm_admission.stats()
+
+@api_router.get("/metrics/similar-plans")
+async def get_similar_plan_metrics():
+    """Size of the near-duplicate request index"""
+    return similar_plans.stats()
+
+@api_router.get("/admin/traces", dependencies=[Depends(require_admin)])
+async def list_traces(
+    limit: int = Query(50, ge=1, le=500),
+    min_duration_ms: float = Query(0, ge=0),
+    name: Optional[str] = None
+):
+    """Recently finished traces, newest first; filter by root span duration or name"""
+    return {"traces": tracer.recent_traces(limit, min_duration_ms, name)}
+
+@api_router.get("/admin/traces/{trace_id}", dependencies=[Depends(require_admin)])
+async def get_trace(trace_id: str):
+    """Every span recorded for one trace, in start order"""
+    spans = tracer.get_trace(trace_id)
+    if spans is None:
+        raise HTTPException(status_code=404, detail="Trace not found or no longer buffered")
+    return {"trace_id": trace_id, "spans": spans}
+
+@api_router.get("/admin/memory", dependencies=[Depends(require_admin)])
+async def get_memory_stats():
+    """Peak traced allocation per route, largest first, with the top allocation sites of each"""
+    return memory_tracker.stats()
+
+@api_router.delete("/admin/memory", dependencies=[Depends(require_admin)])
+async def reset_memory_stats():
+    """Forget the samples recorded so far, e.g. before and after a deploy"""
+    memory_tracker.reset()
+    return {"reset": True}
+
+@api_router.get("/admin/profiles", dependencies=[Depends(require_admin)])
+async def list_profiles():
+    """Saved request profiles, newest first"""
+    return {"profiles": request_profiler.list()}
+
+@api_router.get("/admin/profiles/{name}", dependencies=[Depends(require_admin)])
+async def get_request_profile(
+    name: str,
+    format: str = Query("prof", pattern="^(prof|text)$"),
+    sort: str = Query("cumulative"),
+    limit: int = Query(50, ge=1, le=1000)
+):
+    """A profile as a pstats file for snakeviz or pstats, or with format=text as the top functions by sort"""
+    if sort not in SORT_KEYS:
+        raise HTTPException(status_code=400, detail=f"sort must be one of {', '.join(SORT_KEYS)}")
+    path = request_profiler.path(name)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    if format == "text":
+        return Response(content=request_profiler.report(name, sort, limit), media_type="text/plain")
+    return Response(
+        content=path.read_bytes(),
+        media_type="application/octet-stream",
+        headers={"Content-Disposition": f'attachment; filename="{name}.prof"'}
+    )
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - [%(trace_id)s] %(message)s'
+)
+for log_handler in logging.getLogger().handlers:
+    log_handler.addFilter(TraceIdLogFilter(tracer))
+logger = logging.getLogger(__name__)
+
+def warm_pdf_renderer():
+    pdf_styles()
+    return os.getpid()
+
+async def warm_pdf_render_pool():
+    """Start the render workers so the first download does not wait for them."""
+    loop = asyncio.get_running_loop()
+    pool = get_pdf_render_pool()
+    await asyncio.gather(*[loop.run_in_executor(pool, warm_pdf_renderer) for _ in range(PDF_RENDER_WORKERS)])
+
+def warm_llm_client():
+    """Import the GenAI SDK and build the system client if a key is configured."""
+    from google.genai import errors, types  # noqa: F401
+    if os.environ.get('GOOGLE_API_KEY'):
+        get_llm_chat()
+
+def warm_request_modules():
+    """Import the modules that token checks and PDF uploads load on first use."""
+    import jwt  # noqa: F401
+    from pypdf import PdfReader  # noqa: F401
+
+async def warm_up():
+    """Run each warm-up step with a timeout; a failed step only costs its latency later."""
+    steps = [
+        ("storage_ping", storage.ping()),
+        ("pdf_render_pool", warm_pdf_render_pool()),
+        ("llm_client", asyncio.to_thread(warm_llm_client)),
+        ("request_modules", asyncio.to_thread(warm_request_modules)),
+    ]
+    for name, step in steps:
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(step, timeout=STARTUP_WARMUP_TIMEOUT)
+            startup_profile["warmup_ms"][name] = round((time.perf_counter() - start) * 1000, 1)
+        except Exception as e:
+            startup_profile["warmup_ms"][name] = None
+            logger.warning(f"Warm-up step {name} failed: {type(e).__name__}: {str(e)}")
+
+async def initialize_storage():
+    """Bootstrap storage, leaving it to finish in the background if it outlasts STARTUP_STORAGE_TIMEOUT."""
+    task = run_in_background(storage.initialize(), "initialize_storage")
+    try:
+        await asyncio.wait_for(asyncio.shield(task), timeout=STARTUP_STORAGE_TIMEOUT)
+    except asyncio.TimeoutError:
+        logger.warning(f"Storage initialization still running after {STARTUP_STORAGE_TIMEOUT}s; continuing in the background")
+    except Exception:
+        pass  # logged by finish_background_task
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    start = time.perf_counter()
+    if MEMORY_TRACKING:
+        memory_tracker.start()
+    await initialize_storage()
+    logger.info(f"Using {storage.backend} storage")
+    await configure_search()
+    if SIMILAR_PLAN_CACHE:
+        run_in_background(backfill_similar_plans(), "backfill_similar_plans")
+    write_behind.start()
+    if STARTUP_WARMUP:
+        await warm_up()
+    startup_profile["startup_ms"] = round((time.perf_counter() - start) * 1000, 1)
+    startup_profile["ready"] = True
+    logger.info(f"Ready after {startup_profile['startup_ms']}ms of startup: {startup_profile['warmup_ms']}")
+    
+    yield
+    
+    await cancel_background_tasks()
+    await write_behind.stop()
+    await storage.close()
+    credential_hasher.shutdown()
+    tracer.close()
+    if memory_tracker.enabled:
+        memory_tracker.stop()
+    if pdf_render_pool is not None:
+        pdf_render_pool.shutdown(wait=False, cancel_futures=True)
+
+# Create the main app without a prefix. orjson renders response bodies several times faster
+# than json, but routes with a response_model still spend most of their serialization time
+# in validation and jsonable_encoder; end to end the gain is closer to 10% for a full
+# history page (see benchmarks/bench_response_encoding.py)
+app = FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse)
 
 # Include the router in the main app
 app.include_router(api_router)
@@ -757,14 +2069,20 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
-logger = logging.getLogger(__name__)
+if RESPONSE_COMPRESSION:
+    app.add_middleware(
+        CompressionMiddleware,
+        minimum_size=RESPONSE_COMPRESSION_MIN_BYTES,
+        gzip_level=RESPONSE_COMPRESSION_GZIP_LEVEL,
+        brotli_quality=RESPONSE_COMPRESSION_BROTLI_QUALITY
+    )
+
+if MEMORY_TRACKING:
+    app.add_middleware(MemoryTrackingMiddleware, tracker=memory_tracker)
+
+if PROFILING_ENABLED:
+    app.add_middleware(ProfilingMiddleware, profiler=request_profiler, authorize=is_admin_token, trace_id=tracer.current_trace_id)
 
-@app.on_event("shutdown")
-async def shutdown_db_client():
-    client.close()
+# Outermost, so the request span covers every other middleware
+app.add_middleware(TracingMiddleware, tracer=tracer)
 
@@ -0,0 +1,554 @@
+"""Persistence layer: a MongoDB (Motor) backend and an in-memory backend with the same semantics."""
+import bisect
+import logging
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# pymongo's sort directions; pymongo and motor themselves are only imported
+# once the Mongo backend is used, so the memory backend never loads them
+ASCENDING = 1
+DESCENDING = -1
+
+# Text search field weights, shared by the Mongo text indexes and the local fallback.
+# Compressed plans are searched through "search_terms"; "content" covers legacy plain-text plans.
+LESSON_PLAN_SEARCH_WEIGHTS = {
+    "request_data.subject_name": 10,
+    "request_data.lecture_topic": 10,
+    "request_data.focus_topic": 5,
+    "search_terms": 1,
+    "content": 1,
+}
+EXTRACTION_SEARCH_WEIGHTS = {
+    "subject_names": 10,
+    "lecture_topics": 5,
+    "filename": 2,
+}
+
+# OperationFailure codes meaning $text cannot work on this deployment at all:
+# IndexNotFound (no text index) and CommandNotSupported (Mongo-compatible servers)
+TEXT_SEARCH_UNSUPPORTED_CODES = {27, 115}
+
+
+def text_search_unsupported(error) -> bool:
+    """Whether a failed $text query means text search is unavailable, rather than a transient failure."""
+    message = str(error).lower()
+    return error.code in TEXT_SEARCH_UNSUPPORTED_CODES or (
+        "$text" in message and ("not supported" in message or "unknown top level operator" in message)
+    )
+
+
+# A keyset position: records strictly after it in (sort field desc, id desc) order
+PageKey = Tuple[datetime, str]
+
+
+def mongo_indexes(status_check_ttl_seconds: int) -> Dict[str, list]:
+    """Indexes created and verified at startup, per collection."""
+    from pymongo import TEXT, IndexModel
+    
+    return {
+        "lesson_plans": [
+            IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+            IndexModel([("owner_id", ASCENDING), ("generated_at", DESCENDING), ("id", DESCENDING)], name="owner_generated_at"),
+            IndexModel([("content_hash", ASCENDING)], name="content_hash"),
+            IndexModel(
+                [("owner_id", ASCENDING)] + [(field, TEXT) for field in LESSON_PLAN_SEARCH_WEIGHTS],
+                name="owner_search_text", weights=LESSON_PLAN_SEARCH_WEIGHTS
+            ),
+        ],
+        "pdf_extractions": [
+            IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+            IndexModel([("owner_id", ASCENDING), ("extracted_at", DESCENDING), ("id", DESCENDING)], name="owner_extracted_at"),
+            IndexModel([("content_hash", ASCENDING)], name="content_hash"),
+            IndexModel(
+                [("owner_id", ASCENDING)] + [(field, TEXT) for field in EXTRACTION_SEARCH_WEIGHTS],
+                name="owner_search_text", weights=EXTRACTION_SEARCH_WEIGHTS
+            ),
+        ],
+        "usage_events": [
+            IndexModel([("user_id", ASCENDING), ("timestamp", DESCENDING)], name="user_timestamp"),
+        ],
+        "status_checks": [
+            IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+            IndexModel([("timestamp", DESCENDING), ("id", DESCENDING)], name="timestamp_id"),
+            IndexModel([("timestamp", ASCENDING)], name="timestamp_ttl", expireAfterSeconds=status_check_ttl_seconds),
+        ],
+        "status_rollups": [
+            IndexModel([("granularity", ASCENDING), ("client_name", ASCENDING), ("bucket_start", DESCENDING)], name="granularity_client_bucket", unique=True),
+            IndexModel([("granularity", ASCENDING), ("bucket_start", DESCENDING)], name="granularity_bucket"),
+            IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+        ],
+    }
+
+
+class Storage:
+    """Interface the API persists through.
+
+    Documents go in and come out as plain dicts in their stored form (for
+    example with compressed lesson plan content); encoding is the caller's
+    job. Listing methods return only the requested top-level ``fields``.
+    """
+
+    backend = "abstract"
+
+    async def initialize(self):
+        """Prepare the backend (indexes, connections) before serving requests."""
+
+    async def ping(self) -> bool:
+        return True
+
+    async def close(self):
+        pass
+
+    # Lesson plans
+    async def insert_lesson_plan(self, doc: dict):
+        raise NotImplementedError
+
+    async def get_lesson_plan(self, lesson_plan_id: str, owner_id: Optional[str] = None) -> Optional[dict]:
+        raise NotImplementedError
+
+    async def list_lesson_plans(self, owner_id: str, fields: List[str], limit: int, after: Optional[PageKey] = None) -> List[dict]:
+        """A user's plans newest first, by (generated_at, id)."""
+        raise NotImplementedError
+
+    async def count_lesson_plans(self, lesson_plan_ids: Optional[List[str]] = None, subject_name: Optional[str] = None, owner_id: Optional[str] = None) -> int:
+        """Plans matching the ids and subject; only ``owner_id``'s plans when given."""
+        raise NotImplementedError
+
+    def iter_lesson_plans(self, lesson_plan_ids: Optional[List[str]] = None, subject_name: Optional[str] = None, owner_id: Optional[str] = None, batch_size: int = 100) -> AsyncIterator[dict]:
+        """Plans matching the ids and subject; only ``owner_id``'s plans when given, every user's otherwise."""
+        raise NotImplementedError
+
+    # PDF extractions
+    async def insert_extraction(self, doc: dict):
+        raise NotImplementedError
+
+    async def get_extraction(self, extraction_id: str, owner_id: Optional[str] = None) -> Optional[dict]:
+        raise NotImplementedError
+
+    async def list_extractions(self, owner_id: str, fields: List[str], limit: int, after: Optional[PageKey] = None) -> List[dict]:
+        """A user's extractions newest first, by (extracted_at, id)."""
+        raise NotImplementedError
+
+    def iter_extractions(self, batch_size: int = 100) -> AsyncIterator[dict]:
+        raise NotImplementedError
+
+    # Text search
+    async def text_search(self, kind: str, owner_id: Optional[str], query: str, fields: List[str], limit: int) -> Tuple[int, List[Tuple[float, dict]]]:
+        """Return (total matches, [(score, doc)]) for "lesson_plan" or "extraction" records.
+
+        Raises NotImplementedError when the backend has no text search; other
+        failures, such as timeouts, are raised as they are.
+        """
+        raise NotImplementedError
+
+    # Status checks
+    async def list_status_checks(self, fields: List[str], limit: int, after: Optional[PageKey] = None, since: Optional[datetime] = None) -> List[dict]:
+        """Status checks newest first, by (timestamp, id)."""
+        raise NotImplementedError
+
+    def iter_status_checks(self, fields: List[str], after: Optional[PageKey] = None, since: Optional[datetime] = None, batch_size: int = 1000) -> AsyncIterator[dict]:
+        raise NotImplementedError
+
+    async def list_status_rollups(self, granularity: str, client_name: Optional[str], since: Optional[datetime], until: Optional[datetime], limit: int) -> List[dict]:
+        raise NotImplementedError
+
+    # Batched writes, used by the write-behind buffer
+    async def insert_many(self, collection_name: str, docs: List[dict]) -> int:
+        """Insert unordered and return how many landed; raises only if the write failed as a whole."""
+        raise NotImplementedError
+
+    async def apply_increments(self, collection_name: str, increments: List[Tuple[dict, dict, Optional[dict]]]) -> int:
+        """Upsert each (filter, inc, set_on_insert) as ``$inc`` plus ``$setOnInsert``.
+
+        Returns how many were applied; raises only if none were.
+        """
+        raise NotImplementedError
+
+
+def projection(fields: List[str]) -> dict:
+    return {"_id": 0, **{field: 1 for field in fields}}
+
+
+def keyset_filter(sort_field: str, after: Optional[PageKey]) -> dict:
+    """Mongo filter for records after ``after`` in (sort_field desc, id desc) order."""
+    if not after:
+        return {}
+    sort_value, record_id = after
+    return {"$or": [
+        {sort_field: {"$lt": sort_value}},
+        {sort_field: sort_value, "id": {"$lt": record_id}},
+    ]}
+
+
+class MongoStorage(Storage):
+    backend = "mongo"
+
+    def __init__(self, mongo_url: str, db_name: str, status_check_ttl_seconds: int):
+        self.mongo_url = mongo_url
+        self.db_name = db_name
+        self.status_check_ttl_seconds = status_check_ttl_seconds
+        self.client = None
+        self._db = None
+
+    @property
+    def db(self):
+        """The Motor database, with the client created on first use."""
+        if self._db is None:
+            from motor.motor_asyncio import AsyncIOMotorClient
+            self.client = AsyncIOMotorClient(self.mongo_url)
+            self._db = self.client[self.db_name]
+        return self._db
+
+    async def initialize(self):
+        await self.ensure_indexes()
+
+    async def ensure_indexes(self):
+        """Create the indexes from mongo_indexes() and check they all exist afterwards."""
+        from pymongo.errors import OperationFailure
+        
+        for collection_name, indexes in mongo_indexes(self.status_check_ttl_seconds).items():
+            collection = self.db[collection_name]
+            for index in indexes:
+                try:
+                    await collection.create_indexes([index])
+                except OperationFailure as e:
+                    expire_after = index.document.get("expireAfterSeconds")
+                    if e.code != 85 or expire_after is None:
+                        logger.error(f"Failed to create index {index.document['name']} on {collection_name}: {str(e)}")
+                        continue
+                    # IndexOptionsConflict: the TTL changed, so update it in place
+                    await self.db.command("collMod", collection_name, index={
+                        "keyPattern": dict(index.document["key"]), "expireAfterSeconds": expire_after
+                    })
+                    logger.info(f"Updated TTL of {index.document['name']} on {collection_name} to {expire_after}s")
+                except Exception as e:
+                    logger.error(f"Failed to create index {index.document['name']} on {collection_name}: {str(e)}")
+            try:
+                existing = await collection.index_information()
+            except Exception as e:
+                logger.error(f"Failed to verify indexes on {collection_name}: {str(e)}")
+                continue
+            missing = [index.document["name"] for index in indexes if index.document["name"] not in existing]
+            if missing:
+                logger.error(f"Indexes missing on {collection_name} after bootstrap: {missing}")
+            else:
+                logger.info(f"Indexes verified on {collection_name}: {sorted(existing)}")
+
+    async def ping(self) -> bool:
+        await self.db.command("ping")
+        return True
+
+    async def close(self):
+        if self.client is not None:
+            self.client.close()
+
+    async def _get(self, collection, record_id: str, owner_id: Optional[str]) -> Optional[dict]:
+        query = {"id": record_id}
+        if owner_id is not None:
+            query["owner_id"] = owner_id
+        return await collection.find_one(query, {"_id": 0})
+
+    async def _list_owner_page(self, collection, sort_field: str, owner_id: str, fields: List[str], limit: int, after: Optional[PageKey]) -> List[dict]:
+        # Served by the (owner_id, sort_field desc, id desc) index
+        query = {"owner_id": owner_id, **keyset_filter(sort_field, after)}
+        return await collection.find(query, projection(fields)).sort(
+            [(sort_field, DESCENDING), ("id", DESCENDING)]
+        ).limit(limit).to_list(limit)
+
+    @staticmethod
+    def _lesson_plan_query(lesson_plan_ids, subject_name, owner_id) -> dict:
+        query = {}
+        if owner_id is not None:
+            query["owner_id"] = owner_id
+        if lesson_plan_ids:
+            query["id"] = {"$in": lesson_plan_ids}
+        if subject_name:
+            query["request_data.subject_name"] = subject_name
+        return query
+
+    async def insert_lesson_plan(self, doc: dict):
+        await self.db.lesson_plans.insert_one(doc)
+
+    async def get_lesson_plan(self, lesson_plan_id, owner_id=None):
+        return await self._get(self.db.lesson_plans, lesson_plan_id, owner_id)
+
+    async def list_lesson_plans(self, owner_id, fields, limit, after=None):
+        return await self._list_owner_page(self.db.lesson_plans, "generated_at", owner_id, fields, limit, after)
+
+    async def count_lesson_plans(self, lesson_plan_ids=None, subject_name=None, owner_id=None):
+        return await self.db.lesson_plans.count_documents(self._lesson_plan_query(lesson_plan_ids, subject_name, owner_id))
+
+    async def iter_lesson_plans(self, lesson_plan_ids=None, subject_name=None, owner_id=None, batch_size=100):
+        cursor = self.db.lesson_plans.find(self._lesson_plan_query(lesson_plan_ids, subject_name, owner_id), {"_id": 0})
+        async for doc in cursor.batch_size(batch_size):
+            yield doc
+
+    async def insert_extraction(self, doc: dict):
+        await self.db.pdf_extractions.insert_one(doc)
+
+    async def get_extraction(self, extraction_id, owner_id=None):
+        return await self._get(self.db.pdf_extractions, extraction_id, owner_id)
+
+    async def list_extractions(self, owner_id, fields, limit, after=None):
+        return await self._list_owner_page(self.db.pdf_extractions, "extracted_at", owner_id, fields, limit, after)
+
+    async def iter_extractions(self, batch_size=100):
+        async for doc in self.db.pdf_extractions.find({}, {"_id": 0}).batch_size(batch_size):
+            yield doc
+
+    async def text_search(self, kind, owner_id, query, fields, limit):
+        from pymongo.errors import OperationFailure
+        
+        collection = {"lesson_plan": self.db.lesson_plans, "extraction": self.db.pdf_extractions}[kind]
+        text_query = {"owner_id": owner_id, "$text": {"$search": query}}
+        try:
+            total = await collection.count_documents(text_query)
+            docs = await collection.find(
+                text_query, {**projection(fields), "score": {"$meta": "textScore"}}
+            ).sort([("score", {"$meta": "textScore"})]).limit(limit).to_list(limit)
+        except OperationFailure as e:
+            if not text_search_unsupported(e):
+                raise
+            raise NotImplementedError(str(e))
+        return total, [(doc.pop("score"), doc) for doc in docs]
+
+    @staticmethod
+    def _status_query(after, since) -> dict:
+        query = keyset_filter("timestamp", after)
+        if since:
+            query = {"$and": [query, {"timestamp": {"$gte": since}}]} if query else {"timestamp": {"$gte": since}}
+        return query
+
+    async def list_status_checks(self, fields, limit, after=None, since=None):
+        return await self.db.status_checks.find(self._status_query(after, since), projection(fields)).sort(
+            [("timestamp", DESCENDING), ("id", DESCENDING)]
+        ).limit(limit).to_list(limit)
+
+    async def iter_status_checks(self, fields, after=None, since=None, batch_size=1000):
+        cursor = self.db.status_checks.find(self._status_query(after, since), projection(fields)).sort(
+            [("timestamp", DESCENDING), ("id", DESCENDING)]
+        )
+        async for doc in cursor.batch_size(batch_size):
+            yield doc
+
+    async def list_status_rollups(self, granularity, client_name, since, until, limit):
+        query = {"granularity": granularity}
+        if client_name:
+            query["client_name"] = client_name
+        if since or until:
+            query["bucket_start"] = {}
+            if since:
+                query["bucket_start"]["$gte"] = since
+            if until:
+                query["bucket_start"]["$lt"] = until
+        fields = ["client_name", "granularity", "bucket_start", "count"]
+        return await self.db.status_rollups.find(query, projection(fields)).sort(
+            "bucket_start", DESCENDING
+        ).limit(limit).to_list(limit)
+
+    async def insert_many(self, collection_name, docs):
+        from pymongo.errors import BulkWriteError
+        
+        try:
+            result = await self.db[collection_name].insert_many(docs, ordered=False)
+            return len(result.inserted_ids)
+        except BulkWriteError as e:
+            # Unordered inserts keep going past duplicates; count what landed
+            logger.warning(f"Insert into {collection_name} partially failed: {len(e.details.get('writeErrors', []))} errors")
+            return e.details.get("nInserted", 0)
+
+    async def apply_increments(self, collection_name, increments):
+        from pymongo import UpdateOne
+        from pymongo.errors import BulkWriteError
+        
+        operations = []
+        for filter, inc, set_on_insert in increments:
+            update = {"$inc": inc}
+            if set_on_insert:
+                update["$setOnInsert"] = set_on_insert
+            operations.append(UpdateOne(filter, update, upsert=True))
+        try:
+            await self.db[collection_name].bulk_write(operations, ordered=False)
+        except BulkWriteError as e:
+            # Some upserts landed; report them rather than have the caller retry and double count
+            logger.warning(f"Increments on {collection_name} partially failed: {len(e.details.get('writeErrors', []))} errors")
+            return e.details.get("nUpserted", 0) + e.details.get("nModified", 0)
+        return len(operations)
+
+
+def naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """Mongo compares aware and naive datetimes as UTC; mirror that for in-memory comparisons."""
+    if value is not None and value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+class MemoryStorage(Storage):
+    """Process-local storage for tests, benchmarks and running without MongoDB.
+
+    Keeps the same ordering, uniqueness and TTL behaviour as the Mongo
+    backend. Status checks are held in (timestamp, id) order so keyset pages
+    are bisected rather than sorted, and expired checks and rollups are
+    purged lazily. There is no text search; callers fall back to the local
+    search index.
+    """
+
+    backend = "memory"
+
+    def __init__(self, status_check_ttl_seconds: int):
+        self.status_check_ttl = timedelta(seconds=status_check_ttl_seconds)
+        self._records = {"lesson_plans": {}, "pdf_extractions": {}}  # collection -> id -> doc
+        self._owners = {"lesson_plans": defaultdict(list), "pdf_extractions": defaultdict(list)}  # collection -> owner -> ids
+        self._status_keys = []  # sorted (timestamp, id)
+        self._status_docs = []  # parallel to _status_keys
+        self._upserts = defaultdict(dict)  # collection -> filter key -> doc
+        self._documents = defaultdict(list)  # other append-only collections
+
+    @staticmethod
+    def _project(doc: dict, fields: List[str]) -> dict:
+        return {field: doc[field] for field in fields if field in doc}
+
+    def _insert_record(self, collection_name: str, doc: dict):
+        records = self._records[collection_name]
+        if doc["id"] in records:
+            from pymongo.errors import DuplicateKeyError
+            raise DuplicateKeyError(f"E11000 duplicate key error collection: {collection_name} index: id_unique")
+        records[doc["id"]] = dict(doc)
+        self._owners[collection_name][doc.get("owner_id")].append(doc["id"])
+
+    def _get_record(self, collection_name: str, record_id: str, owner_id: Optional[str]) -> Optional[dict]:
+        doc = self._records[collection_name].get(record_id)
+        if doc is None or (owner_id is not None and doc.get("owner_id") != owner_id):
+            return None
+        return dict(doc)
+
+    def _list_owner_page(self, collection_name, sort_field, owner_id, fields, limit, after):
+        records = self._records[collection_name]
+        docs = [records[record_id] for record_id in self._owners[collection_name].get(owner_id, [])]
+        docs.sort(key=lambda doc: (doc[sort_field], doc["id"]), reverse=True)
+        if after:
+            after = (naive_utc(after[0]), after[1])
+            docs = [doc for doc in docs if (doc[sort_field], doc["id"]) < after]
+        return [self._project(doc, fields) for doc in docs[:limit]]
+
+    async def insert_lesson_plan(self, doc):
+        self._insert_record("lesson_plans", doc)
+
+    async def get_lesson_plan(self, lesson_plan_id, owner_id=None):
+        return self._get_record("lesson_plans", lesson_plan_id, owner_id)
+
+    async def list_lesson_plans(self, owner_id, fields, limit, after=None):
+        return self._list_owner_page("lesson_plans", "generated_at", owner_id, fields, limit, after)
+
+    def _match_lesson_plans(self, lesson_plan_ids, subject_name, owner_id):
+        records = self._records["lesson_plans"]
+        if lesson_plan_ids:
+            docs = [records[record_id] for record_id in dict.fromkeys(lesson_plan_ids) if record_id in records]
+        elif owner_id is not None:
+            docs = [records[record_id] for record_id in self._owners["lesson_plans"].get(owner_id, [])]
+        else:
+            docs = list(records.values())
+        if owner_id is not None:
+            docs = [doc for doc in docs if doc.get("owner_id") == owner_id]
+        if subject_name:
+            docs = [doc for doc in docs if doc["request_data"]["subject_name"] == subject_name]
+        return docs
+
+    async def count_lesson_plans(self, lesson_plan_ids=None, subject_name=None, owner_id=None):
+        return len(self._match_lesson_plans(lesson_plan_ids, subject_name, owner_id))
+
+    async def iter_lesson_plans(self, lesson_plan_ids=None, subject_name=None, owner_id=None, batch_size=100):
+        for doc in self._match_lesson_plans(lesson_plan_ids, subject_name, owner_id):
+            yield dict(doc)
+
+    async def insert_extraction(self, doc):
+        self._insert_record("pdf_extractions", doc)
+
+    async def get_extraction(self, extraction_id, owner_id=None):
+        return self._get_record("pdf_extractions", extraction_id, owner_id)
+
+    async def list_extractions(self, owner_id, fields, limit, after=None):
+        return self._list_owner_page("pdf_extractions", "extracted_at", owner_id, fields, limit, after)
+
+    async def iter_extractions(self, batch_size=100):
+        for doc in list(self._records["pdf_extractions"].values()):
+            yield dict(doc)
+
+    async def text_search(self, kind, owner_id, query, fields, limit):
+        raise NotImplementedError("The in-memory storage backend has no text search")
+
+    def _expire_status_checks(self):
+        cutoff = datetime.utcnow() - self.status_check_ttl
+        expired = bisect.bisect_left(self._status_keys, (cutoff, ""))
+        if expired:
+            del self._status_keys[:expired]
+            del self._status_docs[:expired]
+
+    def _status_range(self, after, since):
+        """Index range [low, high) of status checks matching the keyset and since bounds."""
+        self._expire_status_checks()
+        high = bisect.bisect_left(self._status_keys, (naive_utc(after[0]), after[1])) if after else len(self._status_keys)
+        low = bisect.bisect_left(self._status_keys, (naive_utc(since), "")) if since else 0
+        return low, high
+
+    async def list_status_checks(self, fields, limit, after=None, since=None):
+        low, high = self._status_range(after, since)
+        start = max(low, high - limit)
+        return [self._project(doc, fields) for doc in reversed(self._status_docs[start:high])]
+
+    async def iter_status_checks(self, fields, after=None, since=None, batch_size=1000):
+        low, high = self._status_range(after, since)
+        for doc in reversed(self._status_docs[low:high]):
+            yield self._project(doc, fields)
+
+    async def list_status_rollups(self, granularity, client_name, since, until, limit):
+        now = datetime.utcnow()
+        since, until = naive_utc(since), naive_utc(until)
+        rollups = self._upserts["status_rollups"]
+        for key in [key for key, doc in rollups.items() if doc.get("expires_at") and doc["expires_at"] <= now]:
+            del rollups[key]
+        docs = [
+            doc for doc in rollups.values()
+            if doc["granularity"] == granularity
+            and (not client_name or doc["client_name"] == client_name)
+            and (not since or doc["bucket_start"] >= since)
+            and (not until or doc["bucket_start"] < until)
+        ]
+        docs.sort(key=lambda doc: doc["bucket_start"], reverse=True)
+        fields = ["client_name", "granularity", "bucket_start", "count"]
+        return [self._project(doc, fields) for doc in docs[:limit]]
+
+    async def insert_many(self, collection_name, docs):
+        if collection_name == "status_checks":
+            for doc in docs:
+                key = (doc["timestamp"], doc["id"])
+                index = bisect.bisect_left(self._status_keys, key)
+                self._status_keys.insert(index, key)
+                self._status_docs.insert(index, dict(doc))
+        else:
+            self._documents[collection_name].extend(dict(doc) for doc in docs)
+        return len(docs)
+
+    async def apply_increments(self, collection_name, increments):
+        upserts = self._upserts[collection_name]
+        for filter, inc, set_on_insert in increments:
+            key = tuple(sorted(filter.items()))
+            doc = upserts.get(key)
+            if doc is None:
+                doc = upserts[key] = {**filter, **(set_on_insert or {})}
+            for field, amount in inc.items():
+                doc[field] = doc.get(field, 0) + amount
+        return len(increments)
+
+
+def create_storage(backend: str, mongo_url: Optional[str], db_name: Optional[str], status_check_ttl_seconds: int) -> Storage:
+    if backend == "memory":
+        return MemoryStorage(status_check_ttl_seconds)
+    if backend != "mongo":
+        raise ValueError(f"Unknown storage backend: {backend}")
+    if not mongo_url or not db_name:
+        raise RuntimeError("MONGO_URL and DB_NAME must be set for the mongo storage backend")
+    return MongoStorage(mongo_url, db_name, status_check_ttl_seconds)
@@ -0,0 +1,365 @@
+"""Lightweight span tracing with an in-memory ring buffer and optional JSON lines export."""
+import contextvars
+import functools
+import inspect
+import logging
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Optional
+
+import orjson
+from starlette.datastructures import Headers, MutableHeaders
+
+logger = logging.getLogger(__name__)
+
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+
+class Span:
+    __slots__ = ("trace_id", "span_id", "parent_id", "name", "start_time", "_start", "duration_ms",
+                 "attributes", "error", "links", "is_root", "root_id")
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str], attributes: dict):
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.name = name
+        self.start_time = time.time()
+        self._start = time.perf_counter()
+        self.duration_ms = None
+        self.attributes = attributes
+        self.error = None
+        self.links = []
+        self.is_root = False
+        self.root_id = None  # span id of the local root this span was recorded under
+
+    @property
+    def ended(self) -> bool:
+        return self.duration_ms is not None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def to_dict(self) -> dict:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start_time": self.start_time,
+            "duration_ms": self.duration_ms,
+            "attributes": self.attributes,
+            "error": self.error,
+            "links": self.links,
+        }
+
+
+def parse_traceparent(value: Optional[str]):
+    """Return (trace_id, parent span id) from a W3C traceparent header, or None."""
+    if not value:
+        return None
+    parts = value.strip().split("-")
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16 or parts[1] == "0" * 32:
+        return None
+    try:
+        int(parts[1], 16), int(parts[2], 16)
+    except ValueError:
+        return None
+    return parts[1], parts[2]
+
+
+class Tracer:
+    """Records spans per trace and keeps the last ``max_traces`` finished traces.
+
+    A trace finishes when its root span ends; spans from work it spawned that
+    end later (background renders, streamed bodies) are still added to it
+    while it is in the buffer. Work that starts after its parent has ended
+    gets a trace of its own, linked to the one it came from, so a long-lived
+    task started inside a request does not grow that request's trace forever.
+
+    If ``export_path`` is set, every finished trace is also appended to it as
+    JSON lines, one span per line.
+
+    Spans are grouped by their local root rather than by trace id, so each
+    request continuing the same remote ``traceparent`` is its own entry and
+    ages out on its own; ``get_trace`` returns the spans of all of them.
+    """
+
+    def __init__(self, max_traces: int = 500, export_path: Optional[str] = None, enabled: bool = True):
+        self.enabled = enabled
+        self.max_traces = max_traces
+        self.export_path = export_path
+        self._open = {}  # root span id -> (trace id, spans) of roots still running
+        self._finished = OrderedDict()  # root span id -> (root span, spans), oldest first
+        self._lock = threading.Lock()
+        self._export_file = None
+
+    @contextmanager
+    def span(self, name: str, remote_parent=None, **attributes):
+        """Time a block as a child of the current span, or as a new root."""
+        if not self.enabled:
+            yield _NOOP_SPAN
+            return
+        span = self.start_span(name, remote_parent, **attributes)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            _current_span.reset(token)
+            self.end_span(span)
+
+    def start_span(self, name: str, remote_parent=None, **attributes):
+        """Open a span under the current one without making it current; close it with ``end_span``.
+
+        For work that yields to its caller, such as async generators, where a
+        span left current would become the parent of the caller's own spans.
+        """
+        if not self.enabled:
+            return _NOOP_SPAN
+        parent = _current_span.get()
+        links = []
+        if remote_parent is not None:
+            trace_id, parent_id = remote_parent
+        elif parent is not None and not parent.ended:
+            trace_id, parent_id = parent.trace_id, parent.span_id
+        else:
+            trace_id, parent_id = secrets.token_hex(16), None
+            if parent is not None:
+                links.append(parent.trace_id)
+        span = Span(name, trace_id, parent_id, attributes)
+        span.links = links
+        span.is_root = parent_id is None or remote_parent is not None
+        if span.is_root:
+            span.root_id = span.span_id
+            with self._lock:
+                self._open[span.root_id] = (trace_id, [])
+        else:
+            span.root_id = parent.root_id
+        return span
+
+    def end_span(self, span, error: Optional[str] = None):
+        if span is _NOOP_SPAN or span.ended:
+            return
+        if error:
+            span.error = error
+        span.duration_ms = round((time.perf_counter() - span._start) * 1000, 3)
+        self._record(span, span.is_root)
+
+    def _record(self, span: Span, is_root: bool):
+        with self._lock:
+            if is_root:
+                _, spans = self._open.pop(span.root_id, (None, []))
+                spans.append(span)
+                self._finished[span.root_id] = (span, spans)
+                while len(self._finished) > self.max_traces:
+                    self._finished.popitem(last=False)
+                self._export(spans)
+                return
+            running = self._open.get(span.root_id)
+            if running is not None:
+                running[1].append(span)
+                return
+            # Ended after its trace's root: add it to the finished trace and export it alone
+            finished = self._finished.get(span.root_id)
+            if finished is not None:
+                finished[1].append(span)
+            self._export([span])
+
+    def _export(self, spans):
+        if not self.export_path:
+            return
+        try:
+            if self._export_file is None:
+                os.makedirs(os.path.dirname(os.path.abspath(self.export_path)), exist_ok=True)
+                self._export_file = open(self.export_path, "ab")
+            self._export_file.write(b"".join(orjson.dumps(span.to_dict()) + b"\n" for span in spans))
+            self._export_file.flush()
+        except OSError as e:
+            logger.warning(f"Could not export spans to {self.export_path}: {str(e)}")
+
+    def current_trace_id(self) -> Optional[str]:
+        if not self.enabled:
+            return None
+        span = _current_span.get()
+        return span.trace_id if span is not None and not span.ended else None
+
+    def recent_traces(self, limit: int = 50, min_duration_ms: float = 0, name: Optional[str] = None) -> list:
+        """Summaries of finished traces, newest first."""
+        with self._lock:
+            traces = list(self._finished.values())
+        summaries = []
+        for root, spans in reversed(traces):
+            if root.duration_ms < min_duration_ms or (name and name not in root.name):
+                continue
+            summaries.append({
+                "trace_id": root.trace_id,
+                "name": root.name,
+                "start_time": root.start_time,
+                "duration_ms": root.duration_ms,
+                "span_count": len(spans),
+                "error": root.error or next((span.error for span in spans if span.error), None),
+                "links": root.links,
+            })
+            if len(summaries) >= limit:
+                break
+        return summaries
+
+    def get_trace(self, trace_id: str) -> Optional[list]:
+        """All recorded spans of a trace, in start order, across every root that continued it."""
+        with self._lock:
+            groups = [spans for root, spans in self._finished.values() if root.trace_id == trace_id]
+            groups += [spans for open_trace_id, spans in self._open.values() if open_trace_id == trace_id]
+            spans = [span for group in groups for span in group]
+        if not groups:
+            return None
+        return [span.to_dict() for span in sorted(spans, key=lambda span: span._start)]
+
+    def close(self):
+        if self._export_file is not None:
+            self._export_file.close()
+            self._export_file = None
+
+
+class _NoopSpan:
+    trace_id = None
+    ended = False
+
+    def set(self, **attributes):
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+def traced(tracer: Tracer, name: Optional[str] = None):
+    """Decorator running a sync or async function inside a span."""
+    def decorator(func):
+        span_name = name or func.__name__
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with tracer.span(span_name):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with tracer.span(span_name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class TracedStorage:
+    """Wraps a storage backend so every call is a ``storage.<method>`` span."""
+
+    def __init__(self, storage, tracer: Tracer):
+        self._storage = storage
+        self._tracer = tracer
+
+    def __getattr__(self, name):
+        attribute = getattr(self._storage, name)
+        if name.startswith("_") or not callable(attribute):
+            return attribute
+        span_name = f"storage.{name}"
+        tracer = self._tracer
+        backend = self._storage.backend
+        if inspect.isasyncgenfunction(attribute):
+            @functools.wraps(attribute)
+            async def generator_wrapper(*args, **kwargs):
+                # Not made current: the caller's spans between items belong to the caller,
+                # and a consumer that stops early closes this generator in another context
+                span = tracer.start_span(span_name, backend=backend)
+                count = 0
+                error = None
+                try:
+                    async for item in attribute(*args, **kwargs):
+                        count += 1
+                        yield item
+                except GeneratorExit:
+                    span.set(closed_early=True)
+                    raise
+                except BaseException as e:
+                    error = f"{type(e).__name__}: {e}"
+                    raise
+                finally:
+                    span.set(documents=count)
+                    tracer.end_span(span, error)
+            wrapper = generator_wrapper
+        elif inspect.iscoroutinefunction(attribute):
+            @functools.wraps(attribute)
+            async def wrapper(*args, **kwargs):
+                with tracer.span(span_name, backend=backend):
+                    return await attribute(*args, **kwargs)
+        else:
+            return attribute
+        # Cache the bound wrapper so later lookups skip __getattr__
+        setattr(self, name, wrapper)
+        return wrapper
+
+
+def route_template(scope, cache: dict) -> Optional[str]:
+    """The path template of the route that handled a request, once routing has run.
+
+    ``cache`` maps endpoints to templates so the route table is scanned once per endpoint.
+    """
+    endpoint = scope.get("endpoint")
+    if endpoint is None:
+        return None
+    if endpoint not in cache:
+        router = scope["app"].router
+        cache[endpoint] = next(
+            (route.path for route in router.routes if getattr(route, "endpoint", None) is endpoint), None
+        )
+    return cache[endpoint]
+
+
+class TracingMiddleware:
+    """Opens the root span of each HTTP request and returns its id in X-Trace-Id.
+
+    An incoming W3C ``traceparent`` header is continued rather than replaced.
+    """
+
+    def __init__(self, app, tracer: Tracer):
+        self.app = app
+        self.tracer = tracer
+        self._route_paths = {}  # endpoint -> route path template
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.tracer.enabled:
+            await self.app(scope, receive, send)
+            return
+        method = scope["method"]
+        remote_parent = parse_traceparent(Headers(scope=scope).get("traceparent"))
+        with self.tracer.span(f"{method} {scope['path']}", remote_parent=remote_parent, http_method=method, http_path=scope["path"]) as span:
+            async def send_with_trace_id(message):
+                if message["type"] == "http.response.start":
+                    span.set(http_status=message["status"])
+                    MutableHeaders(scope=message)["X-Trace-Id"] = span.trace_id
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_with_trace_id)
+            finally:
+                route_path = route_template(scope, self._route_paths)
+                if route_path:
+                    span.name = f"{method} {route_path}"
+
+
+class TraceIdLogFilter(logging.Filter):
+    """Adds ``trace_id`` to log records, '-' outside of a trace."""
+
+    def __init__(self, tracer: Tracer):
+        super().__init__()
+        self.tracer = tracer
+
+    def filter(self, record):
+        record.trace_id = self.tracer.current_trace_id() or "-"
+        return True
@@ -0,0 +1,191 @@
+"""Write-behind buffer that batches non-critical inserts into storage."""
+import asyncio
+import logging
+import time
+from collections import defaultdict, deque
+
+logger = logging.getLogger(__name__)
+
+
+class WriteBehindBuffer:
+    """Queues documents per collection and writes them with ``Storage.insert_many``.
+
+    Counter updates queued with ``increment`` are coalesced in memory by
+    filter and written as one upserting ``$inc`` per distinct filter. At most
+    ``max_counters`` distinct filters are held; increments of new filters
+    beyond that are dropped, since the filters can come from client input.
+
+    A flush happens when ``max_batch`` documents are pending or every
+    ``flush_interval`` seconds, whichever comes first, and once more on
+    ``stop()``. Only use it for writes the request does not need to read back:
+    documents sit in memory until the next flush, and the oldest are dropped
+    if the backlog reaches ``max_backlog`` (for example while MongoDB is down).
+    """
+
+    def __init__(self, storage, max_batch: int = 500, flush_interval: float = 1.0, max_backlog: int = 50000,
+                 max_counters: int = 10000):
+        self.storage = storage
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self.max_backlog = max_backlog
+        self.max_counters = max_counters
+        self._pending = defaultdict(deque)  # collection name -> documents
+        self._backlog = 0
+        self._increments = defaultdict(dict)  # collection name -> filter key -> [filter, inc, set_on_insert]
+        self._counters = 0  # distinct filters pending across collections
+        self._flush_needed = None
+        self._flush_lock = None
+        self._task = None
+        self._stopping = False
+        self.metrics = {
+            "enqueued_total": 0,
+            "written_total": 0,
+            "increments_total": 0,
+            "upserts_total": 0,
+            "dropped_total": 0,
+            "dropped_increments_total": 0,
+            "flushes_total": 0,
+            "failed_flushes_total": 0,
+            "last_flush_duration_ms": None,
+            "last_flush_at": None,
+        }
+
+    def start(self):
+        if self._task is None:
+            self._flush_needed = asyncio.Event()
+            self._flush_lock = asyncio.Lock()
+            self._stopping = False
+            self._task = asyncio.create_task(self._run())
+
+    def enqueue(self, collection_name: str, document: dict):
+        """Queue a document for insertion; never waits on MongoDB."""
+        self.start()
+        if self._backlog >= self.max_backlog:
+            self._drop_oldest()
+        self._pending[collection_name].append(document)
+        self._backlog += 1
+        self.metrics["enqueued_total"] += 1
+        if self._backlog >= self.max_batch:
+            self._flush_needed.set()
+
+    def increment(self, collection_name: str, filter: dict, inc: dict, set_on_insert: dict = None):
+        """Queue an upserting ``$inc``; repeated increments of the same filter merge."""
+        self.start()
+        key = tuple(sorted(filter.items()))
+        pending = self._increments[collection_name].get(key)
+        if pending is None:
+            if not self._add_counter(collection_name, key, [filter, dict(inc), set_on_insert]):
+                return
+            if self._counters >= self.max_batch:
+                self._flush_needed.set()
+        else:
+            for field, amount in inc.items():
+                pending[1][field] = pending[1].get(field, 0) + amount
+        self.metrics["increments_total"] += 1
+
+    def _add_counter(self, collection_name: str, key: tuple, increment: list) -> bool:
+        if self._counters >= self.max_counters:
+            self.metrics["dropped_increments_total"] += 1
+            if self.metrics["dropped_increments_total"] % 1000 == 1:
+                logger.warning(f"Write-behind counters full ({self.max_counters}), dropping increments of new filters")
+            return False
+        self._increments[collection_name][key] = increment
+        self._counters += 1
+        return True
+
+    def _drop_oldest(self):
+        collection_name = max(self._pending, key=lambda name: len(self._pending[name]))
+        self._pending[collection_name].popleft()
+        self._backlog -= 1
+        self.metrics["dropped_total"] += 1
+        if self.metrics["dropped_total"] % 1000 == 1:
+            logger.warning(f"Write-behind backlog full ({self.max_backlog}), dropping oldest writes")
+
+    async def _run(self):
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._flush_needed.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_needed.clear()
+            await self.flush()
+
+    async def flush(self):
+        """Write everything currently pending, one insert_many per collection and batch."""
+        if self._flush_lock is None:
+            return
+        async with self._flush_lock:
+            if not self._backlog and not any(self._increments.values()):
+                return
+            start = time.perf_counter()
+            await self._flush_increments()
+            for collection_name in list(self._pending):
+                queue = self._pending[collection_name]
+                while queue:
+                    batch = [queue.popleft() for _ in range(min(self.max_batch, len(queue)))]
+                    self._backlog -= len(batch)
+                    written = await self._write_batch(collection_name, batch)
+                    if written is None:
+                        # Put the batch back and retry on the next flush
+                        queue.extendleft(reversed(batch))
+                        self._backlog += len(batch)
+                        break
+                    self.metrics["written_total"] += written
+            self.metrics["flushes_total"] += 1
+            self.metrics["last_flush_duration_ms"] = round((time.perf_counter() - start) * 1000, 2)
+            self.metrics["last_flush_at"] = time.time()
+
+    async def _flush_increments(self):
+        for collection_name in list(self._increments):
+            pending = self._increments[collection_name]
+            if not pending:
+                continue
+            self._increments[collection_name] = {}
+            self._counters -= len(pending)
+            try:
+                self.metrics["upserts_total"] += await self.storage.apply_increments(
+                    collection_name, [tuple(increment) for increment in pending.values()]
+                )
+            except Exception as e:
+                self.metrics["failed_flushes_total"] += 1
+                logger.error(f"Write-behind increments on {collection_name} failed: {str(e)}")
+                # Merge the failed counts back so they are retried on the next flush
+                for key, (filter, inc, set_on_insert) in pending.items():
+                    current = self._increments[collection_name].get(key)
+                    if current is None:
+                        self._add_counter(collection_name, key, [filter, inc, set_on_insert])
+                    else:
+                        for field, amount in inc.items():
+                            current[1][field] = current[1].get(field, 0) + amount
+
+    async def _write_batch(self, collection_name: str, batch: list):
+        try:
+            return await self.storage.insert_many(collection_name, batch)
+        except Exception as e:
+            self.metrics["failed_flushes_total"] += 1
+            logger.error(f"Write-behind insert into {collection_name} failed: {str(e)}")
+            return None
+
+    async def stop(self):
+        """Stop the flush loop and write out whatever is still pending."""
+        if self._task is None:
+            return
+        self._stopping = True
+        self._flush_needed.set()
+        await self._task
+        self._task = None
+        await self.flush()
+        if self._backlog or any(self._increments.values()):
+            logger.error(f"Write-behind shut down with {self._backlog} unwritten documents and unflushed counters")
+
+    def stats(self) -> dict:
+        return {
+            "backlog": self._backlog,
+            "backlog_by_collection": {name: len(queue) for name, queue in self._pending.items() if queue},
+            "pending_counters": self._counters,
+            "max_batch": self.max_batch,
+            "flush_interval": self.flush_interval,
+            "max_backlog": self.max_backlog,
+            "max_counters": self.max_counters,
+            **self.metrics,
+        }
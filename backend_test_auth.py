@@ -377,6 +377,13 @@ class AuthenticatedLessonPlanTester:
                 except Exception as e:
                     self.log_test("PDF Download - File Validity", False, f"Error saving PDF: {str(e)}")
                 
+                # Another user must not be able to download this plan
+                other = requests.get(url, headers=self.get_other_user_headers(), timeout=30)
+                if other.status_code == 404:
+                    self.log_test("PDF Download - Other User", True)
+                else:
+                    self.log_test("PDF Download - Other User", False, f"Expected 404, got {other.status_code}")
+                
             else:
                 details = f"Expected 200, got {response.status_code}"
                 if response.content:
@@ -391,6 +398,143 @@ class AuthenticatedLessonPlanTester:
         except Exception as e:
             self.log_test("Authenticated PDF Download", False, f"Error: {str(e)}")
 
+    def test_lesson_plan_history(self, lesson_plan_data=None):
+        """Test listing and fetching the user's past lesson plans"""
+        print("\n" + "="*50)
+        print("TESTING LESSON PLAN HISTORY")
+        print("="*50)
+        
+        if not lesson_plan_data or 'id' not in lesson_plan_data:
+            self.log_test("Lesson Plan History", False, "No lesson plan ID available")
+            return
+        
+        success, response = self.run_test("Lesson Plan History", "GET", "history/lesson-plans", 200, auth_required=True)
+        if success:
+            ids = [item.get('id') for item in response.get('items', [])]
+            if lesson_plan_data['id'] in ids and all('content' not in item for item in response['items']):
+                self.log_test("Lesson Plan History - Metadata Only", True)
+            else:
+                self.log_test("Lesson Plan History - Metadata Only", False, f"Unexpected items: {response.get('items')}")
+        
+        success, response = self.run_test("Lesson Plan History - Full Plan", "GET", f"lesson-plans/{lesson_plan_data['id']}", 200, auth_required=True)
+        if success and response.get('content') != lesson_plan_data.get('content'):
+            self.log_test("Lesson Plan History - Content Matches", False, "Stored content differs from generated content")
+
+    def get_other_user_headers(self):
+        """Sign up a second user and return their authentication headers"""
+        timestamp = datetime.now().strftime("%H%M%S%f")
+        response = requests.post(f"{self.api_url}/auth/signup", json={
+            "firstName": "Other",
+            "lastName": "User",
+            "email": f"otheruser_{timestamp}@example.com",
+            "institution": "University of Canberra",
+            "department": "Information Technology",
+            "password": "TestPassword123!",
+            "newsletter": False
+        }, timeout=30)
+        response.raise_for_status()
+        return {'Authorization': f"Bearer {response.json()['token']}"}
+
+    def test_bulk_export(self, lesson_plan_data=None):
+        """Test bulk ZIP export of lesson plans"""
+        print("\n" + "="*50)
+        print("TESTING BULK LESSON PLAN EXPORT")
+        print("="*50)
+        
+        if not lesson_plan_data or 'id' not in lesson_plan_data:
+            self.log_test("Bulk Export", False, "No lesson plan ID available")
+            return
+        
+        try:
+            response = requests.post(
+                f"{self.api_url}/export-lesson-plans",
+                json={"lesson_plan_ids": [lesson_plan_data['id']]},
+                headers=self.get_auth_headers(),
+                timeout=60
+            )
+            print(f"   Response status: {response.status_code}")
+            
+            if response.status_code != 200:
+                self.log_test("Bulk Export", False, f"Expected 200, got {response.status_code} - {response.text[:200]}")
+                return
+            
+            import io
+            import zipfile
+            archive = zipfile.ZipFile(io.BytesIO(response.content))
+            names = archive.namelist()
+            print(f"   ZIP entries: {names}")
+            
+            if len(names) == 1 and names[0].endswith('.pdf') and archive.read(names[0]).startswith(b'%PDF'):
+                self.log_test("Bulk Export", True)
+            else:
+                self.log_test("Bulk Export", False, f"Unexpected ZIP contents: {names}")
+            
+            # Another user must not be able to export these plans
+            other = requests.post(
+                f"{self.api_url}/export-lesson-plans",
+                json={"lesson_plan_ids": [lesson_plan_data['id']]},
+                headers=self.get_other_user_headers(),
+                timeout=60
+            )
+            print(f"   Other user's export: {other.status_code}")
+            if other.status_code == 404:
+                self.log_test("Bulk Export - Other User", True)
+            else:
+                self.log_test("Bulk Export - Other User", False, f"Expected 404, got {other.status_code}")
+            
+        except Exception as e:
+            self.log_test("Bulk Export", False, f"Error: {str(e)}")
+
+    def test_conditional_get(self, lesson_plan_data=None):
+        """Test that repeat reads with a known ETag get 304 Not Modified"""
+        print("\n" + "="*50)
+        print("TESTING CONDITIONAL GET")
+        print("="*50)
+        
+        endpoints = [("Options", "options", False), ("Profile", "auth/profile", True)]
+        if lesson_plan_data and 'id' in lesson_plan_data:
+            endpoints.append(("Stored Lesson Plan", f"lesson-plans/{lesson_plan_data['id']}", True))
+        
+        for name, endpoint, auth_required in endpoints:
+            try:
+                headers = self.get_auth_headers() if auth_required else {}
+                first = requests.get(f"{self.api_url}/{endpoint}", headers=headers, timeout=30)
+                etag = first.headers.get('ETag')
+                if first.status_code != 200 or not etag:
+                    self.log_test(f"Conditional GET - {name}", False, f"Expected 200 with ETag, got {first.status_code} ETag={etag}")
+                    continue
+                
+                repeat = requests.get(f"{self.api_url}/{endpoint}", headers={**headers, 'If-None-Match': etag}, timeout=30)
+                print(f"   {name}: ETag {etag}, Cache-Control {first.headers.get('Cache-Control')}, repeat -> {repeat.status_code}")
+                if repeat.status_code == 304 and not repeat.content:
+                    self.log_test(f"Conditional GET - {name}", True)
+                else:
+                    self.log_test(f"Conditional GET - {name}", False, f"Expected 304 with empty body, got {repeat.status_code}")
+            except Exception as e:
+                self.log_test(f"Conditional GET - {name}", False, f"Error: {str(e)}")
+
+    def test_trace_id_header(self):
+        """Test that responses carry a trace id and continue an incoming traceparent"""
+        print("\n" + "="*50)
+        print("TESTING TRACE IDS")
+        print("="*50)
+        
+        try:
+            response = requests.get(f"{self.api_url}/options", timeout=30)
+            trace_id = response.headers.get('X-Trace-Id')
+            print(f"   X-Trace-Id: {trace_id}")
+            self.log_test("Tracing - X-Trace-Id header", bool(trace_id) and len(trace_id) == 32,
+                          "" if trace_id else "No X-Trace-Id header")
+            
+            remote_trace_id = "4bf92f3577b34da6a3ce929d0e0e4736"
+            traceparent = f"00-{remote_trace_id}-00f067aa0ba902b7-01"
+            response = requests.get(f"{self.api_url}/options", headers={'traceparent': traceparent}, timeout=30)
+            continued = response.headers.get('X-Trace-Id') == remote_trace_id
+            self.log_test("Tracing - traceparent continued", continued,
+                          "" if continued else f"Expected {remote_trace_id}, got {response.headers.get('X-Trace-Id')}")
+        except Exception as e:
+            self.log_test("Tracing - X-Trace-Id header", False, f"Error: {str(e)}")
+
     def test_unauthenticated_access(self):
         """Test that protected endpoints require authentication"""
         print("\n" + "="*50)
@@ -446,6 +590,18 @@ class AuthenticatedLessonPlanTester:
         # Test authenticated PDF download - MAIN FOCUS
         self.test_authenticated_pdf_download(lesson_plan_data)
         
+        # Test history listing of the generated plan
+        self.test_lesson_plan_history(lesson_plan_data)
+        
+        # Test bulk export of the generated plan
+        self.test_bulk_export(lesson_plan_data)
+        
+        # Test 304 responses for repeat reads
+        self.test_conditional_get(lesson_plan_data)
+        
+        # Test trace ids on responses
+        self.test_trace_id_header()
+        
         # Print summary
         print("\n" + "="*50)
         print("TEST SUMMARY")
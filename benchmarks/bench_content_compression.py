@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Lesson Plan Content Compression Benchmark
+Reports compression ratio and encode/decode cost for the stored
+LessonPlan.content format, and the size of the whole stored document.
+
+Content comes from the hand-written lesson plans in benchmarks/corpus,
+which follow the section layout of the generation prompt with the
+vocabulary of real plans. Document sizes are BSON, as MongoDB stores
+them, so they include the request data, ids and the search_terms field
+kept alongside compressed content.
+"""
+
+import os
+import sys
+import time
+import zlib
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+os.environ.setdefault("STORAGE_BACKEND", "memory")
+
+import bson
+
+import server
+
+CORPUS_DIR = Path(__file__).resolve().parent / "corpus"
+LEVELS = [1, 6, 9]
+ITERATIONS = 500
+
+
+def time_per_call(func, iterations=ITERATIONS):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def load_corpus():
+    return [(path.stem, path.read_text()) for path in sorted(CORPUS_DIR.glob("*.txt"))]
+
+
+def make_plan(content):
+    return server.LessonPlan(
+        request_data=server.LessonPlanRequest(
+            subject_name="Database Systems", lecture_topic="Normalisation", focus_topic="Functional dependencies",
+            blooms_taxonomy="Apply", aqf_level=server.AQF_LEVELS[6], lesson_duration="1 hour"
+        ),
+        content=content
+    )
+
+
+def main():
+    corpus = load_corpus()
+    print("=" * 78)
+    print("LESSON PLAN CONTENT COMPRESSION")
+    print("=" * 78)
+    print(f"{'plan':<28} {'level':>5} {'raw B':>7} {'stored B':>9} {'ratio':>6} {'encode us':>10} {'decode us':>10}")
+    for name, content in corpus:
+        raw = content.encode()
+        for level in LEVELS:
+            compressed = zlib.compress(raw, level)
+            encode_us = time_per_call(lambda: zlib.compress(raw, level))
+            decode_us = time_per_call(lambda: zlib.decompress(compressed))
+            print(f"{name:<28} {level:>5} {len(raw):>7} {len(compressed):>9} "
+                  f"{len(raw) / len(compressed):>6.2f} {encode_us:>10.1f} {decode_us:>10.1f}")
+
+    print(f"\nSTORED DOCUMENT (BSON bytes, level {server.LESSON_PLAN_COMPRESSION_LEVEL})")
+    print(f"{'plan':<28} {'plain doc':>10} {'stored doc':>11} {'content':>8} {'terms':>6} {'saved':>6}")
+    plain_total = stored_total = 0
+    for name, content in corpus:
+        plan = make_plan(content)
+        plain = len(bson.encode(plan.dict()))
+        doc = server.encode_lesson_plan_doc(plan)
+        stored = len(bson.encode(doc))
+        terms = len(doc.get("search_terms", "").encode())
+        plain_total += plain
+        stored_total += stored
+        print(f"{name:<28} {plain:>10} {stored:>11} {len(doc['content']):>8} {terms:>6} {1 - stored / plain:>6.0%}")
+    print(f"{'total':<28} {plain_total:>10} {stored_total:>11} {'':>8} {'':>6} {1 - stored_total / plain_total:>6.0%}")
+
+    # Full document round trip as the server does it
+    plan = make_plan(corpus[0][1])
+    encode_us = time_per_call(lambda: server.encode_lesson_plan_doc(plan))
+    # decode_lesson_plan_doc consumes its input, so give each call a fresh document
+    docs = [server.encode_lesson_plan_doc(plan) for _ in range(ITERATIONS)]
+    decode_us = time_per_call(lambda: server.decode_lesson_plan_doc(docs.pop()))
+    print(f"\nencode_lesson_plan_doc: {encode_us:.1f}us   decode_lesson_plan_doc: {decode_us:.1f}us "
+          f"(level {server.LESSON_PLAN_COMPRESSION_LEVEL}, {corpus[0][0]})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Backend Hot-Path Micro-Benchmarks
+Times the CPU-bound steps around each LLM call: PDF text extraction by page
+count, lesson plan PDF rendering by content length, prompt construction,
+LLM JSON cleanup and parsing, near-duplicate request lookup, and JWT
+encode/verify. Outline PDFs come from synthetic.make_outline_pdf.
+
+Each case reports the best time per call over several timeit rounds.
+--check fails when a case exceeds its budget in hot_path_thresholds.json.
+--save writes the results so a later run can --compare against them and
+fail on a slowdown beyond --max-slowdown, e.g. between two commits.
+"""
+
+import argparse
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+os.environ.setdefault("STORAGE_BACKEND", "memory")
+
+import server
+from near_duplicates import NearDuplicateIndex
+from synthetic import make_lesson_plan_content, make_outline_pdf, make_outline_timetable
+
+THRESHOLDS_PATH = Path(__file__).resolve().parent / "hot_path_thresholds.json"
+OUTLINE_PAGES = [2, 10, 50, 200]
+CONTENT_CHARS = [2000, 8000, 25000, 60000]
+RESPONSE_TOPICS = [13, 130]
+SIMILAR_INDEX_PLANS = 10000
+
+
+def best_ms(func, repeat):
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=repeat, number=number)) / number * 1000
+
+
+def make_request(topic="Normalisation", focus="Functional dependencies"):
+    return server.LessonPlanRequest(
+        subject_name="Database Systems", lecture_topic=topic, focus_topic=focus,
+        blooms_taxonomy="Apply", aqf_level=server.AQF_LEVELS[6], lesson_duration="1 hour"
+    )
+
+
+def make_llm_response(topics):
+    rng = random.Random(topics)
+    timetable = []
+    while len(timetable) < topics:
+        timetable += make_outline_timetable(rng, "Database Systems")
+    mapping = {f"{topic} ({n})": focus for n, (_, topic, focus, _) in enumerate(timetable[:topics], 1)}
+    return "```json\n" + json.dumps({
+        "subject_names": ["Database Systems"],
+        "lecture_topics": list(mapping),
+        "lecture_focus_mapping": mapping,
+    }, indent=2) + "\n```"
+
+
+def run_cases(repeat, tmp_dir):
+    """Yield (case name, ms per call, extra column)."""
+    outline_text = None
+    for pages in OUTLINE_PAGES:
+        path = Path(tmp_dir) / f"outline_{pages}.pdf"
+        path.write_bytes(make_outline_pdf(pages, seed=pages))
+        ms = best_ms(lambda: server.extract_text_from_pdf(str(path)), repeat)
+        if pages == 10:
+            outline_text = server.extract_text_from_pdf(str(path))
+        yield f"extract_text_from_pdf[{pages} pages]", ms, f"{pages / ms * 1000:.0f} pages/s"
+
+    for chars in CONTENT_CHARS:
+        plan = server.LessonPlan(request_data=make_request(), content=make_lesson_plan_content(chars, seed=chars))
+        pdf_bytes = server.render_lesson_plan_pdf(plan)
+        ms = best_ms(lambda: server.render_lesson_plan_pdf(plan), repeat)
+        yield f"generate_lesson_plan_pdf[{chars} chars]", ms, f"{len(pdf_bytes)} B"
+
+    prompt = server.build_extraction_prompt(outline_text)
+    yield "build_extraction_prompt[10 pages]", best_ms(lambda: server.build_extraction_prompt(outline_text), repeat), f"{len(prompt)} chars"
+    request = make_request()
+    prompt = server.build_lesson_plan_prompt(request)
+    yield "build_lesson_plan_prompt", best_ms(lambda: server.build_lesson_plan_prompt(request), repeat), f"{len(prompt)} chars"
+
+    for topics in RESPONSE_TOPICS:
+        response = make_llm_response(topics)
+        yield f"parse_llm_json[{topics} topics]", best_ms(lambda: server.parse_llm_json(response), repeat), f"{len(response)} chars"
+
+    index = NearDuplicateIndex()
+    rng = random.Random(0)
+    timetable = make_outline_timetable(rng, "Database Systems", weeks=SIMILAR_INDEX_PLANS)
+    for n, (_, topic, focus, _) in enumerate(timetable):
+        index.add(f"plan-{n}", f"user-{n % 50}", make_request(f"{topic} {n}", ", ".join(focus)).dict())
+    request = make_request("Intro to Normalisation").dict()
+    yield "NearDuplicateIndex.add", best_ms(lambda: index.add("bench-plan", "user-0", request), repeat), ""
+    yield f"NearDuplicateIndex.query[{SIMILAR_INDEX_PLANS} plans]", best_ms(lambda: index.query("user-0", request), repeat), ""
+
+    user = {"id": "bench-user", "email": "bench@example.com"}
+    token = server.create_jwt_token(user)
+    yield "create_jwt_token", best_ms(lambda: server.create_jwt_token(user), repeat), ""
+    yield "verify_jwt_token", best_ms(lambda: server.verify_jwt_token(token), repeat), ""
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5, help="timeit rounds per case; the best is reported")
+    parser.add_argument("--check", action="store_true", help=f"fail if a case exceeds its budget in {THRESHOLDS_PATH.name}")
+    parser.add_argument("--save", default=None, help="write results as JSON to this file")
+    parser.add_argument("--compare", default=None, help="results file from an earlier run to compare against")
+    parser.add_argument("--max-slowdown", type=float, default=1.5, help="allowed ratio to --compare results")
+    args = parser.parse_args()
+
+    logging.getLogger("server").setLevel(logging.WARNING)
+    server.tracer.enabled = False  # time the work itself, not span bookkeeping
+    thresholds = json.loads(THRESHOLDS_PATH.read_text()) if args.check else {}
+    baseline = json.loads(Path(args.compare).read_text()) if args.compare else {}
+
+    print("=" * 84)
+    print(f"BACKEND HOT PATHS (best of {args.repeat} rounds)")
+    print("=" * 84)
+    print(f"{'case':<40} {'ms/call':>10} {'':>16} {'budget':>8} {'vs base':>8}")
+    results = {}
+    failures = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for name, ms, extra in run_cases(args.repeat, tmp_dir):
+            results[name] = ms
+            row = f"{name:<40} {ms:>10.4f} {extra:>16}"
+            budget = thresholds.get(name)
+            if budget is not None:
+                row += f" {budget:>8g}"
+                if ms > budget:
+                    failures.append(f"{name}: {ms:.3f}ms exceeds budget {budget:g}ms")
+            else:
+                row += f" {'':>8}"
+            if name in baseline:
+                ratio = ms / baseline[name]
+                row += f" {ratio:>7.2f}x"
+                if ratio > args.max_slowdown:
+                    failures.append(f"{name}: {ratio:.2f}x slower than {args.compare}")
+            print(row)
+
+    missing = sorted(set(thresholds) - set(results))
+    if missing:
+        failures.append(f"budgets for unknown cases: {', '.join(missing)}")
+    if args.save:
+        Path(args.save).write_text(json.dumps(results, indent=2))
+    if failures:
+        print("\nREGRESSIONS:")
+        for failure in failures:
+            print(f"   {failure}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
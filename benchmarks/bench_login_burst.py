@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Login Burst Benchmark
+Measures login throughput and /api/options latency while a burst of logins
+is in flight, with the KDF on the credential-hashing pool versus inline.
+Runs in-process against the ASGI app; no server or MongoDB required.
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+os.environ.setdefault("STORAGE_BACKEND", "memory")
+
+import httpx
+import server
+
+logging.getLogger("httpx").setLevel(logging.WARNING)
+
+
+class InlineHasher:
+    """Baseline: run the KDF directly on the event loop."""
+
+    async def hash(self, password):
+        return server.hash_password(password)
+
+    async def verify(self, password, hashed):
+        return server.verify_password(password, hashed)
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def probe_options(http, stop, latencies, interval=0.005):
+    # Latency is measured from when the probe was due, so time spent waiting
+    # for a blocked event loop counts against it
+    while not stop.is_set():
+        due = time.perf_counter() + interval
+        await asyncio.sleep(interval)
+        await http.get("/api/options")
+        latencies.append((time.perf_counter() - due) * 1000)
+
+
+async def run_scenario(name, hasher, users, burst):
+    server.credential_hasher = hasher
+    transport = httpx.ASGITransport(app=server.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as http:
+        stop = asyncio.Event()
+        latencies = []
+        prober = asyncio.create_task(probe_options(http, stop, latencies))
+
+        start = time.perf_counter()
+        responses = await asyncio.gather(*[
+            http.post("/api/auth/login", json={"email": users[i % len(users)], "password": "benchpass123"})
+            for i in range(burst)
+        ])
+        elapsed = time.perf_counter() - start
+
+        stop.set()
+        await prober
+
+    failures = sum(1 for r in responses if r.status_code != 200)
+    print(f"\n{name}")
+    print(f"   Logins: {burst} in {elapsed:.2f}s ({burst / elapsed:.1f} logins/s), failures: {failures}")
+    if latencies:
+        print(f"   /api/options during burst: n={len(latencies)} "
+              f"p50={statistics.median(latencies):.1f}ms "
+              f"p95={percentile(latencies, 95):.1f}ms "
+              f"max={max(latencies):.1f}ms")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--burst", type=int, default=100)
+    args = parser.parse_args()
+
+    pool = server.credential_hasher
+    transport = httpx.ASGITransport(app=server.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as http:
+        users = []
+        for i in range(args.users):
+            email = f"bench_{i}@example.com"
+            await http.post("/api/auth/signup", json={
+                "firstName": "Bench", "lastName": "User", "email": email,
+                "institution": "Bench University", "department": "Computing",
+                "password": "benchpass123", "newsletter": False
+            })
+            users.append(email)
+
+    print("=" * 60)
+    print(f"Login burst: {args.burst} logins across {args.users} users, "
+          f"scrypt N={server.SCRYPT_N} r={server.SCRYPT_R}, pool workers={pool.max_workers}")
+    print("=" * 60)
+    await run_scenario("Inline KDF (blocks event loop)", InlineHasher(), users, args.burst)
+    await run_scenario("Credential hashing pool", pool, users, args.burst)
+    pool.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
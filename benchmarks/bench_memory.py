@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Backend Memory Benchmarks
+Measures with tracemalloc the peak memory allocated by PDF text extraction
+for large outlines and by lesson plan PDF rendering for long plans, and
+how much of it is still held after the same call has run several times.
+Outline PDFs come from synthetic.make_outline_pdf.
+
+Each case runs once to warm up first, so lazy imports and one-off caches
+are not counted. "peak" is the high-water mark above what was live before
+the call; "retained" is what is still live after --iterations more calls
+and a garbage collection, which should stay near zero.
+
+--check fails when a case exceeds its budgets in memory_thresholds.json.
+--save and --compare work as in bench_hot_paths.py, with --max-growth as
+the allowed ratio of peak memory.
+"""
+
+import argparse
+import gc
+import json
+import logging
+import os
+import sys
+import tempfile
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+os.environ.setdefault("STORAGE_BACKEND", "memory")
+
+import server
+from memory_tracking import measure_peak
+from synthetic import make_lesson_plan_content, make_outline_pdf
+
+THRESHOLDS_PATH = Path(__file__).resolve().parent / "memory_thresholds.json"
+OUTLINE_PAGES = [50, 200]
+CONTENT_CHARS = [25000, 60000]
+MB = 1024 * 1024
+
+
+def make_plan(chars):
+    request = server.LessonPlanRequest(
+        subject_name="Database Systems", lecture_topic="Normalisation", focus_topic="Functional dependencies",
+        blooms_taxonomy="Apply", aqf_level=server.AQF_LEVELS[6], lesson_duration="1 hour"
+    )
+    return server.LessonPlan(request_data=request, content=make_lesson_plan_content(chars, seed=chars))
+
+
+def measure(func, iterations):
+    """Return (peak MB of one call, MB retained after ``iterations`` more calls)."""
+    func()
+    gc.collect()
+    _, peak = measure_peak(func)
+    gc.collect()
+    before = tracemalloc.get_traced_memory()[0]
+    for _ in range(iterations):
+        func()
+    gc.collect()
+    retained = tracemalloc.get_traced_memory()[0] - before
+    return peak / MB, max(retained, 0) / MB
+
+
+def run_cases(iterations, tmp_dir):
+    """Yield (case name, peak MB, retained MB, extra column)."""
+    for pages in OUTLINE_PAGES:
+        path = Path(tmp_dir) / f"outline_{pages}.pdf"
+        path.write_bytes(make_outline_pdf(pages, seed=pages))
+        peak, retained = measure(lambda: server.extract_text_from_pdf(str(path)), iterations)
+        yield f"extract_text_from_pdf[{pages} pages]", peak, retained, f"{path.stat().st_size / MB:.2f} MB file"
+
+    for chars in CONTENT_CHARS:
+        plan = make_plan(chars)
+        peak, retained = measure(lambda: server.render_lesson_plan_pdf(plan), iterations)
+        yield f"generate_lesson_plan_pdf[{chars} chars]", peak, retained, f"{len(server.render_lesson_plan_pdf(plan)) / MB:.2f} MB PDF"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=3, help="repeat calls when checking for retained memory")
+    parser.add_argument("--check", action="store_true", help=f"fail if a case exceeds its budgets in {THRESHOLDS_PATH.name}")
+    parser.add_argument("--save", default=None, help="write results as JSON to this file")
+    parser.add_argument("--compare", default=None, help="results file from an earlier run to compare against")
+    parser.add_argument("--max-growth", type=float, default=1.25, help="allowed ratio of peak memory to --compare results")
+    args = parser.parse_args()
+
+    logging.getLogger("server").setLevel(logging.WARNING)
+    server.tracer.enabled = False  # keep span buffers out of the measurements
+    thresholds = json.loads(THRESHOLDS_PATH.read_text()) if args.check else {}
+    baseline = json.loads(Path(args.compare).read_text()) if args.compare else {}
+
+    print("=" * 84)
+    print(f"BACKEND MEMORY (peak of one call, retained after {args.iterations} more)")
+    print("=" * 84)
+    print(f"{'case':<40} {'peak MB':>9} {'retained MB':>12} {'':>15} {'vs base':>7}")
+    results = {}
+    failures = []
+    tracemalloc.start()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for name, peak, retained, extra in run_cases(args.iterations, tmp_dir):
+            results[name] = {"peak_mb": peak, "retained_mb": retained}
+            row = f"{name:<40} {peak:>9.2f} {retained:>12.3f} {extra:>15}"
+            budget = thresholds.get(name)
+            if budget is not None:
+                if peak > budget["peak_mb"]:
+                    failures.append(f"{name}: peak {peak:.2f} MB exceeds budget {budget['peak_mb']:g} MB")
+                if retained > budget["retained_mb"]:
+                    failures.append(f"{name}: {retained:.3f} MB retained exceeds budget {budget['retained_mb']:g} MB")
+            if name in baseline:
+                ratio = peak / baseline[name]["peak_mb"]
+                row += f" {ratio:>6.2f}x"
+                if ratio > args.max_growth:
+                    failures.append(f"{name}: peak {ratio:.2f}x higher than {args.compare}")
+            print(row)
+    tracemalloc.stop()
+
+    missing = sorted(set(thresholds) - set(results))
+    if missing:
+        failures.append(f"budgets for unknown cases: {', '.join(missing)}")
+    if args.save:
+        Path(args.save).write_text(json.dumps(results, indent=2))
+    if failures:
+        print("\nREGRESSIONS:")
+        for failure in failures:
+            print(f"   {failure}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
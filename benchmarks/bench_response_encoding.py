@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+Response Encoding Benchmark
+Compares serializing LessonPlan and PDFExtractionResult responses with the
+stdlib json encoder (FastAPI's default JSONResponse) and orjson, and reports
+bytes on the wire and compression CPU for identity, gzip and brotli. Ends with
+in-process GET /api/lesson-plans/{id} requests per Accept-Encoding, and full
+GET /api/history/lesson-plans requests through the app with each response class.
+The serialization speedup is for rendering alone; routes with a response_model
+also spend time in validation and jsonable_encoder, which orjson does not change.
+"""
+
+import asyncio
+import logging
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+os.environ.setdefault("STORAGE_BACKEND", "memory")
+
+import httpx
+from fastapi import FastAPI
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, ORJSONResponse
+
+import server
+from compression import CompressionMiddleware, available_encodings
+from synthetic import make_lesson_plan_content
+
+SIZES = [2000, 5000, 10000, 25000]
+ITERATIONS = 500
+REQUESTS = 200
+
+
+def time_per_call(func, iterations=ITERATIONS):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def make_lesson_plan(size):
+    return server.LessonPlan(
+        request_data=server.LessonPlanRequest(
+            subject_name="Database Systems", lecture_topic="Normalisation",
+            blooms_taxonomy="Apply", aqf_level=server.AQF_LEVELS[6], lesson_duration="1 hour"
+        ),
+        content=make_lesson_plan_content(size, seed=size),
+        owner_id="bench-user"
+    )
+
+
+def make_extraction(topics):
+    lecture_topics = [f"Week {week}: Topic {week} in database systems" for week in range(1, topics + 1)]
+    return server.PDFExtractionResult(
+        filename="database_systems_outline.pdf",
+        subject_names=["Database Systems"],
+        lecture_topics=lecture_topics,
+        lecture_focus_mapping={topic: [f"Focus area {n} for {topic.lower()}" for n in range(4)] for topic in lecture_topics},
+        owner_id="bench-user"
+    )
+
+
+def report_serialization(label, model):
+    # FastAPI hands the response class a JSON-compatible dict of the model
+    content = jsonable_encoder(model)
+    json_us = time_per_call(lambda: JSONResponse(content).body)
+    orjson_us = time_per_call(lambda: ORJSONResponse(content).body)
+    body = ORJSONResponse(content).body
+    print(f"{label:<22} {len(body):>8} {json_us:>10.1f} {orjson_us:>10.1f} {json_us / orjson_us:>7.1f}x")
+    return body
+
+
+def report_wire(label, body, middleware):
+    row = f"{label:<22} {len(body):>8}"
+    for encoding in available_encodings():
+        encode = lambda: middleware.encoder(encoding).encode(body, final=True)
+        row += f" {len(encode()):>8} {time_per_call(encode, 200):>8.1f}"
+    print(row)
+
+
+async def report_requests(plan_ids, headers):
+    client = httpx.AsyncClient(transport=httpx.ASGITransport(app=server.app), base_url="http://bench")
+    print(f"{'accept-encoding':<16} {'chars':>7} {'wire B':>8} {'mean ms':>8} {'p95 ms':>8}")
+    for size, plan_id in plan_ids:
+        for accept_encoding in ["identity"] + available_encodings():
+            latencies = []
+            wire_bytes = 0
+            for _ in range(REQUESTS):
+                start = time.perf_counter()
+                response = await client.get(
+                    f"/api/lesson-plans/{plan_id}", headers={**headers, "Accept-Encoding": accept_encoding}
+                )
+                latencies.append((time.perf_counter() - start) * 1000)
+                wire_bytes = response.num_bytes_downloaded
+                assert response.status_code == 200, response.text
+            p95 = statistics.quantiles(latencies, n=20)[-1]
+            print(f"{accept_encoding:<16} {size:>7} {wire_bytes:>8} {statistics.mean(latencies):>8.2f} {p95:>8.2f}")
+    await client.aclose()
+
+
+async def time_requests(app, url, headers):
+    client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench")
+    latencies = []
+    for _ in range(REQUESTS):
+        start = time.perf_counter()
+        response = await client.get(url, headers=headers)
+        latencies.append((time.perf_counter() - start) * 1000)
+        assert response.status_code == 200, response.text
+    await client.aclose()
+    return statistics.mean(latencies), statistics.quantiles(latencies, n=20)[-1], len(response.content)
+
+
+async def report_end_to_end(headers):
+    # The same routes mounted on an app whose default response class is FastAPI's stdlib one.
+    # server.app also runs its middleware, so the orjson side carries a little extra work.
+    json_app = FastAPI(default_response_class=JSONResponse)
+    json_app.include_router(server.api_router)
+    url = f"/api/history/lesson-plans?limit={server.HISTORY_PAGE_MAX}"
+    headers = {**headers, "Accept-Encoding": "identity"}
+    json_mean, json_p95, size = await time_requests(json_app, url, headers)
+    orjson_mean, orjson_p95, _ = await time_requests(server.app, url, headers)
+    print(f"{'response class':<16} {'bytes':>8} {'mean ms':>8} {'p95 ms':>8}")
+    print(f"{'JSONResponse':<16} {size:>8} {json_mean:>8.2f} {json_p95:>8.2f}")
+    print(f"{'ORJSONResponse':<16} {size:>8} {orjson_mean:>8.2f} {orjson_p95:>8.2f}")
+    print(f"end-to-end speedup {json_mean / orjson_mean:.2f}x")
+
+
+async def main():
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    logging.getLogger("server").setLevel(logging.WARNING)
+
+    print("=" * 72)
+    print("RESPONSE SERIALIZATION (per response)")
+    print("=" * 72)
+    print(f"{'payload':<22} {'bytes':>8} {'json us':>10} {'orjson us':>10} {'speedup':>8}")
+    bodies = []
+    for size in SIZES:
+        bodies.append((f"lesson plan {size}", report_serialization(f"lesson plan {size}", make_lesson_plan(size))))
+    for topics in [12, 40]:
+        bodies.append((f"extraction {topics} topics", report_serialization(f"extraction {topics} topics", make_extraction(topics))))
+
+    print()
+    print("=" * 72)
+    print("BYTES ON THE WIRE AND COMPRESSION CPU (per response)")
+    print("=" * 72)
+    middleware = CompressionMiddleware(
+        None, gzip_level=server.RESPONSE_COMPRESSION_GZIP_LEVEL, brotli_quality=server.RESPONSE_COMPRESSION_BROTLI_QUALITY
+    )
+    print(f"{'payload':<22} {'identity':>8}" + "".join(f" {encoding + ' B':>8} {encoding + ' us':>8}" for encoding in available_encodings()))
+    for label, body in bodies:
+        report_wire(label, body, middleware)
+
+    print()
+    print("=" * 72)
+    print(f"GET /api/lesson-plans/{{id}} IN PROCESS ({REQUESTS} requests each)")
+    print("=" * 72)
+    user = {"id": "bench-user", "email": "bench@example.com"}
+    server.users_db[user["email"]] = user
+    headers = {"Authorization": f"Bearer {server.create_jwt_token(user)}"}
+    plan_ids = []
+    for size in [5000, 25000]:
+        plan = make_lesson_plan(size)
+        await server.storage.insert_lesson_plan(server.encode_lesson_plan_doc(plan))
+        plan_ids.append((size, plan.id))
+    await report_requests(plan_ids, headers)
+
+    print()
+    print("=" * 72)
+    print(f"GET /api/history/lesson-plans?limit={server.HISTORY_PAGE_MAX} END TO END ({REQUESTS} requests each)")
+    print("=" * 72)
+    for n in range(server.HISTORY_PAGE_MAX):
+        await server.storage.insert_lesson_plan(server.encode_lesson_plan_doc(make_lesson_plan(2000 + n)))
+    await report_end_to_end(headers)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,302 @@
+#!/usr/bin/env python3
+"""
+Concurrent Load Test
+Runs the user journey exercised by backend_test_auth.py (signup, login, PDF
+upload, lesson plan generation, PDF download) from many concurrent virtual
+users and reports throughput, p50/p95/p99 latency and error rate per
+endpoint.
+
+By default the backend runs in-process on the memory storage backend with a
+stub Gemini client that answers after --llm-latency-ms, so the test needs no
+network, API key or MongoDB. Pass --base-url to load a running server instead.
+
+Closed loop (default): --concurrency users each run sessions back to back.
+Open loop: --rate starts new sessions at that many per second (Poisson
+arrivals) regardless of how many are still running, which shows queueing
+once the backend falls behind.
+
+--batch-fraction sends that share of sessions with X-Request-Priority: batch;
+their upload and generate requests are reported separately.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import re
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT_DIR / "backend"))
+sys.path.insert(0, str(ROOT_DIR))
+os.environ.setdefault("STORAGE_BACKEND", "memory")
+
+import httpx
+
+from backend_test_auth import AuthenticatedLessonPlanTester
+from synthetic import make_lesson_plan_content
+
+STEPS = ["signup", "login", "upload-pdf", "generate-lesson-plan", "download-lesson-plan"]
+PASSWORD = "loadtest123"
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def sample_pdf_bytes():
+    """The outline PDF that backend_test_auth.py uploads."""
+    path = AuthenticatedLessonPlanTester().create_sample_pdf()
+    if not path:
+        sys.exit("Could not create the sample PDF (is reportlab installed?)")
+    try:
+        return Path(path).read_bytes()
+    finally:
+        os.unlink(path)
+
+
+class StubModels:
+    """Stands in for genai_client.aio.models: waits like the API, then answers from the prompt."""
+
+    def __init__(self, latency_ms, error_rate, rng):
+        self.latency_ms = latency_ms
+        self.error_rate = error_rate
+        self.rng = rng
+        self.calls = 0
+
+    async def generate_content(self, model, contents, config=None):
+        self.calls += 1
+        # Exponential service times: most calls are quick, a few are slow
+        await asyncio.sleep(self.rng.expovariate(1000 / self.latency_ms) if self.latency_ms > 0 else 0)
+        if self.rng.random() < self.error_rate:
+            raise RuntimeError("503 UNAVAILABLE: The model is overloaded")
+        if '"lecture_focus_mapping"' in contents:
+            text = self.extraction(contents)
+        else:
+            text = make_lesson_plan_content(self.rng.randint(3000, 8000), seed=self.calls)
+        return type("StubResponse", (), {"text": text})()
+
+    @staticmethod
+    def extraction(prompt):
+        topics = re.findall(r"Week \d+: ([^\n]+)", prompt) or ["Introduction"]
+        subject = re.search(r"Subject: ([^\n]+)", prompt)
+        return "```json\n" + json.dumps({
+            "subject_names": [subject.group(1).strip() if subject else "Load Test Subject"],
+            "lecture_topics": [topic.strip() for topic in topics],
+            "lecture_focus_mapping": {topic.strip(): [] for topic in topics},
+        }) + "\n```"
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(lambda: defaultdict(int))
+        self.sessions_completed = 0
+        self.sessions_failed = 0
+
+    async def call(self, step, request, record=True):
+        start = time.perf_counter()
+        try:
+            response = await request
+            error = str(response.status_code) if response.status_code >= 400 else None
+        except httpx.HTTPError as e:
+            response, error = None, type(e).__name__
+        if record:
+            self.latencies[step].append((time.perf_counter() - start) * 1000)
+            if error:
+                self.errors[step][error] += 1
+        return None if error else response
+
+    def summary(self, elapsed):
+        endpoints = {}
+        for step in sorted(self.latencies, key=lambda name: (STEPS.index(name.split()[0]), name)):
+            latencies = self.latencies[step]
+            errors = sum(self.errors[step].values())
+            endpoints[step] = {
+                "requests": len(latencies),
+                "errors": errors,
+                "error_rate": errors / len(latencies),
+                "error_kinds": dict(self.errors[step]),
+                "throughput_rps": len(latencies) / elapsed,
+                "p50_ms": percentile(latencies, 50),
+                "p95_ms": percentile(latencies, 95),
+                "p99_ms": percentile(latencies, 99),
+                "max_ms": max(latencies),
+            }
+        return {
+            "elapsed_s": elapsed,
+            "sessions_completed": self.sessions_completed,
+            "sessions_failed": self.sessions_failed,
+            "endpoints": endpoints,
+        }
+
+
+async def run_session(http, recorder, steps, pdf_bytes, session_id, batch=False):
+    """One virtual user's journey; stops at the first failed step."""
+    email = f"load_{session_id}_{random.getrandbits(32):08x}@example.com"
+    extraction = None
+    lesson_plan = None
+    llm_headers = {"X-Request-Priority": "batch"} if batch else {}
+    suffix = " [batch]" if batch else ""
+
+    def auth():
+        return {"Authorization": f"Bearer {token}"}
+
+    # Every session needs an account; signup is only reported when it is a selected step
+    response = await recorder.call("signup", http.post("/api/auth/signup", json={
+        "firstName": "Load", "lastName": "Tester", "email": email,
+        "institution": "Load Test University", "department": "Computing",
+        "password": PASSWORD, "newsletter": False
+    }), record="signup" in steps)
+    if response is None:
+        recorder.sessions_failed += 1
+        return
+    token = response.json()["token"]
+    if "login" in steps:
+        response = await recorder.call("login", http.post("/api/auth/login", json={"email": email, "password": PASSWORD}))
+        if response is None:
+            recorder.sessions_failed += 1
+            return
+        token = response.json()["token"]
+    if "upload-pdf" in steps:
+        response = await recorder.call("upload-pdf" + suffix, http.post(
+            "/api/upload-pdf", headers={**auth(), **llm_headers}, files={"file": ("load_outline.pdf", pdf_bytes, "application/pdf")}
+        ))
+        if response is None:
+            recorder.sessions_failed += 1
+            return
+        extraction = response.json()
+    if "generate-lesson-plan" in steps:
+        response = await recorder.call("generate-lesson-plan" + suffix, http.post("/api/generate-lesson-plan", headers={**auth(), **llm_headers}, json={
+            "subject_name": (extraction or {}).get("subject_names", ["Advanced Software Engineering"])[0],
+            "lecture_topic": random.choice((extraction or {}).get("lecture_topics") or ["Software Architecture Fundamentals"]),
+            "focus_topic": "",
+            "blooms_taxonomy": "Apply",
+            "aqf_level": "AQF Level 7 - Bachelor Degree",
+            "lesson_duration": "1 hour"
+        }))
+        if response is None:
+            recorder.sessions_failed += 1
+            return
+        lesson_plan = response.json()
+    if "download-lesson-plan" in steps and lesson_plan:
+        response = await recorder.call("download-lesson-plan", http.get(
+            f"/api/download-lesson-plan/{lesson_plan['id']}", headers=auth()
+        ))
+        if response is None:
+            recorder.sessions_failed += 1
+            return
+    recorder.sessions_completed += 1
+
+
+async def closed_loop(http, recorder, args, steps, pdf_bytes):
+    rng = random.Random(args.seed)
+    deadline = time.perf_counter() + args.duration
+    counter = iter(range(10 ** 9))
+
+    async def virtual_user():
+        while time.perf_counter() < deadline:
+            await run_session(http, recorder, steps, pdf_bytes, next(counter), rng.random() < args.batch_fraction)
+
+    await asyncio.gather(*[virtual_user() for _ in range(args.concurrency)])
+
+
+async def open_loop(http, recorder, args, steps, pdf_bytes):
+    rng = random.Random(args.seed)
+    deadline = time.perf_counter() + args.duration
+    sessions = []
+    session_id = 0
+    while time.perf_counter() < deadline:
+        batch = rng.random() < args.batch_fraction
+        sessions.append(asyncio.create_task(run_session(http, recorder, steps, pdf_bytes, session_id, batch)))
+        session_id += 1
+        await asyncio.sleep(rng.expovariate(args.rate))
+    # Sessions still running at the deadline are waited for, not cancelled
+    await asyncio.gather(*sessions)
+
+
+def print_report(summary, args, steps):
+    print("=" * 100)
+    mode = f"open loop, {args.rate:g} sessions/s" if args.rate else f"closed loop, {args.concurrency} users"
+    target = args.base_url or f"in-process, stub LLM {args.llm_latency_ms:g}ms"
+    print(f"LOAD TEST: {mode}, {args.duration:g}s, {target}")
+    print(f"Steps: {' -> '.join(steps)}")
+    print("=" * 100)
+    print(f"{'endpoint':<30} {'requests':>8} {'errors':>7} {'err %':>6} {'req/s':>7} "
+          f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    for step, stats in summary["endpoints"].items():
+        print(f"{step:<30} {stats['requests']:>8} {stats['errors']:>7} {stats['error_rate'] * 100:>6.1f} "
+              f"{stats['throughput_rps']:>7.1f} {stats['p50_ms']:>8.1f} {stats['p95_ms']:>8.1f} "
+              f"{stats['p99_ms']:>8.1f} {stats['max_ms']:>8.1f}")
+    for step, stats in summary["endpoints"].items():
+        if stats["error_kinds"]:
+            print(f"   {step} errors: {', '.join(f'{kind} x{count}' for kind, count in stats['error_kinds'].items())}")
+    print(f"\nSessions: {summary['sessions_completed']} completed, {summary['sessions_failed']} failed "
+          f"in {summary['elapsed_s']:.1f}s ({summary['sessions_completed'] / summary['elapsed_s']:.2f} sessions/s)")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=10, help="virtual users in closed-loop mode")
+    parser.add_argument("--rate", type=float, default=None, help="session arrivals per second; switches to open loop")
+    parser.add_argument("--duration", type=float, default=30, help="seconds to keep starting sessions")
+    parser.add_argument("--steps", default=",".join(STEPS), help=f"comma-separated subset of {','.join(STEPS)}")
+    parser.add_argument("--base-url", default=None, help="load a running server instead of the in-process app")
+    parser.add_argument("--timeout", type=float, default=120, help="per-request timeout in seconds")
+    parser.add_argument("--llm-latency-ms", type=float, default=1500, help="mean stub LLM latency (in-process only)")
+    parser.add_argument("--llm-error-rate", type=float, default=0.0, help="fraction of stub LLM calls that fail with 503")
+    parser.add_argument("--batch-fraction", type=float, default=0.0, help="share of sessions sent as batch priority")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", dest="json_path", default=None, help="also write the summary to this file")
+    args = parser.parse_args()
+
+    steps = [step for step in args.steps.split(",") if step]
+    unknown = set(steps) - set(STEPS)
+    if unknown:
+        parser.error(f"unknown steps: {', '.join(sorted(unknown))}")
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    pdf_bytes = sample_pdf_bytes()
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+
+    if args.base_url:
+        http = httpx.AsyncClient(base_url=args.base_url, timeout=args.timeout, limits=limits)
+        lifespan = None
+    else:
+        import server
+        logging.getLogger("server").setLevel(logging.WARNING)
+        models = StubModels(args.llm_latency_ms, args.llm_error_rate, random.Random(args.seed))
+        stub_client = type("StubClient", (), {"aio": type("StubAio", (), {"models": models})()})()
+        server.get_user_llm_chat = lambda api_key: stub_client
+        transport = httpx.ASGITransport(app=server.app)
+        http = httpx.AsyncClient(transport=transport, base_url="http://load", timeout=args.timeout, limits=limits)
+        lifespan = server.app.router.lifespan_context(server.app)
+        await lifespan.__aenter__()
+
+    recorder = Recorder()
+    start = time.perf_counter()
+    try:
+        if args.rate:
+            await open_loop(http, recorder, args, steps, pdf_bytes)
+        else:
+            await closed_loop(http, recorder, args, steps, pdf_bytes)
+    finally:
+        elapsed = time.perf_counter() - start
+        await http.aclose()
+        if lifespan is not None:
+            await lifespan.__aexit__(None, None, None)
+
+    summary = recorder.summary(elapsed)
+    print_report(summary, args, steps)
+    if args.json_path:
+        Path(args.json_path).write_text(json.dumps({"args": vars(args), **summary}, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
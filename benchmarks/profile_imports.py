@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Backend Import-Time Profile
+Imports server.py in a fresh interpreter under `python -X importtime` and
+reports the total import time, the slowest modules and any heavy module that
+was imported eagerly. Exits non-zero when the total exceeds --budget-ms or a
+lazily loaded module shows up at import, so it can guard startup regressions.
+"""
+
+import argparse
+import os
+import re
+import subprocess
+import sys
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+
+# Loaded on first use or by the startup warm-up, never by importing server
+LAZY_MODULES = ["google.genai", "reportlab", "pypdf", "jwt", "motor", "pymongo"]
+
+LINE_RE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+
+def profile_once():
+    """Return [(self_us, cumulative_us, depth, module)] for one cold import of server."""
+    env = {**os.environ, "STORAGE_BACKEND": os.environ.get("STORAGE_BACKEND", "memory")}
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import server"],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        sys.exit(f"Importing server failed:\n{result.stderr[-2000:]}")
+    modules = []
+    for line in result.stderr.splitlines():
+        match = LINE_RE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            modules.append((int(self_us), int(cumulative_us), len(indent) // 2, name))
+    return modules
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3, help="imports to run; the fastest is reported")
+    parser.add_argument("--top", type=int, default=15, help="slowest direct imports of server to list")
+    parser.add_argument("--budget-ms", type=float, default=None, help="fail if importing server takes longer")
+    args = parser.parse_args()
+
+    runs = [profile_once() for _ in range(args.runs)]
+    totals = [next(cumulative for _, cumulative, _, name in modules if name == "server") for modules in runs]
+    modules = runs[totals.index(min(totals))]
+    total_ms = min(totals) / 1000
+
+    print("=" * 72)
+    print("BACKEND IMPORT-TIME PROFILE")
+    print(f"import server: {total_ms:.1f}ms (fastest of {args.runs}, all runs: {', '.join(f'{t / 1000:.0f}' for t in totals)}ms)")
+    print("=" * 72)
+
+    # importtime lists children before their parent, so server's direct
+    # imports are the depth-1 entries since the previous top-level module
+    direct = []
+    for _, cumulative, depth, name in modules:
+        if depth == 0:
+            if name == "server":
+                break
+            direct = []
+        elif depth == 1:
+            direct.append((cumulative, name))
+    print(f"{'module':<40} {'cumulative ms':>14}")
+    for cumulative, name in sorted(direct, reverse=True)[:args.top]:
+        print(f"{name:<40} {cumulative / 1000:>14.1f}")
+
+    imported = {name for _, _, _, name in modules}
+    eager = [lazy for lazy in LAZY_MODULES if any(name == lazy or name.startswith(lazy + ".") for name in imported)]
+    print()
+    print(f"Lazy modules imported eagerly: {', '.join(eager) if eager else 'none'}")
+
+    failed = bool(eager)
+    if args.budget_ms is not None:
+        within = total_ms <= args.budget_ms
+        print(f"Budget {args.budget_ms:.0f}ms: {'ok' if within else 'EXCEEDED'}")
+        failed = failed or not within
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""
+Synthetic data for benchmarks.
+Produces lesson plan content shaped like the output of the generation prompt
+in server.generate_lesson_plan, and subject outline PDFs shaped like the ones
+teachers upload to /api/upload-pdf.
+"""
+
+import io
+import random
+
+SECTION_HEADINGS = [
+    "LEARNING OBJECTIVES",
+    "LEARNING OUTCOMES",
+    "PRE-REQUISITES",
+    "MATERIALS AND RESOURCES",
+    "LESSON STRUCTURE",
+    "ASSESSMENT CRITERIA",
+    "EXTENSION ACTIVITIES",
+    "DIFFERENTIATION STRATEGIES",
+]
+
+VERBS = ["Explain", "Apply", "Compare", "Evaluate", "Design", "Demonstrate", "Analyse", "Discuss", "Model", "Justify"]
+NOUNS = ["normalisation", "entity relationships", "query plans", "transactions", "indexes", "joins",
+         "functional dependencies", "concurrency control", "schema design", "stored procedures"]
+QUALIFIERS = ["in small groups", "using a worked example", "with peer feedback", "against a case study",
+              "through a guided lab", "in a short written reflection", "using the lecture slides"]
+
+
+def make_bullet(rng):
+    return f"- {rng.choice(VERBS)} {rng.choice(NOUNS)} {rng.choice(QUALIFIERS)}"
+
+
+def make_lesson_plan_content(target_chars=4000, seed=0):
+    """Return lesson plan text of roughly target_chars characters."""
+    rng = random.Random(seed)
+    lines = []
+    section = 0
+    while sum(len(line) + 1 for line in lines) < target_chars:
+        lines.append(SECTION_HEADINGS[section % len(SECTION_HEADINGS)])
+        for _ in range(rng.randint(3, 7)):
+            lines.append(make_bullet(rng))
+        lines.append("")
+        section += 1
+    return "\n".join(lines)
+
+
+SUBJECT_AREAS = ["Database Systems", "Software Engineering", "Computer Networks", "Data Science",
+                 "Operating Systems", "Human Computer Interaction", "Cyber Security", "Web Development"]
+ACTIVITIES = ["Lecture", "Tutorial", "Lab", "Workshop", "Seminar"]
+ASSESSMENTS = [("Weekly quizzes", 10), ("Lab portfolio", 20), ("Group project", 30), ("Final exam", 40)]
+POLICY_SENTENCES = [
+    "Students must submit all assessment items through the learning management system by the due date.",
+    "Late submissions incur a penalty of five percent of the available marks per calendar day.",
+    "Special consideration applications must be lodged within three working days of the assessment.",
+    "Academic integrity is expected in all work and suspected misconduct is referred to the faculty.",
+    "Attendance at tutorials and labs is strongly recommended and contributes to participation marks.",
+    "Reasonable adjustments are available for students registered with the accessibility service.",
+]
+
+
+def make_outline_timetable(rng, subject, weeks=13):
+    """[(week, topic, [focus topics], activity)] for one teaching period."""
+    timetable = []
+    for week in range(1, weeks + 1):
+        if week == 7:
+            timetable.append((week, "Mid-semester break", [], "No classes"))
+            continue
+        noun = rng.choice(NOUNS)
+        topic = f"{noun.title()} in {subject}"
+        focus = [f"{rng.choice(VERBS)} {rng.choice(NOUNS)}" for _ in range(rng.randint(1, 4))]
+        timetable.append((week, topic, focus, rng.choice(ACTIVITIES)))
+    return timetable
+
+
+class _OutlineWriter:
+    """Lays out lines of text on letter pages, stopping after max_pages."""
+
+    def __init__(self, canvas, max_pages):
+        from reportlab.lib.pagesizes import letter
+        self.canvas = canvas
+        self.width, self.height = letter
+        self.max_pages = max_pages
+        self.pages = 1
+        self.y = self.height - 50
+
+    @property
+    def full(self):
+        return self.pages > self.max_pages
+
+    def line(self, text, font="Helvetica", size=11, indent=0, space=15):
+        if self.full:
+            return
+        if self.y < 60:
+            self.page_break()
+            if self.full:
+                return
+        self.canvas.setFont(font, size)
+        self.canvas.drawString(50 + indent, self.y, text)
+        self.y -= space
+
+    def page_break(self):
+        self.canvas.showPage()
+        self.pages += 1
+        self.y = self.height - 50
+
+
+def make_outline_pdf(pages=4, seed=0):
+    """Return the bytes of a subject outline PDF with exactly ``pages`` pages.
+
+    Each outline has subject details, learning outcomes, an assessment
+    table, a week-by-week timetable of activities with focus topics, and
+    policy text. Longer documents repeat this for further subjects, like a
+    course handbook.
+    """
+    from reportlab.pdfgen import canvas
+
+    rng = random.Random(seed)
+    buffer = io.BytesIO()
+    writer = _OutlineWriter(canvas.Canvas(buffer), pages)
+    subject_number = 0
+    while not writer.full:
+        subject = SUBJECT_AREAS[subject_number % len(SUBJECT_AREAS)]
+        code = f"COMP{1000 + subject_number * 37}"
+        writer.line(f"{subject} - Subject Outline", "Helvetica-Bold", 16, space=30)
+        writer.line(f"Subject: {subject}")
+        writer.line(f"Code: {code}")
+        writer.line(f"Credit points: {rng.choice([6, 12])}    Teaching period: Semester {rng.randint(1, 2)}", space=30)
+
+        writer.line("Learning Outcomes", "Helvetica-Bold", 14, space=20)
+        for n in range(1, rng.randint(4, 7)):
+            writer.line(f"LO{n}. {rng.choice(VERBS)} {rng.choice(NOUNS)} {rng.choice(QUALIFIERS)}", indent=10)
+        writer.line("", space=10)
+
+        writer.line("Assessment", "Helvetica-Bold", 14, space=20)
+        for name, weight in ASSESSMENTS:
+            writer.line(f"{name:<30} {weight}%    Due week {rng.randint(3, 13)}", indent=10)
+        writer.line("", space=10)
+
+        writer.line("Timetable of Activities", "Helvetica-Bold", 14, space=20)
+        for week, topic, focus, activity in make_outline_timetable(rng, subject):
+            writer.line(f"Week {week}: {topic}", space=15)
+            writer.line(f"{activity}", "Helvetica-Oblique", 10, indent=20, space=13)
+            for item in focus:
+                writer.line(f"\u2022 {item}", size=10, indent=20, space=13)
+        writer.line("", space=10)
+
+        writer.line("Policies", "Helvetica-Bold", 14, space=20)
+        for _ in range(rng.randint(6, 12)):
+            writer.line(rng.choice(POLICY_SENTENCES), size=9, space=12)
+        if not writer.full:
+            writer.page_break()
+        subject_number += 1
+    writer.canvas.save()
+    return buffer.getvalue()